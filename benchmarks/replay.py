@@ -0,0 +1,191 @@
+'''
+Replays recorded web service responses through the shared pytaxize transport,
+so the benchmarks run on a machine with no network.
+
+Recorded payloads live in benchmarks/payloads, one file per service endpoint.
+Services that take a list of names (GNR, GNI, Vascan, GBIF) answer with one
+recorded entry per name asked for, cycling through the recorded entries, so
+response sizes grow with the batch like the real services do.
+
+Usage:
+>>> from benchmarks import replay
+>>> adapter = replay.install()
+>>> import pytaxize
+>>> pytaxize.getfullhierarchyfromtsn(tsn = 180543)  # no network involved
+>>> adapter.calls
+1
+>>> replay.uninstall()
+'''
+import os
+import json
+import time
+import threading
+import requests
+from requests.adapters import BaseAdapter
+try:
+    from urllib.parse import urlsplit, parse_qs
+except ImportError:
+    from urlparse import urlsplit, parse_qs
+from pytaxize import transport
+
+payload_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+
+# repeat the records of these ITIS responses to get realistically large ones
+tiles = {'getTsnByVernacularLanguage': ('vernacularTsns', 1000)}
+
+_payloads = {}
+
+def payload(name):
+    '''
+    Bytes of a recorded payload, read from disk once.
+    '''
+    if name not in _payloads:
+        with open(os.path.join(payload_dir, name), 'rb') as f:
+            _payloads[name] = f.read()
+    return _payloads[name]
+
+def tile(content, record, times):
+    '''
+    Repeat every <ax21:record> element of an ITIS response times times.
+    '''
+    first = content.index(('<ax21:%s' % record).encode())
+    close = ('</ax21:%s>' % record).encode()
+    last = content.rindex(close) + len(close)
+    return content[:first] + content[first:last] * times + content[last:]
+
+class ReplayAdapter(BaseAdapter):
+    '''
+    A requests adapter answering from recorded payloads.
+
+    :param latency: Seconds to sleep per request, to stand in for the network
+        round trip (default 0, i.e. measure pytaxize itself).
+    '''
+    def __init__(self, latency=0):
+        super(ReplayAdapter, self).__init__()
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._routes = {'itis': _itis, 'col': _col, 'gnr': _gnr, 'gni': _gni,
+                        'vascan': _vascan, 'gbif': _gbif}
+
+    def __repr__(self):
+        return """<%s latency=%s calls=%s>""" % (type(self).__name__, self.latency, self.calls)
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.calls += 1
+        service = transport.service_for(request.url)
+        if service not in self._routes:
+            raise requests.ConnectionError('no recorded response for %s' % request.url,
+                request=request)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        content, ctype = self._routes[service](request)
+        res = requests.models.Response()
+        res.status_code = 200
+        res.reason = 'OK'
+        res.url = request.url
+        res.request = request
+        res.encoding = 'utf-8'
+        res.headers['Content-Type'] = ctype
+        res._content = content
+        return res
+
+    def close(self):
+        pass
+
+_previous = []
+
+def install(latency=0):
+    '''
+    Point the shared transport at recorded payloads. A fresh Transport without
+    a response cache is used, so every call goes through the adapter.
+
+    :param latency: Seconds to sleep per request (default 0)
+
+    Returns the ReplayAdapter, whose calls attribute counts requests.
+    '''
+    tp = transport.Transport()
+    adapter = ReplayAdapter(latency)
+    tp.session.mount('http://', adapter)
+    tp.session.mount('https://', adapter)
+    _previous.append(transport.set_transport(tp))
+    return adapter
+
+def uninstall():
+    '''
+    Restore the transport in use before install().
+    '''
+    transport.set_transport(_previous.pop()).close()
+
+## helper functions
+def _query(request):
+    return parse_qs(urlsplit(request.url).query)
+
+def _form(request):
+    body = request.body or ''
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    return parse_qs(body)
+
+def _json(obj):
+    return json.dumps(obj).encode('utf-8'), 'application/json'
+
+def _cycle(entries, n):
+    return [dict(entries[i % len(entries)]) for i in range(n)]
+
+def _itis(request):
+    endpt = urlsplit(request.url).path.rsplit('/', 1)[1]
+    name = 'itis_%s.xml' % endpt
+    if endpt in tiles:
+        key = 'tiled:' + name
+        if key not in _payloads:
+            _payloads[key] = tile(payload(name), *tiles[endpt])
+        name = key
+    return payload(name), 'application/xml'
+
+def _col(request):
+    full = _query(request).get('response', [''])[0] == 'full'
+    return payload('col_children.xml' if full else 'col_search.xml'), 'text/xml'
+
+def _gnr(request):
+    out = json.loads(payload('gnr_resolve.json').decode('utf-8'))
+    if request.method == 'POST':
+        lines = _form(request)['data'][0].split('\n')
+        supplied = [x.split('|', 1) for x in lines]
+    else:
+        supplied = [[None, x] for x in _query(request)['names'][0].split('|')]
+    data = _cycle(out['data'], len(supplied))
+    for x, (i, name) in zip(data, supplied):
+        x['supplied_name_string'] = name
+        if i is None:
+            x.pop('supplied_id', None)
+        else:
+            x['supplied_id'] = i
+    out['data'] = data
+    return _json(out)
+
+def _gni(request):
+    names = _query(request)['names'][0].split('|')
+    out = _cycle(json.loads(payload('gni_parse.json').decode('utf-8')), len(names))
+    for x, name in zip(out, names):
+        x['scientificName'] = dict(x['scientificName'], verbatim=name)
+    return _json(out)
+
+def _vascan(request):
+    out = json.loads(payload('vascan_search.json').decode('utf-8'))
+    if request.method == 'POST':
+        names = _form(request)['q'][0].split('\n')
+    else:
+        names = _query(request)['q']
+    out['results'] = _cycle(out['results'], len(names))
+    for x, name in zip(out['results'], names):
+        x['searchedTerm'] = name
+    return _json(out)
+
+def _gbif(request):
+    names = json.loads(request.body)
+    out = _cycle(json.loads(payload('gbif_parse.json').decode('utf-8')), len(names))
+    for x, name in zip(out, names):
+        x['scientificName'] = name
+    return _json(out)
@@ -0,0 +1,198 @@
+'''
+Offline benchmarks for the pytaxize web service wrappers.
+
+Each case calls a public function a realistic number of times against recorded
+responses (see benchmarks/replay.py) and reports throughput, median and 99th
+percentile latency per call, and the memory one call needs: the peak Python
+memory traced by tracemalloc, and the peak growth of the resident set size
+(RSS), which also counts memory allocated by C libraries such as lxml. RSS is
+measured for the first call, in a fresh process, and only on Linux. No
+network is needed.
+
+Usage:
+python -m benchmarks.run                      # all cases
+python -m benchmarks.run itis gnr_resolve     # cases whose name starts with these
+python -m benchmarks.run --scale 0.1          # a tenth of the calls, for a quick look
+python -m benchmarks.run --latency 0.05       # add 50 ms per request, to see
+                                              # what the concurrent functions buy
+python -m benchmarks.run --json before.json   # also save the results
+python -m benchmarks.run --no-rss             # skip the RSS runs, which start
+                                              # a process per case
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tracemalloc
+import pandas as pd
+import pytaxize
+from pytaxize import itis
+from benchmarks import replay
+
+genera = ['Poa', 'Helianthus', 'Ursus', 'Apis', 'Quercus', 'Pinus', 'Salix',
+          'Carex', 'Festuca', 'Bromus', 'Acer', 'Betula', 'Rosa', 'Rubus', 'Vaccinium']
+epithets = ['annua', 'annuus', 'arctos', 'mellifera', 'alba', 'strobus', 'nigra',
+            'aquatilis', 'rubra', 'inermis', 'saccharum', 'papyrifera', 'acicularis',
+            'idaeus', 'angustifolium', 'pratensis', 'americana', 'canadensis']
+
+def names(n):
+    '''
+    n distinct names built from the lists above: binomials first, then
+    varieties, repeating once both are exhausted.
+    '''
+    out = ['%s %s' % (g, e) for g in genera for e in epithets]
+    out += ['%s %s var. %s' % (g, e, v) for g in genera for e in epithets for v in epithets]
+    return (out * (n // len(out) + 1))[:n]
+
+def cases():
+    '''
+    List of (name, function, calls). Each function makes one call; calls is
+    the number of times it is timed at scale 1.
+    '''
+    n50 = names(50)
+    n100 = names(100)
+    n5000 = names(5000)
+    # 50000 occurrences of 5000 names
+    occurrences = n5000 * 10
+    column = pd.Series(occurrences)
+    tsns = [180543 + i for i in range(100)]
+    vern = replay.tile(replay.payload('itis_getTsnByVernacularLanguage.xml'),
+        *replay.tiles['getTsnByVernacularLanguage'])
+    species = pytaxize.NameIndex.from_dataset('species')
+    vres = json.loads(replay.payload('vascan_search.json'))
+    vres = {'results': vres['results'] * 2500}
+    gres = [x.get('results', []) for x in json.loads(replay.payload('gnr_resolve.json'))['data']] * 2500
+    typos = [x[:-1] for x in species.names]
+    return [
+        ('itis.getfullrecordfromtsn', lambda: pytaxize.getfullrecordfromtsn(180543), 200),
+        ('itis.getfullhierarchyfromtsn', lambda: pytaxize.getfullhierarchyfromtsn(180543), 500),
+        ('itis.gethierarchydownfromtsn', lambda: pytaxize.gethierarchydownfromtsn(180541), 500),
+        ('itis.gethierarchyupfromtsn', lambda: pytaxize.gethierarchyupfromtsn(180543), 500),
+        ('itis.getcommonnamesfromtsn', lambda: pytaxize.getcommonnamesfromtsn(180543), 500),
+        ('itis.searchbyscientificname', lambda: pytaxize.searchbyscientificname('Ursus'), 500),
+        ('itis._itisterms', lambda: itis._itisterms('getITISTermsFromScientificName', {'srchKey': 'Ursus'}), 500),
+        ('itis.gettsnbyvernacularlanguage', lambda: pytaxize.gettsnbyvernacularlanguage('english'), 5),
+        ('itis.itis_hierarchy_batch', lambda: pytaxize.itis_hierarchy_batch(tsns, concat=True), 5),
+        # parsers alone, from the raw body of a 20000 record response
+        ('itis._collect', lambda: itis._collect(itis.etree.fromstring(vern), itis.ns21['ax21'],
+            ['commonName', 'language', 'tsn']), 20),
+        ('itis._itercollect', lambda: itis._itercollect(vern, itis.ns21['ax21'], 'vernacularTsns',
+            ['commonName', 'language', 'tsn']), 20),
+        ('col.col_children', lambda: pytaxize.col_children(name=['Apis']), 300),
+        ('col.col_search', lambda: pytaxize.col_search(name=['Poa*']), 300),
+        ('ids.get_colid_bulk', lambda: pytaxize.Ids(n100, db='col').get_colid_bulk(), 10),
+        ('col.col_search_iter', lambda: list(pytaxize.col_search_iter(name='Poa*')), 20),
+        ('gnr.gnr_resolve', lambda: pytaxize.gnr_resolve(n100), 100),
+        ('gnr.gnr_resolve_bulk', lambda: pytaxize.gnr_resolve_bulk(n5000), 3),
+        ('gni.gni_parse', lambda: pytaxize.gni_parse(n50), 200),
+        ('tax.vascan_search', lambda: pytaxize.vascan_search(['Helianthus annuus']), 300),
+        ('tax.vascan_search[50]', lambda: pytaxize.vascan_search(n50), 200),
+        ('tax.vascan_search_bulk', lambda: pytaxize.vascan_search_bulk(n5000), 3),
+        ('flatten.vascan_tables', lambda: pytaxize.vascan_tables(vres), 20),
+        ('flatten.vascan_flat', lambda: pytaxize.vascan_flat(vres), 20),
+        ('flatten.gnr_tables', lambda: pytaxize.gnr_tables(gres), 20),
+        ('tax.gbif_parse', lambda: pytaxize.gbif_parse(n50), 200),
+        ('tax.gbif_parse_bulk', lambda: pytaxize.gbif_parse_bulk(occurrences, cache=False), 20),
+        # local parser, no requests; names are memoized after the warmup call
+        ('nameparser.name_parse', lambda: pytaxize.name_parse(n5000), 50),
+        ('accessor.resolve', lambda: column.taxize.resolve(local='species'), 5),
+        ('accessor.tsn', lambda: pd.Series(n100 * 50).taxize.tsn(), 20),
+        ('fuzzy.match', lambda: species.match('Ruelia solitaria'), 2000),
+        ('fuzzy.match_many', lambda: species.match_many(typos), 20),
+    ]
+
+def percentile(x, q):
+    '''
+    q-th percentile (0 to 100) of a sorted list, nearest rank.
+    '''
+    return x[min(len(x) - 1, int(round(q / 100.0 * (len(x) - 1))))]
+
+def rss_growth(name, latency=0):
+    '''
+    Peak growth of the resident set size in KiB during the first call of a
+    case, run in a fresh interpreter so memory freed by earlier calls and
+    cases can't hide it. None where /proc is missing.
+    '''
+    if not os.path.exists('/proc/self/status'):
+        return None
+    out = subprocess.check_output([sys.executable, '-m', 'benchmarks.run', '--rss', name,
+        '--latency', str(latency)], cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return int(out.decode().strip())
+
+def _status(key):
+    # a memory figure from /proc/self/status, in KiB
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key + ':'):
+                return int(line.split()[1])
+
+def measure(fun, calls):
+    '''
+    Time calls calls of fun, then trace the memory of one more.
+    '''
+    fun()  # warm up: imports, payload reads, connection pools
+    times = []
+    start = time.perf_counter()
+    for i in range(calls):
+        t0 = time.perf_counter()
+        fun()
+        times.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    times.sort()
+    tracemalloc.start()
+    fun()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {'calls': calls, 'seconds': total, 'per_second': calls / total,
+            'p50_ms': percentile(times, 50) * 1000, 'p99_ms': percentile(times, 99) * 1000,
+            'peak_kib': peak / 1024.0}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline pytaxize benchmarks')
+    parser.add_argument('only', nargs='*', help='run only cases whose name starts with one of these')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply the number of calls per case')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--no-rss', action='store_true', help='skip measuring RSS growth')
+    parser.add_argument('--rss', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.rss:
+        # child of rss_growth: one call of one case
+        replay.install(args.latency)
+        fun = dict((x[0], x[1]) for x in cases())[args.rss]
+        start = _status('VmRSS')
+        fun()
+        print(_status('VmHWM') - start)
+        return
+
+    adapter = replay.install(args.latency)
+    results = {}
+    try:
+        print('%-32s %7s %10s %10s %10s %11s %11s %8s' % ('case', 'calls', 'calls/s',
+            'p50 ms', 'p99 ms', 'peak KiB', 'RSS KiB', 'requests'))
+        for name, fun, calls in cases():
+            if args.only and not any(name.startswith(x) for x in args.only):
+                continue
+            calls = max(1, int(calls * args.scale))
+            before = adapter.calls
+            res = measure(fun, calls)
+            res['requests'] = (adapter.calls - before) // (calls + 2)
+            res['rss_kib'] = None if args.no_rss else rss_growth(name, args.latency)
+            results[name] = res
+            print('%-32s %7d %10.1f %10.3f %10.3f %11.1f %11s %8d' % (name, calls,
+                res['per_second'], res['p50_ms'], res['p99_ms'], res['peak_kib'],
+                '-' if res['rss_kib'] is None else res['rss_kib'], res['requests']))
+            sys.stdout.flush()
+    finally:
+        replay.uninstall()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'scale': args.scale, 'latency': args.latency, 'results': results},
+                f, indent=1, sort_keys=True)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -21,10 +21,16 @@ pytaxize is a taxonomic toolkit for Python. Example usage:
     6  6971717    Apis nigrocincta  Species]
 '''
 
-from .gnr import gnr_datasources, gnr_resolve
+from .gnr import gnr_datasources, gnr_resolve, gnr_resolve_bulk
 from .gni import gni_parse, gni_search, gni_details
-from .col import col_children, col_downstream, col_search
-from .tax import names_list, vascan_search, gbif_parse, scrapenames
+from .col import col_children, col_downstream, col_downstream_iter, col_search, col_children_iter, col_search_iter
+from .tax import names_list, vascan_search, vascan_search_bulk, vascan_search_iter, gbif_parse, gbif_parse_bulk, gbif_clear_cache, scrapenames, scrapenames_submit, scrapenames_many
 from .ids import Ids
-from .itis import itis_ping, getacceptednamesfromtsn, getanymatchcount, getcommentdetailfromtsn, getcommonnamesfromtsn, getcoremetadatafromtsn, getcoveragefromtsn, getcredibilityratingfromtsn, getcredibilityratings, getcurrencyfromtsn, getdatedatafromtsn, getexpertsfromtsn, gettaxonomicranknamefromtsn, getfullhierarchyfromtsn, getfullrecordfromlsid, getfullrecordfromtsn, getgeographicdivisionsfromtsn, getgeographicvalues, getglobalspeciescompletenessfromtsn, gethierarchydownfromtsn, gethierarchyupfromtsn, getitistermsfromcommonname, getitisterms, getitistermsfromscientificname, itis_hierarchy, getjurisdictionaloriginfromtsn, getjurisdictionoriginvalues, getjurisdictionvalues, getkingdomnamefromtsn, getkingdomnames, getlastchangedate, getlsidfromtsn, getothersourcesfromtsn, getparenttsnfromtsn, getpublicationsfromtsn, getranknames, getrecordfromlsid, getreviewyearfromtsn, getscientificnamefromtsn, gettaxonauthorshipfromtsn, gettaxonomicranknamefromtsn, gettaxonomicusagefromtsn, gettsnbyvernacularlanguage, gettsnfromlsid, getunacceptabilityreasonfromtsn, getvernacularlanguages, searchbycommonname, searchbycommonnamebeginswith, searchbycommonnameendswith, itis_searchcommon, searchbyscientificname, searchforanymatch, searchforanymatchpaged
+from .itis import itis_ping, getacceptednamesfromtsn, getanymatchcount, getcommentdetailfromtsn, getcommonnamesfromtsn, getcoremetadatafromtsn, getcoveragefromtsn, getcredibilityratingfromtsn, getcredibilityratings, getcurrencyfromtsn, getdatedatafromtsn, getexpertsfromtsn, gettaxonomicranknamefromtsn, getfullhierarchyfromtsn, getfullrecordfromlsid, getfullrecordfromtsn, getgeographicdivisionsfromtsn, getgeographicvalues, getglobalspeciescompletenessfromtsn, gethierarchydownfromtsn, gethierarchyupfromtsn, getitistermsfromcommonname, getitisterms, getitistermsfromscientificname, itis_hierarchy, itis_hierarchy_batch, itis_preload, itis_clear_cache, itis_backend, getjurisdictionaloriginfromtsn, getjurisdictionoriginvalues, getjurisdictionvalues, getkingdomnamefromtsn, getkingdomnames, getlastchangedate, getlsidfromtsn, getothersourcesfromtsn, getparenttsnfromtsn, getpublicationsfromtsn, getranknames, getrecordfromlsid, getreviewyearfromtsn, getscientificnamefromtsn, gettaxonauthorshipfromtsn, gettaxonomicranknamefromtsn, gettaxonomicusagefromtsn, gettsnbyvernacularlanguage, gettsnfromlsid, getunacceptabilityreasonfromtsn, getvernacularlanguages, searchbycommonname, searchbycommonnamebeginswith, searchbycommonnameendswith, itis_searchcommon, searchbyscientificname, searchforanymatch, searchforanymatchpaged
+from .itis_extra import itis_downstream, itis_downstream_iter
 from .ubio import ubio_search
+from .taxtree import TaxonTree
+from .nameparser import name_parse
+from .fuzzy import NameIndex
+from .flatten import vascan_tables, vascan_flat, gnr_tables
+from .accessor import TaxizeAccessor
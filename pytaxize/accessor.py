@@ -0,0 +1,167 @@
+'''
+A pandas Series accessor for columns of taxon names.
+
+Importing pytaxize registers `taxize` on every pandas Series. Its methods look
+up each distinct value of the Series once, the fastest way available, and
+return results aligned to the Series' index, so there is no need for a
+row-wise `.apply` making one request per row:
+
+* parse: the local parser (`name_parse`), or GBIF's parser in bulk
+* resolve: a local checklist (`NameIndex`) first, then the Global Names
+  Resolver, in concurrent chunks, for the names it can't match
+* tsn: ITIS, from the local database if one is set with `itis_backend`, else
+  concurrent web service lookups (answered from disk when the response cache
+  is enabled)
+
+Usage:
+>>> import pytaxize
+>>> df['scientificName'].taxize.parse()
+>>> df['scientificName'].taxize.resolve(local='species')
+>>> df['tsn'] = df['scientificName'].taxize.tsn()
+'''
+import numpy as np
+import pandas as pd
+from pytaxize.batch import pmap
+from pytaxize.nameparser import name_parse
+from pytaxize.fuzzy import NameIndex
+from pytaxize.gnr import gnr_resolve_bulk
+from pytaxize.tax import gbif_parse_bulk
+from pytaxize.itis import searchbyscientificname
+try:
+    from pandas.api.extensions import register_series_accessor
+except ImportError:
+    register_series_accessor = None
+
+resolve_columns = ['submittedName', 'matchedName', 'score', 'dataSource', 'via']
+
+# NameIndex of each bundled checklist, built on first use
+_indexes = {}
+
+class TaxizeAccessor(object):
+    '''
+    Taxonomic lookups on a Series of names, available as `Series.taxize`.
+    '''
+    def __init__(self, series):
+        self._series = series
+
+    def __repr__(self):
+        return """<%s %d names>""" % (type(self).__name__, len(self._series))
+
+    def parse(self, remote=False, **kwargs):
+        '''
+        Parse the names into their parts.
+
+        :param remote: Use GBIF's name parser (`gbif_parse_bulk`) instead of the
+            local one (`name_parse`). Default: False
+        :param kwargs: Further arguments to gbif_parse_bulk, e.g. max_workers
+
+        Returns a DataFrame with the fields of gbif_parse, one row per name.
+
+        Usage:
+        >>> import pytaxize
+        >>> df['scientificName'].taxize.parse()[['genusOrAbove', 'specificEpithet']]
+        '''
+        if remote:
+            return gbif_parse_bulk(self._series, **kwargs)
+        return name_parse(self._series)
+
+    def resolve(self, local=None, maxdist=None, chunk_size=500, max_workers=4, **kwargs):
+        '''
+        Resolve the names to accepted spellings.
+
+        :param local: A NameIndex, or the rank of a checklist bundled with
+            pytaxize (species, genus, family, order), to match names against
+            before asking the Global Names Resolver; None to only use the
+            resolver
+        :param maxdist: Largest edit distance for a local match. Default: the
+            index's
+        :param chunk_size: Number of names sent per resolver request
+        :param max_workers: Maximum number of resolver requests in flight at once
+        :param kwargs: Further arguments to gnr_resolve_bulk, e.g. source
+
+        Returns a DataFrame with columns submittedName, matchedName, score,
+        dataSource and via ('local' or 'gnr'), one row per name; names with no
+        match have matchedName None.
+
+        Usage:
+        >>> import pytaxize
+        >>> df['scientificName'].taxize.resolve(local='species', source=[1, 12])
+        '''
+        codes, uniq = _factorize(self._series)
+        found = {}
+        rest = list(uniq)
+        if local is not None:
+            index = _index(local)
+            rest = []
+            for x in uniq:
+                best = index.match(x, 1, maxdist)
+                if len(best) > 0:
+                    found[x] = [best[0][0], best[0][2], None, 'local']
+                else:
+                    rest.append(x)
+        if len(rest) > 0:
+            kwargs.setdefault('best_match_only', 'true')
+            res = gnr_resolve_bulk(rest, chunk_size=chunk_size, max_workers=max_workers, **kwargs)
+            for x, each in zip(rest, res):
+                if len(each) > 0:
+                    found[x] = [each[0].get('canonical_form') or each[0].get('name_string'),
+                        each[0].get('score'), each[0].get('data_source_title'), 'gnr']
+        empty = [None, np.nan, None, None]
+        rows = [found.get(x, empty) for x in uniq] + [empty]
+        df = pd.DataFrame(rows, columns=resolve_columns[1:]).take(codes)
+        df.insert(0, 'submittedName', list(self._series))
+        df.index = self._series.index
+        return df
+
+    def tsn(self, max_workers=8):
+        '''
+        ITIS taxonomic serial numbers of the names.
+
+        :param max_workers: Maximum number of ITIS requests in flight at once
+
+        Returns a Series of TSNs (None where ITIS has no taxon of exactly that
+        name, ignoring case) with the index of the names.
+
+        Usage:
+        >>> import pytaxize
+        >>> pytaxize.itis_backend('~/itis.sqlite')  # optional, no requests
+        >>> df['tsn'] = df['scientificName'].taxize.tsn()
+        '''
+        codes, uniq = _factorize(self._series)
+        found = []
+        for res, error in pmap(_tsn, list(uniq), max_workers):
+            if error is not None:
+                raise error
+            found.append(res)
+        out = pd.Series(found + [None], dtype=object).take(codes)
+        out.index = self._series.index
+        out.name = 'tsn'
+        return out
+
+if register_series_accessor is not None:
+    register_series_accessor('taxize')(TaxizeAccessor)
+
+## helper functions
+def _factorize(series):
+    # codes of missing values point one past the distinct values, where the
+    # callers put an empty row
+    codes, uniq = pd.factorize(pd.Series(list(series), dtype=object))
+    codes[codes < 0] = len(uniq)
+    return codes, uniq
+
+def _index(local):
+    if isinstance(local, NameIndex):
+        return local
+    if local not in _indexes:
+        _indexes[local] = NameIndex.from_dataset(local)
+    return _indexes[local]
+
+def _tsn(name):
+    df = searchbyscientificname(name)
+    if df.shape[0] == 0 or 'combinedname' not in df.columns:
+        return None
+    key = name.strip().lower()
+    for x, tsn in zip(df['combinedname'], df['tsn']):
+        if x is not None and x.lower() == key:
+            return int(tsn)
+    return None
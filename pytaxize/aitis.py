@@ -0,0 +1,360 @@
+'''
+asyncio versions of the ITIS functions in pytaxize.itis.
+
+Each coroutine takes the same arguments and returns the same DataFrame, dict
+or list as its synchronous counterpart, parsed by the same code. Requests
+share one aiohttp connection pool per event loop and a semaphore caps how many
+are in flight at once. Like the synchronous functions, requests go through
+the shared transport's settings: the response cache (pytaxize.cache), the
+ITIS policy (rate limit, retries and circuit breaker, see pytaxize.policy),
+and the local backend set with `pytaxize.itis_backend`.
+Requires Python 3 and aiohttp (pip install pytaxize[async]).
+
+Usage:
+>>> import asyncio
+>>> from pytaxize import aitis
+>>> async def main():
+...     out = await aitis.getfullhierarchyfromtsn(tsn = 37906)
+...     many = await aitis.itis_hierarchy(tsn=[180543,41074,36616])
+...     await aitis.close()
+...     return out, many
+>>> asyncio.run(main())
+'''
+import asyncio
+import weakref
+from functools import wraps, partial
+import requests
+from lxml import etree
+from pytaxize import itis, transport
+from pytaxize.itis import convertsingle
+from pytaxize.policy import retry_statuses
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+_limits = {'limit': 100, 'limit_per_host': 20, 'concurrency': 20, 'timeout': 60}
+_pools = weakref.WeakKeyDictionary()
+
+def configure(limit=100, limit_per_host=20, concurrency=20, timeout=60):
+    '''
+    Set connection pool and concurrency limits. Applies to pools created after
+    the call, i.e. in new event loops or after `close()`.
+
+    :param limit: Maximum number of open connections in total
+    :param limit_per_host: Maximum number of open connections per host
+    :param concurrency: Maximum number of ITIS requests in flight at once
+    :param timeout: Total timeout per request in seconds
+    '''
+    _limits.update({'limit': limit, 'limit_per_host': limit_per_host,
+                    'concurrency': concurrency, 'timeout': timeout})
+
+def _pool():
+    if aiohttp is None:
+        raise ImportError("pytaxize.aitis requires aiohttp: pip install aiohttp")
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None or pool[0].closed:
+        connector = aiohttp.TCPConnector(limit=_limits['limit'],
+            limit_per_host=_limits['limit_per_host'])
+        session = aiohttp.ClientSession(connector=connector,
+            timeout=aiohttp.ClientTimeout(total=_limits['timeout']))
+        pool = (session, asyncio.Semaphore(_limits['concurrency']))
+        _pools[loop] = pool
+    return pool
+
+async def close():
+    '''
+    Close the connection pool of the running event loop.
+    '''
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool[0].close()
+
+def _local(fun):
+    # like itis._local: let the backend set with itis_backend answer, on a
+    # worker thread so the event loop isn't blocked
+    name = fun.__name__
+    @wraps(fun)
+    async def wrapper(*args, **kwargs):
+        method = getattr(itis._backend, name, None)
+        if method is not None:
+            return await asyncio.get_running_loop().run_in_executor(None,
+                partial(method, *args, **kwargs))
+        return await fun(*args, **kwargs)
+    return wrapper
+
+async def _itiscall(endpt, payload, **kwargs):
+    # request an ITIS endpoint and parse the response with its parser in itis
+    content = await _itisGETraw(endpt, payload, **kwargs)
+    if endpt in itis._raw_parsers:
+        return itis._raw_parsers[endpt](content)
+    return itis._parsers[endpt](etree.fromstring(content, etree.XMLParser()))
+
+async def _itisGETraw(endpt, payload, **kwargs):
+    url = itis.itis_base + endpt
+    params = dict((k, str(v)) for k, v in payload.items() if v is not None)
+    tp = transport.get_transport()
+    service = transport.service_for(url)
+    cache = tp.cache
+    if cache is not None and cache.caches(service):
+        res = cache.lookup(service, url, params)
+        if res is not None:
+            return res.content
+    res = await _send(tp.policy_for(service), 'GET', _fetch, url, params, **kwargs)
+    res.raise_for_status()
+    if cache is not None and cache.caches(service):
+        cache.store(service, url, params, res)
+    return res.content
+
+async def _fetch(url, params, **kwargs):
+    # one GET on the shared pool, as a requests Response so that policies and
+    # the cache treat it like any other; connection errors and timeouts become
+    # their requests counterparts, which policies retry
+    session, semaphore = _pool()
+    try:
+        async with semaphore:
+            async with session.get(url, params=params, **kwargs) as out:
+                content = await out.read()
+                res = requests.models.Response()
+                res.status_code = out.status
+                res.reason = out.reason
+                res.url = str(out.url)
+                res.headers.update(out.headers)
+                res.encoding = out.charset
+                res._content = content
+                return res
+    except aiohttp.ClientConnectionError as e:
+        raise requests.exceptions.ConnectionError(e)
+    except asyncio.TimeoutError as e:
+        raise requests.exceptions.Timeout(e)
+
+async def _send(policy, method, fun, *args, **kwargs):
+    # Policy.send for a coroutine fun, waiting with asyncio.sleep
+    policy.breaker.allow()
+    ok = False
+    try:
+        res = await _attempts(policy, method, fun, args, kwargs)
+        ok = res.status_code not in retry_statuses
+        return res
+    finally:
+        policy.breaker.record(ok)
+        if not ok:
+            policy._add('failed', 1)
+
+async def _attempts(policy, method, fun, args, kwargs):
+    attempt = 0
+    while True:
+        waited = 0.0
+        wait = policy.bucket._take()
+        while wait > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+            wait = policy.bucket._take()
+        policy._add('sent', 1)
+        policy._add('waited', waited)
+        res = error = None
+        try:
+            res = await fun(*args, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            error = e
+        wait = policy._next(method, attempt, res, error)
+        if wait is None:
+            if error is not None:
+                raise error
+            return res
+        await asyncio.sleep(wait)
+        attempt += 1
+
+async def itis_ping(**kwargs):
+    return await _itiscall('getDescription', {}, **kwargs)
+
+@_local
+async def getacceptednamesfromtsn(tsn, **kwargs):
+    return await _itiscall("getAcceptedNamesFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getanymatchcount(x, **kwargs):
+    return await _itiscall("getAnyMatchCount", {'srchKey': x}, **kwargs)
+
+async def getcommentdetailfromtsn(tsn, **kwargs):
+    return await _itiscall("getCommentDetailFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getcommonnamesfromtsn(tsn, **kwargs):
+    return await _itiscall("getCommonNamesFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getcoremetadatafromtsn(tsn, **kwargs):
+    return await _itiscall("getCoreMetadataFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getcoveragefromtsn(tsn, **kwargs):
+    return await _itiscall("getCoverageFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getcredibilityratingfromtsn(tsn, **kwargs):
+    return await _itiscall("getCredibilityRatingFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getcredibilityratings(**kwargs):
+    return await _itiscall("getCredibilityRatings", {}, **kwargs)
+
+@_local
+async def getcurrencyfromtsn(tsn, **kwargs):
+    return await _itiscall("getCurrencyFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getdatedatafromtsn(tsn, **kwargs):
+    return await _itiscall("getDateDataFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getexpertsfromtsn(tsn, **kwargs):
+    return await _itiscall("getExpertsFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getfullhierarchyfromtsn(tsn, **kwargs):
+    return await _itiscall('getFullHierarchyFromTSN', {'tsn': tsn}, **kwargs)
+
+async def getfullrecordfromlsid(lsid, **kwargs):
+    return await _itiscall("getFullRecordFromLSID", {'lsid': lsid}, **kwargs)
+
+async def getfullrecordfromtsn(tsn, **kwargs):
+    return await _itiscall("getFullRecordFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getgeographicdivisionsfromtsn(tsn, **kwargs):
+    return await _itiscall("getGeographicDivisionsFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getgeographicvalues(**kwargs):
+    return await _itiscall("getGeographicValues", {}, **kwargs)
+
+@_local
+async def getglobalspeciescompletenessfromtsn(tsn, **kwargs):
+    return await _itiscall("getGlobalSpeciesCompletenessFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def gethierarchydownfromtsn(tsn, **kwargs):
+    return await _itiscall('getHierarchyDownFromTSN', {'tsn': tsn}, **kwargs)
+
+@_local
+async def gethierarchyupfromtsn(tsn, **kwargs):
+    return await _itiscall('getHierarchyUpFromTSN', {'tsn': tsn}, **kwargs)
+
+async def getitistermsfromcommonname(x, **kwargs):
+    return await _itiscall("getITISTermsFromCommonName", {'srchKey': x}, **kwargs)
+
+async def getitisterms(x, **kwargs):
+    return await _itiscall("getITISTerms", {'srchKey': x}, **kwargs)
+
+async def getitistermsfromscientificname(x, **kwargs):
+    return await _itiscall("getITISTermsFromScientificName", {'srchKey': x}, **kwargs)
+
+async def itis_hierarchy(tsn=None, what="full"):
+    '''
+    Get hierarchies for one or more TSN's concurrently; see
+    `pytaxize.itis_hierarchy`. Results are in the order of tsn.
+    '''
+    funs = {'full': getfullhierarchyfromtsn, 'up': gethierarchyupfromtsn}
+    fun = funs.get(what, gethierarchydownfromtsn)
+    return list(await asyncio.gather(*[fun(x) for x in convertsingle(tsn)]))
+
+@_local
+async def getjurisdictionaloriginfromtsn(tsn, **kwargs):
+    return await _itiscall("getJurisdictionalOriginFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getjurisdictionoriginvalues(**kwargs):
+    return await _itiscall("getJurisdictionalOriginValues", {}, **kwargs)
+
+async def getjurisdictionvalues(**kwargs):
+    return await _itiscall("getJurisdictionValues", {}, **kwargs)
+
+@_local
+async def getkingdomnamefromtsn(tsn, **kwargs):
+    return await _itiscall("getKingdomNameFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getkingdomnames(**kwargs):
+    return await _itiscall("getKingdomNames", {}, **kwargs)
+
+async def getlastchangedate(**kwargs):
+    return await _itiscall("getLastChangeDate", {}, **kwargs)
+
+@_local
+async def getlsidfromtsn(tsn, **kwargs):
+    return await _itiscall("getLSIDFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getothersourcesfromtsn(tsn, **kwargs):
+    return await _itiscall("getOtherSourcesFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getparenttsnfromtsn(tsn, **kwargs):
+    return await _itiscall("getParentTSNFromTSN", {'tsn': tsn}, **kwargs)
+
+async def getpublicationsfromtsn(tsn, **kwargs):
+    return await _itiscall("getPublicationsFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getranknames(**kwargs):
+    return await _itiscall("getRankNames", {}, **kwargs)
+
+async def getrecordfromlsid(lsid, **kwargs):
+    return await _itiscall("getRecordFromLSID", {'lsid': lsid}, **kwargs)
+
+async def getreviewyearfromtsn(tsn, **kwargs):
+    return await _itiscall("getReviewYearFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getscientificnamefromtsn(tsn, **kwargs):
+    return await _itiscall("getScientificNameFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def gettaxonauthorshipfromtsn(tsn, **kwargs):
+    return await _itiscall("getTaxonAuthorshipFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def gettaxonomicranknamefromtsn(tsn, **kwargs):
+    return await _itiscall("getTaxonomicRankNameFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def gettaxonomicusagefromtsn(tsn, **kwargs):
+    return await _itiscall("getTaxonomicUsageFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def gettsnbyvernacularlanguage(language, **kwargs):
+    return await _itiscall("getTsnByVernacularLanguage", {'language': language}, **kwargs)
+
+async def gettsnfromlsid(lsid, **kwargs):
+    return await _itiscall("getTSNFromLSID", {'lsid': lsid}, **kwargs)
+
+@_local
+async def getunacceptabilityreasonfromtsn(tsn, **kwargs):
+    return await _itiscall("getUnacceptabilityReasonFromTSN", {'tsn': tsn}, **kwargs)
+
+@_local
+async def getvernacularlanguages(**kwargs):
+    return await _itiscall("getVernacularLanguages", {}, **kwargs)
+
+@_local
+async def searchbycommonname(x, **kwargs):
+    return await _itiscall("searchByCommonName", {'srchKey': x}, **kwargs)
+
+@_local
+async def searchbycommonnamebeginswith(x, **kwargs):
+    return await _itiscall("searchByCommonNameBeginsWith", {'srchKey': x}, **kwargs)
+
+@_local
+async def searchbycommonnameendswith(x, **kwargs):
+    return await _itiscall("searchByCommonNameEndsWith", {'srchKey': x}, **kwargs)
+
+async def itis_searchcommon(x, which = "begin", **kwargs):
+    if which == "begin":
+        return await searchbycommonnamebeginswith(x, **kwargs)
+    else:
+        return await searchbycommonnameendswith(x, **kwargs)
+
+@_local
+async def searchbyscientificname(x, **kwargs):
+    return await _itiscall("searchByScientificName", {'srchKey': x}, **kwargs)
+
+async def searchforanymatch(x, **kwargs):
+    return await _itiscall("searchForAnyMatch", {'srchKey': x}, **kwargs)
+
+async def searchforanymatchpaged(x, pagesize, pagenum, ascend, **kwargs):
+    args = {'srchKey':x, 'pageSize':pagesize, 'pageNum':pagenum, 'ascend':ascend}
+    return await _itiscall("searchForAnyMatchPaged", args, **kwargs)
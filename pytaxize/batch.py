@@ -0,0 +1,61 @@
+'''
+Helpers for running many web service calls concurrently.
+'''
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+def _capture(fun):
+    def call(x):
+        try:
+            return fun(x), None
+        except Exception as e:
+            return None, e
+    return call
+
+def pmap(fun, items, max_workers=8):
+    '''
+    Apply fun to every item on a bounded thread pool.
+
+    :param fun: Function of one argument
+    :param items: Iterable of arguments
+    :param max_workers: Maximum number of calls running at the same time
+
+    Returns a list of (result, error) pairs in the order of items. error is
+    None on success; on failure result is None and error is the exception, so
+    one bad item does not abort the rest.
+    '''
+    with ThreadPoolExecutor(max_workers) as pool:
+        return list(pool.map(_capture(fun), items))
+
+def pmap_iter(fun, items, max_workers=8):
+    '''
+    Like pmap, but yields results as soon as each call is done.
+
+    :param fun: Function of one argument
+    :param items: Iterable of arguments
+    :param max_workers: Maximum number of calls running at the same time
+
+    Yields (index, result, error) triples in the order the calls finish, where
+    index is the position of the item in items. Items are taken from items as
+    calls finish, at most 2 * max_workers ahead. Closing the generator early
+    cancels the calls not started yet and returns without waiting for the
+    running ones.
+    '''
+    call = _capture(fun)
+    todo = enumerate(items)
+    pool = ThreadPoolExecutor(max_workers)
+    pending = {}
+    try:
+        while True:
+            for i, x in islice(todo, 2 * max_workers - len(pending)):
+                pending[pool.submit(call, x)] = i
+            if len(pending) == 0:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                result, error = f.result()
+                yield pending.pop(f), result, error
+    finally:
+        for f in pending:
+            f.cancel()
+        pool.shutdown(wait=False)
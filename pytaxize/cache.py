@@ -0,0 +1,240 @@
+'''
+Opt-in persistent cache for web service responses.
+
+Responses are stored in a SQLite file, keyed on the request URL with its query
+parameters normalized (sorted, None values dropped), so the same lookup made
+in a later session is answered from disk. Each service has its own time to
+live, and the least recently used entries are evicted once the cache grows
+past max_size bytes.
+
+Usage:
+>>> import pytaxize
+>>> from pytaxize import cache
+>>> cache.enable()  # ~/.cache/pytaxize/responses.sqlite
+>>> pytaxize.getfullhierarchyfromtsn(tsn = 37906)  # from the web
+>>> pytaxize.getfullhierarchyfromtsn(tsn = 37906)  # from disk
+>>> cache.get_cache().stats()
+{'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0, 'entries': 1, 'size': 2231}
+>>> cache.disable()
+'''
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import requests
+try:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+from pytaxize import transport
+
+day = 24 * 60 * 60
+
+# seconds a cached response stays valid, per service (see transport.services)
+default_ttl = {'itis': 30 * day, 'col': 30 * day, 'gnr': 7 * day}
+
+default_path = os.path.join(os.path.expanduser('~'), '.cache', 'pytaxize',
+    'responses.sqlite')
+
+class ResponseCache(object):
+    '''
+    A size-bounded SQLite cache of HTTP response bodies.
+
+    :param path: Path to the SQLite file, created if missing.
+    :param ttl: Dict mapping service name to time to live in seconds. Only
+        services listed here are cached. Defaults to default_ttl.
+    :param max_size: Maximum total size of cached bodies in bytes (default
+        1 GB). Least recently used entries are evicted beyond that.
+
+    Hits don't write to the file: an entry's access time is only updated when
+    it is older than touch_after seconds, and those updates are kept in memory
+    and written with the next store, or once flush_after of them are pending.
+    '''
+    touch_after = 60 * 60
+    flush_after = 1000
+
+    def __init__(self, path=None, ttl=None, max_size=1024 ** 3):
+        self.path = path or default_path
+        self.ttl = dict(default_ttl if ttl is None else ttl)
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._touched = {}
+        folder = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY, service TEXT, url TEXT, encoding TEXT,
+            content BLOB, size INTEGER, created REAL, accessed REAL)''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self._db.commit()
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def __repr__(self):
+        return """<%s %s>""" % (type(self).__name__, self.path)
+
+    def caches(self, service):
+        return service in self.ttl
+
+    def lookup(self, service, url, params=None):
+        '''
+        Get a cached response.
+
+        :param service: Service name, e.g. 'itis'
+        :param url: Request URL
+        :param params: Query parameters
+
+        Returns a requests Response, or None on a miss or an expired entry.
+        '''
+        url = cache_key(url, params)
+        key = _hash(url)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute('SELECT content, encoding, created, size, accessed FROM responses WHERE key = ?',
+                (key,)).fetchone()
+            if row is not None and now - row[2] > self.ttl.get(service, 0):
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._db.commit()
+                self._touched.pop(key, None)
+                self._size -= row[3]
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[4] > self.touch_after:
+                self._touched[key] = now
+                if len(self._touched) >= self.flush_after:
+                    self._flush()
+                    self._db.commit()
+            self.hits += 1
+        return cached_response(url, bytes(row[0]), row[1])
+
+    def store(self, service, url, params, response):
+        '''
+        Store the body of a response, evicting least recently used entries if
+        the cache grows past max_size.
+        '''
+        url = cache_key(url, params)
+        key = _hash(url)
+        content = response.content
+        now = time.time()
+        with self._lock:
+            old = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, service, url, response.encoding, sqlite3.Binary(content), len(content), now, now))
+            self._touched.pop(key, None)
+            self._size += len(content) - (old[0] if old else 0)
+            self.stores += 1
+            self._flush()
+            self._evict()
+            self._db.commit()
+
+    def _flush(self):
+        # write pending access times, so eviction sees recent hits
+        if self._touched:
+            self._db.executemany('UPDATE responses SET accessed = ? WHERE key = ?',
+                [(v, k) for k, v in self._touched.items()])
+            self._touched.clear()
+
+    def _evict(self):
+        while self._size > self.max_size:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 100').fetchall()
+            if len(rows) == 0:
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._size -= size
+                self.evictions += 1
+                if self._size <= self.max_size:
+                    break
+
+    def clear(self, service=None):
+        '''
+        Remove all cached responses, or only those of one service.
+        '''
+        with self._lock:
+            self._flush()
+            if service is None:
+                self._db.execute('DELETE FROM responses')
+            else:
+                self._db.execute('DELETE FROM responses WHERE service = ?', (service,))
+            self._db.commit()
+            self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def stats(self):
+        '''
+        Hit/miss counters for this session plus the current size of the cache.
+        '''
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        return {'hits': self.hits, 'misses': self.misses, 'stores': self.stores,
+                'evictions': self.evictions, 'entries': entries, 'size': self._size}
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._db.commit()
+            self._db.close()
+
+def cache_key(url, params=None):
+    '''
+    Normalize a URL and its query parameters into a cache key: parameters
+    with a value of None are dropped and the rest are sorted.
+    '''
+    full = requests.Request('GET', url, params=params).prepare().url
+    parts = urlsplit(full)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ''))
+
+def cached_response(url, content, encoding=None):
+    '''
+    Build a requests Response from a cached body.
+    '''
+    res = requests.models.Response()
+    res.status_code = 200
+    res.url = url
+    res._content = content
+    res.encoding = encoding
+    res.headers['X-Pytaxize-Cache'] = 'hit'
+    return res
+
+def _hash(url):
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+def enable(path=None, ttl=None, max_size=1024 ** 3):
+    '''
+    Turn on the persistent response cache for the shared transport.
+
+    :param path: Path to the SQLite file (default ~/.cache/pytaxize/responses.sqlite)
+    :param ttl: Dict of service name to time to live in seconds, e.g.
+        {'itis': 86400 * 90, 'col': 86400 * 30}. Defaults to default_ttl.
+    :param max_size: Maximum cache size in bytes (default 1 GB)
+
+    Returns the ResponseCache.
+    '''
+    disable()
+    cache = ResponseCache(path, ttl, max_size)
+    transport.get_transport().cache = cache
+    return cache
+
+def disable():
+    '''
+    Turn off the persistent response cache. Cached data stays on disk.
+    '''
+    tp = transport.get_transport()
+    if tp.cache is not None:
+        tp.cache.close()
+        tp.cache = None
+
+def get_cache():
+    '''
+    The ResponseCache in use, or None if caching is off.
+    '''
+    return transport.get_transport().cache
@@ -1,9 +1,12 @@
 import sys
-import requests
+from pytaxize import transport
 from lxml import etree
 import pandas as pd
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from pytaxize import ranks
+from pytaxize.batch import pmap
 
 def col_children(name = None, id = None, format = None, start = None, checklist = None):
     '''
@@ -130,29 +133,9 @@ def col_children(name = None, id = None, format = None, start = None, checklist
     '''
 
     def func(x, y):
-        url = "http://www.catalogueoflife.org/col/webservice"
-
-        if(checklist.__class__.__name__ == 'NoneType'):
-            pass
-        else:
-            if(checklist in ['2012','2011','2010']):
-                url = re.sub("col", "annual-checklist/" + checklist, url)
-            else:
-                url = "http://www.catalogueoflife.org/annual-checklist/year/webservice"
-                url = re.sub("year", checklist, url)
-
+        url = _col_url(checklist)
         payload = {'name':x, 'id':y, 'format':format, 'response':"full", 'start':start}
-        out = requests.get(url, params = payload)
-        out.raise_for_status()
-        xmlparser = etree.XMLParser()
-        tt = etree.fromstring(out.content, xmlparser)
-        childtaxa = tt.xpath('//child_taxa//taxon')
-        outlist = []
-        for i in range(len(childtaxa)):
-            tt_ = childtaxa[i].getchildren()
-            outlist.append([x.text for x in tt_[:3]])
-        df = pd.DataFrame(outlist, columns=['id','name','rank'])
-        return df
+        return _parse_children(_colGET(url, payload))
 
     if(id.__class__.__name__ == 'NoneType'):
         temp = []
@@ -167,7 +150,8 @@ def col_children(name = None, id = None, format = None, start = None, checklist
             temp.append(ss)
         return temp
 
-def col_downstream(name = None, downto = None, format = None, start = None, checklist = None):
+def col_downstream(name = None, downto = None, format = None, start = None,
+    checklist = None, max_workers = 8):
     '''
     :param name: The string to search for. Only exact matches found the name given
         will be returned, unless one or wildcards are included in the search
@@ -175,8 +159,8 @@ def col_downstream(name = None, downto = None, format = None, start = None, chec
         character may also be used. The name must be at least 3 characters long,
         not counting wildcard characters.
     :param downto: The taxonomic level you want to go down to. See examples below.
-        The taxonomic level IS case sensitive, and you do have to spell it
-        correctly. See \code{data(rank_ref)} for spelling.
+        The taxonomic level is not case sensitive, but you do have to spell it
+        correctly. See pytaxize/data/rank_ref.csv for spelling.
     :param checklist: The year of the checklist to query, if you want a specific
         year's checklist instead of the lastest as default (numeric).
     :param format: The returned format (default = None). If NULL xml is used.
@@ -187,8 +171,11 @@ def col_downstream(name = None, downto = None, format = None, start = None, chec
        returned by a single Web service query (currently the maximum number of
        results returned by a single query is 500 for terse queries and 50 for
        full queries).
+    :param max_workers: Maximum number of requests in flight at once
 
-    Returns a list of DataFrame's.
+    Returns a list of DataFrame's (columns id, name, rank), one per name, with
+    all taxa of rank downto below that name. See `col_downstream_iter` to get
+    results level by level as they arrive.
 
     Usage:
     # Some basic examples
@@ -199,79 +186,67 @@ def col_downstream(name = None, downto = None, format = None, start = None, chec
     >>> pytaxize.col_downstream(name=["Plantae","Animalia"], downto="Class")
 
     # Using a checklist from a specific year
-    >>> pytaxize.col_downstream(name=["Bryophyta"], downto=["Family"], checklist="2009")
+    >>> pytaxize.col_downstream(name=["Bryophyta"], downto="Family", checklist="2009")
     '''
-    url = "http://www.catalogueoflife.org/col/webservice"
-    def func(name):
-        if(checklist.__class__.__name__ == 'NoneType'):
-            pass
+    temp = []
+    for i in range(len(name)):
+        tt = list(col_downstream_iter(name[i], downto, format, start, checklist, max_workers))
+        if len(tt) > 0:
+            temp.append(pd.concat(tt, ignore_index=True))
         else:
-            if(checklist in ['2012','2011','2010']):
-                url = re.sub("col", "annual-checklist/" + checklist, url)
-            else:
-                url = "http://www.catalogueoflife.org/annual-checklist/year/webservice"
-                url = re.sub("year", checklist, url)
-
-        dat = pd.read_csv("rank_ref.csv", header=False)
-
-        stuff = [x for x in dat.ranks]
-        things = []
-        for i in range(len(stuff)):
-            ss = downto in stuff[i]
-            things.append(ss)
-        dat2 = dat.join(pd.DataFrame(things, columns=['match']))
-        subset = dat2[dat2.loc[dat2.match == True].index[0]: dat2.shape[0]]
-        torank = [x.split(',')[0] for x in subset.ranks]
-
-        toget = name
-        stop_ = "not"
-        notout = pd.DataFrame(columns=['rankName'])
-        out = []
-        iter = 0
-        while(stop_ == "not"):
-            iter = iter + 1
-
-            def searchcol(x):
-                payload = {'name':x, 'format':format, 'response':"full", 'start':start}
-                out = requests.get(url, params = payload)
-                out.raise_for_status()
-                xmlparser = etree.XMLParser()
-                tt = etree.fromstring(out.content, xmlparser)
-                childtaxa = tt.xpath('//child_taxa//taxon')
-                outlist = []
-                for i in range(len(childtaxa)):
-                    tt_ = childtaxa[i].getchildren()
-                    outlist.append([x.text for x in tt_[:3]])
-                df = pd.DataFrame(outlist, columns=['id','name','rank'])
-                return df
-
-            tt = searchcol(toget)
-
-            if(downto in [x for x in tt['rank']]):
-                out.append(tt.loc[tt['rank'] == downto])
-
-            if(tt.loc[tt['rank'] != downto].index[-1] > 0):
-                sh = [x for x in tt['rank']]
-                bb = []
-                for i in range(len(sh)):
-                  bb.append(sh[i] in torank)
-                notout = tt[bb]
-            else:
-                notout = pd.DataFrame(downto, columns=['rankName'])
+            temp.append(pd.DataFrame(columns=['id','name','rank']))
+    return temp
 
-            if(all(notout['rank'] == downto)):
-                stop_ = "fam"
-            else:
-                toget = notout['name']
-                stop_ = "not"
+def col_downstream_iter(name, downto, format = None, start = None,
+    checklist = None, max_workers = 8):
+    '''
+    Walk Catalogue of Life breadth-first from a taxon down to a rank.
 
-        return out
+    Each level of the tree is expanded with up to max_workers concurrent
+    requests. Taxa of rank downto are collected, taxa ranked above it or of a
+    rank not in rank_ref.csv are expanded further, and ids already seen are
+    not visited again.
 
-    temp = []
-    for i in range(len(name)):
-        tt = func(name[i])
-        temp.append = tt
-    return temp
+    :param name: A single taxon name to start from
+    :param downto: The taxonomic level to go down to, e.g. "Species"
+    :param format: See `col_downstream`
+    :param start: See `col_downstream`
+    :param checklist: The year of the checklist to query
+    :param max_workers: Maximum number of requests in flight at once
+
+    Yields a DataFrame (columns id, name, rank) of the downto taxa found at
+    each level, as soon as that level is complete.
+
+    Usage:
+    >>> for df in pytaxize.col_downstream_iter("Bryophyta", downto="Family"):
+    ...     print(df.shape)
+    '''
+    target = ranks.rank_id(downto)
+    if target is None:
+        raise ValueError("Unknown rank '%s'; see pytaxize/data/rank_ref.csv" % downto)
+    url = _col_url(checklist)
+
+    def children(query):
+        payload = dict(query, format=format, response="full", start=start)
+        return _parse_children(_colGET(url, payload))
+
+    seen = set()
+    frontier = [{'name': name}]
+    while len(frontier) > 0:
+        level = []
+        for df, error in pmap(children, frontier, max_workers):
+            if error is not None:
+                raise error
+            level.append(df)
+        level = pd.concat(level, ignore_index=True).drop_duplicates('id')
+        level = level[~level['id'].isin(seen)]
+        seen.update(level['id'])
+        rid = ranks.rank_id_many(level['rank'])
+        found = level[rid == target]
+        if found.shape[0] > 0:
+            yield found.reset_index(drop=True)
+        # unknown ranks (rid 0) may sit above downto, so expand them too
+        frontier = [{'id': x} for x in level['id'][rid < target]]
 
 def col_search(name=None, id=None, start=None, checklist=None):
     '''
@@ -295,6 +270,9 @@ def col_search(name=None, id=None, start=None, checklist=None):
     You must provide one of name or id. The other parameters (format
         and start) are optional.
 
+    For a synonym, id, name and name_status are those of the synonym itself;
+    accepted_name and accepted_name_id give the name it is a synonym of.
+
     Usage:
 
     # A basic example
@@ -315,37 +293,9 @@ def col_search(name=None, id=None, start=None, checklist=None):
     '''
 
     def func(x, y):
-        url = "http://www.catalogueoflife.org/col/webservice"
-        if(checklist.__class__.__name__ == 'NoneType'):
-            pass
-        else:
-            if(checklist in ['2012','2011','2010']):
-                url = re.sub("col", "annual-checklist/" + checklist, url)
-            else:
-                url = "http://www.catalogueoflife.org/annual-checklist/year/webservice"
-                url = re.sub("year", checklist, url)
-
+        url = _col_url(checklist)
         payload = {'name': x, 'id': y, 'start': start}
-        out = requests.get(url, params = payload)
-        out.raise_for_status()
-        xmlparser = etree.XMLParser()
-        tt = etree.fromstring(out.content, xmlparser)
-        stuff = tt.xpath('//result')
-        outlist = []
-        for i in range(len(stuff)):
-            tt_ = stuff[i]
-            each = {}
-            for g in range(len(tt_)):
-                for e in tt_[g].iter():
-                    each.update({e.tag: e.text})
-            outlist.append(each)
-            # values = [x.text for x in tt_[:4]]
-            # tags = [x.tag for x in tt_[:4]]
-            # mydict = dict(zip(tags, values))
-        df = pd.DataFrame(outlist)
-        # tt_ = stuff[0].getchildren()
-        # res = [x.text for x in tt_[:4]]
-        return df
+        return _parse_search(_colGET(url, payload))
 
         # tt = xmlParse(out)
         # toget = c('id','name','rank','name_status')
@@ -379,6 +329,138 @@ def col_search(name=None, id=None, start=None, checklist=None):
 
     #     return cbind(bb, accdf)
 
+def col_children_iter(name = None, id = None, format = None, start = None,
+    checklist = None, prefetch = True):
+    '''
+    Stream the direct children of a taxon from Catalogue of Life, page by page.
+
+    Like `col_children`, but for a single name or id, and instead of fetching
+    one page this follows the `start` offset until all results are read. Only
+    the current (and, with prefetch, the next) page is held in memory.
+
+    :param name: The string to search for, see `col_children`
+    :param id: The record ID of the specific record to return
+    :param format: format of the results returned, see `col_children`
+    :param start: The first record to return (default 0)
+    :param checklist: The year of the checklist to query
+    :param prefetch: If True (default), fetch the next page in the background
+        while the current one is being consumed
+
+    Yields one DataFrame (columns id, name, rank) per page.
+
+    Usage:
+    >>> import pytaxize
+    >>> for df in pytaxize.col_children_iter(name="Apis"):
+    ...     print(df.shape)
+    >>> import pandas as pd
+    >>> pd.concat(pytaxize.col_children_iter(name="Buteo"))
+    '''
+    payload = {'name':name, 'id':id, 'format':format, 'response':"full"}
+    return _col_pages(_col_url(checklist), payload, _parse_children, start, prefetch)
+
+def col_search_iter(name = None, id = None, start = None, checklist = None,
+    prefetch = True):
+    '''
+    Stream Catalogue of Life search results, page by page.
+
+    Like `col_search`, but for a single name or id, and instead of fetching
+    one page this follows the `start` offset until all results are read, so
+    wildcard searches with tens of thousands of hits can be consumed with
+    flat memory.
+
+    :param name: The string to search for, see `col_search`
+    :param id: The record ID of the specific record to return
+    :param start: The first record to return (default 0)
+    :param checklist: The year of the checklist to query
+    :param prefetch: If True (default), fetch the next page in the background
+        while the current one is being consumed
+
+    Yields one DataFrame per page.
+
+    Usage:
+    >>> import pytaxize
+    >>> for df in pytaxize.col_search_iter(name="Poa*"):
+    ...     print(df[['id','name','rank']].head())
+    '''
+    payload = {'name': name, 'id': id}
+    return _col_pages(_col_url(checklist), payload, _parse_search, start, prefetch)
+
+## helper functions
+def _col_url(checklist):
+    url = "http://www.catalogueoflife.org/col/webservice"
+    if(checklist.__class__.__name__ == 'NoneType'):
+        pass
+    else:
+        if(checklist in ['2012','2011','2010']):
+            url = re.sub("col", "annual-checklist/" + checklist, url)
+        else:
+            url = "http://www.catalogueoflife.org/annual-checklist/year/webservice"
+            url = re.sub("year", checklist, url)
+    return url
+
+def _colGET(url, payload):
+    out = transport.get(url, params = payload)
+    out.raise_for_status()
+    xmlparser = etree.XMLParser()
+    return etree.fromstring(out.content, xmlparser)
+
+def _col_pages(url, payload, parse, start, prefetch):
+    start = start or 0
+    pool = ThreadPoolExecutor(1) if prefetch else None
+    def fetch(x):
+        return _colGET(url, dict(payload, start=x))
+    try:
+        tt = fetch(start)
+        while True:
+            returned = int(tt.get('number_of_results_returned') or 0)
+            total = int(tt.get('total_number_of_results') or 0)
+            start = start + returned
+            following = None
+            if returned > 0 and start < total:
+                following = pool.submit(fetch, start) if prefetch else start
+            yield parse(tt)
+            if following is None:
+                break
+            tt = following.result() if prefetch else fetch(following)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+def _parse_children(tt):
+    childtaxa = tt.xpath('//child_taxa//taxon')
+    outlist = []
+    for i in range(len(childtaxa)):
+        tt_ = childtaxa[i].getchildren()
+        outlist.append([x.text for x in tt_[:3]])
+    df = pd.DataFrame(outlist, columns=['id','name','rank'])
+    return df
+
+def _parse_search(tt):
+    # one row per result. The result's own fields come first; nested elements
+    # (the accepted_name of a synonym, classification) are flattened as before
+    # but only fill columns the result doesn't have, so they no longer
+    # overwrite its id, name and status. A nested record also gives its name
+    # and id, e.g. accepted_name and accepted_name_id
+    stuff = tt.xpath('//result')
+    outlist = []
+    for tt_ in stuff:
+        each = {}
+        nested = []
+        for e in tt_:
+            if(len(e) > 0):
+                nested.append(e)
+                each[e.tag] = e.findtext('name', e.text)
+                if(e.find('id') is not None):
+                    each[e.tag + '_id'] = e.findtext('id')
+            else:
+                each[e.tag] = e.text
+        for e in nested:
+            for x in e.iterdescendants():
+                each.setdefault(x.tag, x.text)
+        outlist.append(each)
+    df = pd.DataFrame(outlist)
+    return df
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,164 @@
+'''
+Datasets bundled with pytaxize, in pytaxize/data.
+
+Each dataset is read the first time it is asked for and kept in memory, so
+`names_list`, the rank table and the checklists of `NameIndex` cost one read
+per process. If a compact copy (a pickle with categorical columns, made by
+`compact`) is in `compact_dir` and is not older than the CSV, that is loaded
+instead, which is faster than parsing the CSV. The copies are kept in the
+user's cache folder (default ~/.cache/pytaxize/data), since the installed
+package may be read-only.
+
+Make the compact copies once per installation:
+python -m pytaxize.datasets compact
+
+Usage:
+>>> from pytaxize import datasets
+>>> datasets.load('apg_families').head()
+>>> datasets.dataset_path('rank_ref')
+'''
+import os
+import sys
+import threading
+import pandas as pd
+try:
+    from importlib.resources import files as resource_files
+except ImportError:
+    resource_files = None
+
+# dataset name: (file in pytaxize/data, columns stored as categoricals in the compact copy)
+registry = {
+    'plantNames': ('plantNames.csv', []),
+    'plantGenusNames': ('plantGenusNames.csv', []),
+    'apg_families': ('apg_families.csv', ['that', 'order']),
+    'apg_orders': ('apg_orders.csv', ['that']),
+    'rank_ref': ('rank_ref.csv', []),
+}
+
+# checklists by rank: dataset and the column holding the names
+checklists = {
+    'species': ('plantNames', 'names'),
+    'genus': ('plantGenusNames', 'names'),
+    'family': ('apg_families', 'this'),
+    'order': ('apg_orders', 'this'),
+}
+
+# folder of the compact copies
+compact_dir = os.path.join(os.path.expanduser('~'), '.cache', 'pytaxize', 'data')
+
+_loaded = {}
+_names = {}
+_lock = threading.Lock()
+
+def dataset_path(name, compact=False):
+    '''
+    Path of a bundled dataset.
+
+    :param name: A dataset name, one of the keys of `registry`
+    :param compact: Path of the compact copy in `compact_dir` instead of the
+        CSV (which may not exist)
+    '''
+    if name not in registry:
+        raise ValueError("no dataset '%s', one of %s" % (name, ', '.join(sorted(registry))))
+    filename = registry[name][0]
+    if compact:
+        return os.path.join(compact_dir, os.path.splitext(filename)[0] + '.pkl')
+    if resource_files is not None:
+        return str(resource_files('pytaxize').joinpath('data').joinpath(filename))
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', filename)
+
+def load(name):
+    '''
+    A bundled dataset as a DataFrame, read once per process.
+
+    :param name: A dataset name, one of the keys of `registry`
+
+    The same DataFrame is returned on every call; copy it before changing it.
+
+    Usage:
+    >>> from pytaxize import datasets
+    >>> datasets.load('plantGenusNames')['names'][:3].tolist()
+    ['Anomacanthus', 'Monothecium', 'Trichosanchezia']
+    '''
+    dat = _loaded.get(name)
+    if dat is None:
+        with _lock:
+            dat = _loaded.get(name)
+            if dat is None:
+                dat = _read(name)
+                _loaded[name] = dat
+    return dat
+
+def checklist(rank):
+    '''
+    The names of a bundled checklist as a Series.
+
+    :param rank: One of species, genus, family, order
+    '''
+    if rank not in checklists:
+        raise ValueError("rank must be one of %s" % ', '.join(sorted(checklists)))
+    name, column = checklists[rank]
+    return load(name)[column]
+
+def checklist_names(rank):
+    '''
+    The names of a bundled checklist as a tuple, made once; quicker than
+    `checklist` for taking a few names at a time.
+
+    :param rank: One of species, genus, family, order
+    '''
+    names = _names.get(rank)
+    if names is None:
+        names = tuple(checklist(rank).tolist())
+        _names[rank] = names
+    return names
+
+def compact(names=None):
+    '''
+    Write compact copies of bundled datasets to `compact_dir`.
+
+    :param names: Dataset names (default: all)
+
+    Returns the paths written.
+    '''
+    if not os.path.isdir(compact_dir):
+        os.makedirs(compact_dir)
+    out = []
+    for name in (names or sorted(registry)):
+        dat = _read_csv(name)
+        dat.to_pickle(dataset_path(name, compact=True))
+        out.append(dataset_path(name, compact=True))
+    return out
+
+def clear():
+    '''
+    Forget the datasets loaded so far; the next `load` reads them again.
+    '''
+    with _lock:
+        _loaded.clear()
+        _names.clear()
+
+## helper functions
+def _read(name):
+    csv = dataset_path(name)
+    pkl = dataset_path(name, compact=True)
+    if os.path.isfile(pkl) and os.path.getmtime(pkl) >= os.path.getmtime(csv):
+        try:
+            return pd.read_pickle(pkl)
+        except Exception:
+            # made by another pandas version; the CSV is always there
+            pass
+    return _read_csv(name)
+
+def _read_csv(name):
+    dat = pd.read_csv(dataset_path(name))
+    for column in registry[name][1]:
+        dat[column] = dat[column].astype('category')
+    return dat
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == 'compact':
+        for path in compact(sys.argv[2:]):
+            print(path)
+    else:
+        sys.exit("usage: python -m pytaxize.datasets compact [NAME ...]")
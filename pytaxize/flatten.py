@@ -0,0 +1,176 @@
+'''
+Flatten nested Vascan and Global Names Resolver results into related tables.
+
+`vascan_tables` and `gnr_tables` return a dict of DataFrames linked by integer
+ids, like tables of a database. Columns with few distinct values (localities,
+statuses, ranks, languages, sources, data source titles) are categoricals, so
+big batches stay small in memory. `vascan_flat` joins the Vascan tables into
+one DataFrame with a row per name and accepted or synonym assertion.
+
+Usage:
+>>> import pytaxize
+>>> from pytaxize import flatten
+>>> tabs = flatten.vascan_tables(pytaxize.vascan_search(q = ["Helianthus annuus", "Crataegus dodgei"]))
+>>> tabs['distributions'].merge(tabs['matches'], on='match_id')
+>>> names = ['Helianthus annus', 'Poa annua']
+>>> tabs = flatten.gnr_tables(pytaxize.gnr_resolve(names), names)
+>>> tabs['classification'].query("rank == 'family'")
+'''
+import pandas as pd
+from collections import OrderedDict
+
+# table: (columns, the ones stored as categoricals)
+vascan_schema = {
+    'names': (['name_id', 'supplied_name', 'searchedTerm', 'numMatches'], []),
+    'matches': (['match_id', 'name_id', 'taxonID', 'scientificName',
+        'scientificNameAuthorship', 'canonicalName', 'taxonRank'], ['taxonRank']),
+    'assertions': (['match_id', 'acceptedNameUsage', 'acceptedNameUsageID',
+        'taxonomicStatus', 'parentNameUsageID', 'higherClassification',
+        'nameAccordingTo', 'nameAccordingToID'],
+        ['taxonomicStatus', 'higherClassification', 'nameAccordingTo', 'nameAccordingToID']),
+    'vernaculars': (['match_id', 'vernacularName', 'language', 'preferredName', 'source'],
+        ['language', 'source']),
+    'distributions': (['match_id', 'locationID', 'locality', 'establishmentMeans',
+        'occurrenceStatus'], ['locationID', 'locality', 'establishmentMeans', 'occurrenceStatus']),
+}
+
+vascan_flat_columns = ['supplied_name', 'searchedTerm', 'numMatches', 'taxonID', 'scientificName',
+    'canonicalName', 'taxonRank', 'acceptedNameUsage', 'acceptedNameUsageID',
+    'taxonomicStatus', 'distribution']
+
+gnr_schema = {
+    'names': (['name_id', 'supplied_name', 'n_results'], []),
+    'results': (['result_id', 'name_id', 'name_string', 'canonical_form', 'match_type',
+        'score', 'prescore', 'data_source_id', 'data_source_title', 'taxon_id',
+        'local_id', 'gni_uuid', 'url'], ['data_source_title', 'prescore']),
+    'classification': (['result_id', 'level', 'name', 'rank', 'id'], ['name', 'rank']),
+}
+
+def vascan_tables(res, names=None):
+    '''
+    Flatten Vascan search results into related tables.
+
+    :param res: Output of vascan_search or vascan_search_bulk (parsed JSON),
+        or its 'results' list
+    :param names: The names searched, in the same order (optional; Vascan
+        returns them as searchedTerm, which may be spelled differently)
+
+    Returns a dict of DataFrames:
+    names: one row per searched name (name_id, supplied_name, searchedTerm,
+        numMatches)
+    matches: one row per matching taxon (match_id, name_id, taxonID, ...)
+    assertions: accepted name and status of each match (match_id, ...)
+    vernaculars: vernacular names of each match (match_id, ...)
+    distributions: provinces and status of each match (match_id, ...)
+    '''
+    results = res['results'] if hasattr(res, 'keys') else res
+    tnames = pd.DataFrame(list(results), columns=['searchedTerm', 'numMatches', 'matches'])
+    tnames.insert(0, 'name_id', range(tnames.shape[0]))
+    tnames.insert(1, 'supplied_name', list(names) if names is not None else None)
+    tnames['numMatches'] = tnames['numMatches'].fillna(0).astype(int)
+    matches = _nested(tnames, 'name_id', 'matches')
+    matches.insert(0, 'match_id', range(matches.shape[0]))
+    out = {'names': tnames, 'matches': matches}
+    for table, key in [('assertions', 'taxonomicAssertions'),
+                       ('vernaculars', 'vernacularNames'), ('distributions', 'distribution')]:
+        out[table] = _nested(matches, 'match_id', key)
+    return dict((table, _shape(df, *vascan_schema[table])) for table, df in out.items())
+
+def vascan_flat(res, names=None):
+    '''
+    Flatten Vascan search results into one DataFrame.
+
+    :param res: Output of vascan_search or vascan_search_bulk (parsed JSON),
+        or its 'results' list
+    :param names: The names searched, in the same order (optional)
+
+    Returns one row per searched name and accepted or synonym assertion, with
+    columns supplied_name, searchedTerm, numMatches, taxonID, scientificName,
+    canonicalName, taxonRank, acceptedNameUsage, acceptedNameUsageID,
+    taxonomicStatus and distribution (locality:occurrenceStatus pairs joined by ';'). Names
+    without a match have one row with numMatches 0. It is a join of the
+    tables of `vascan_tables`.
+    '''
+    tabs = vascan_tables(res, names)
+    dist = tabs['distributions']
+    pairs = dist['locality'].astype(str) + ':' + dist['occurrenceStatus'].astype(str)
+    joined = pairs.groupby(dist['match_id']).agg(';'.join)
+    out = tabs['names'].merge(tabs['matches'], on='name_id', how='left')
+    out = out.merge(tabs['assertions'], on='match_id', how='left')
+    out['distribution'] = out['match_id'].map(joined)
+    return out[vascan_flat_columns]
+
+def gnr_tables(res, names=None):
+    '''
+    Flatten Global Names Resolver results into related tables.
+
+    :param res: Output of gnr_resolve or gnr_resolve_bulk: one list of results
+        per name
+    :param names: The names resolved, in the same order (optional; gnr_resolve
+        does not return them)
+
+    Returns a dict of DataFrames:
+    names: one row per name (name_id, supplied_name, n_results)
+    results: one row per match (result_id, name_id, name_string, canonical_form,
+        score, data_source_title, ...)
+    classification: the classification path of each match split into one row
+        per level (result_id, level, name, rank, id), from the top down
+    '''
+    cols = _columns(gnr_schema)
+    tnames, results, classification = cols['names'], cols['results'], cols['classification']
+    result_id = 0
+    for name_id, each in enumerate(res):
+        tnames['name_id'].append(name_id)
+        tnames['supplied_name'].append(names[name_id] if names is not None else None)
+        tnames['n_results'].append(len(each))
+        for r in each:
+            _append(results, r, result_id, name_id=name_id)
+            path = r.get('classification_path') or ''
+            if(len(path) > 0):
+                parts = path.split('|')
+                ranks = (r.get('classification_path_ranks') or '').split('|')
+                ids = (r.get('classification_path_ids') or '').split('|')
+                for level, x in enumerate(parts):
+                    if(len(x) == 0):
+                        continue
+                    classification['result_id'].append(result_id)
+                    classification['level'].append(level)
+                    classification['name'].append(x)
+                    classification['rank'].append(_at(ranks, level))
+                    classification['id'].append(_at(ids, level))
+            result_id += 1
+    return _tables(gnr_schema, cols)
+
+## helper functions
+def _columns(schema):
+    return dict((table, OrderedDict((c, []) for c in columns)) for table, (columns, cat) in schema.items())
+
+def _append(table, record, key, **extra):
+    # first column is the table's key (or the key of the table it belongs to)
+    columns = iter(table.items())
+    next(columns)[1].append(key)
+    for c, values in columns:
+        values.append(extra[c] if c in extra else record.get(c))
+
+def _nested(parent, key, column):
+    # one row per element of the lists in column, with the key of its parent;
+    # Vascan records hold no nested objects besides these lists, so the
+    # DataFrame constructor builds them without json_normalize's per-record walk
+    pairs = parent.reindex(columns=[key, column]).explode(column)
+    pairs = pairs[pairs[column].notnull()]
+    df = pd.DataFrame(pairs[column].tolist())
+    df.insert(0, key, pairs[key].values)
+    return df
+
+def _shape(df, columns, cat):
+    df = df.reindex(columns=columns)
+    for c in cat:
+        df[c] = pd.Categorical(df[c])
+    return df
+
+def _at(x, i):
+    return x[i] if i < len(x) and len(x[i]) > 0 else None
+
+def _tables(schema, cols):
+    return dict((table, _shape(pd.DataFrame(cols[table], columns=columns), columns, cat))
+        for table, (columns, cat) in schema.items())
@@ -0,0 +1,189 @@
+'''
+Fuzzy matching of names against a checklist, locally.
+
+A NameIndex keeps an inverted index of the trigrams of every name in a
+checklist. A lookup finds the names that share enough trigrams with the query
+to be within the allowed edit distance (an edit changes at most three
+trigrams), and computes the edit distance only for those. Typos such as
+'Helianthus annus' are resolved without a request; what doesn't match can
+still be sent to `gnr_resolve`.
+
+Usage:
+>>> import pytaxize
+>>> idx = pytaxize.NameIndex.from_dataset('species')
+>>> idx.match('Ruelia solitaria')
+[('Ruellia solitaria', 1, 0.941)]
+>>> idx = pytaxize.NameIndex(['Helianthus annuus', 'Helianthus petiolaris'])
+>>> idx.match_many(['Helianthus annus', 'Helianthus petiolaris', 'Poa annua'])
+'''
+import re
+import numpy as np
+import pandas as pd
+from pytaxize import datasets
+
+_space = re.compile(r'\s+', re.U)
+
+class NameIndex(object):
+    '''
+    Trigram index over a list of names, for fuzzy lookups.
+
+    :param names: A list or pandas Series of names, e.g. a checklist
+    :param maxdist: Default largest edit distance (insertions, deletions and
+        substitutions) for a match. Default: 2
+
+    Matching ignores case and repeated white space.
+
+    Usage:
+    >>> import pytaxize
+    >>> idx = pytaxize.NameIndex(['Helianthus annuus', 'Helianthus petiolaris'])
+    >>> idx.match('helianthus anuus')
+    [('Helianthus annuus', 1, 0.941)]
+    '''
+    def __init__(self, names, maxdist=2):
+        self.maxdist = maxdist
+        self.names = []
+        self._exact = {}
+        keys = []
+        for x in names:
+            if x.__class__.__name__ not in ['str', 'unicode']:
+                continue
+            key = _normalize(x)
+            if len(key) == 0 or key in self._exact:
+                continue
+            self._exact[key] = len(self.names)
+            self.names.append(x)
+            keys.append(key)
+        self._keys = keys
+        self._lens = np.array([len(x) for x in keys], dtype=np.int32)
+        postings = {}
+        for i, key in enumerate(keys):
+            for g in set(_trigrams(key)):
+                postings.setdefault(g, []).append(i)
+        self._postings = dict((g, np.array(ids, dtype=np.int32)) for g, ids in postings.items())
+
+    @classmethod
+    def from_dataset(cls, rank='species', maxdist=2):
+        '''
+        Index one of the checklists bundled with pytaxize.
+
+        :param rank: One of species, genus, family, order (the lists behind
+            `names_list`)
+        :param maxdist: Default largest edit distance for a match
+        '''
+        return cls(datasets.checklist(rank), maxdist)
+
+    def __repr__(self):
+        return """<%s %d names, %d trigrams>""" % (type(self).__name__,
+            len(self.names), len(self._postings))
+
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, name, limit=1, maxdist=None):
+        '''
+        Closest names in the index.
+
+        :param name: A name
+        :param limit: Number of matches to return, at most. Default: 1
+        :param maxdist: Largest edit distance for a match. Default: the index's
+
+        Returns a list of (name, distance, score) tuples, closest first, where
+        score is 1 - distance / length of the longer name. The list is empty if
+        nothing is within maxdist.
+        '''
+        if maxdist is None:
+            maxdist = self.maxdist
+        if name.__class__.__name__ not in ['str', 'unicode']:
+            return []
+        key = _normalize(name)
+        i = self._exact.get(key)
+        if i is not None and limit == 1:
+            return [(self.names[i], 0, 1.0)]
+        grams = set(_trigrams(key))
+        repeated = len(key) + 2 - len(grams)
+        grams = [g for g in grams if g in self._postings]
+        if len(grams) == 0:
+            return []
+        ids, shared = np.unique(np.concatenate([self._postings[g] for g in grams]),
+            return_counts=True)
+        # each edit changes at most 3 trigrams, so a name within maxdist shares
+        # at least max(trigrams of either) - 3 * maxdist of them; shared counts
+        # distinct trigrams, so allow for the ones repeated in the query
+        lens = self._lens[ids]
+        need = np.maximum(lens, len(key)) + 2 - 3 * maxdist - repeated
+        keep = (shared >= need) & (np.abs(lens - len(key)) <= maxdist)
+        ids = ids[keep][np.argsort(-shared[keep], kind='stable')]
+        out = []
+        bound = maxdist
+        for i in ids:
+            d = _distance(key, self._keys[i], bound)
+            if d <= bound:
+                out.append((self.names[i], d, round(1 - d / float(max(len(key), self._lens[i])), 3)))
+                if limit == 1:
+                    # only closer names can beat this one
+                    bound = d
+        out.sort(key=lambda x: (x[1], -x[2]))
+        return out[:limit]
+
+    def match_many(self, names, maxdist=None):
+        '''
+        Best match for each of many names, e.g. a column of a DataFrame.
+
+        :param names: A list or pandas Series of names
+        :param maxdist: Largest edit distance for a match. Default: the index's
+
+        Returns a DataFrame with columns submittedName, matchedName, distance
+        and score, one row per name in the order given (keeping the index of a
+        Series). Each distinct name is looked up once; names with no match have
+        matchedName None.
+        '''
+        index = None
+        if(names.__class__.__name__ == 'Series'):
+            index = names.index
+        codes, uniq = pd.factorize(pd.Series(list(names), dtype=object))
+        codes[codes < 0] = len(uniq)
+        rows = []
+        for x in uniq:
+            best = self.match(x, 1, maxdist)
+            rows.append([best[0][0], best[0][1], best[0][2]] if len(best) > 0 else [None, np.nan, np.nan])
+        rows.append([None, np.nan, np.nan])
+        df = pd.DataFrame(rows, columns=['matchedName', 'distance', 'score']).take(codes)
+        df.insert(0, 'submittedName', list(names))
+        df.index = index if index is not None else pd.RangeIndex(len(codes))
+        return df
+
+## helper functions
+def _normalize(x):
+    return _space.sub(' ', x.strip().lower())
+
+def _trigrams(x):
+    x = '  ' + x + ' '
+    return [x[i:i + 3] for i in range(len(x) - 2)]
+
+def _distance(a, b, maxdist):
+    # Levenshtein distance within a band of width maxdist; anything further
+    # apart is returned as maxdist + 1
+    if abs(len(a) - len(b)) > maxdist:
+        return maxdist + 1
+    big = maxdist + 1
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        lo = max(1, i - maxdist)
+        hi = min(len(b), i + maxdist)
+        cur = [big] * (len(b) + 1)
+        cur[0] = i if i <= maxdist else big
+        ca = a[i - 1]
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            d = prev[j - 1] if ca == b[j - 1] else prev[j - 1] + 1
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+            if cur[j - 1] + 1 < d:
+                d = cur[j - 1] + 1
+            cur[j] = d
+            if d < best:
+                best = d
+        if best > maxdist:
+            return big
+        prev = cur
+    return min(prev[len(b)], big)
@@ -1,5 +1,5 @@
 import sys
-import requests
+from pytaxize import transport
 import json
 
 class NoResultException(Exception):
@@ -37,7 +37,7 @@ def gni_parse(names):
     '''
     url = 'http://gni.globalnames.org/parsers.json'
     names = '|'.join(names)
-    out = requests.get(url, params = {'names': names})
+    out = transport.get(url, params = {'names': names})
     out.raise_for_status()
     return out.json()
 
@@ -54,7 +54,7 @@ def gni_search(search_term='ani*', per_page=30, page=1):
     >>> pytaxize.gni_search(search_term = 'ani*')
     '''
     url = 'http://gni.globalnames.org/name_strings.json'
-    out = requests.get(url, params = {'search_term': search_term, 'per_page': per_page, 'page': page})
+    out = transport.get(url, params = {'search_term': search_term, 'per_page': per_page, 'page': page})
     out.raise_for_status()
     return out.json()
 
@@ -104,7 +104,7 @@ def gni_details(id=17802847, all_records=1):
     url = 'http://gni.globalnames.org/name_strings/'
     mylist = [url, str(id), '.json']
     url2 = ''.join(mylist)
-    out = requests.get(url2, params = {'all_records': all_records})
+    out = transport.get(url2, params = {'all_records': all_records})
     out.raise_for_status()
     try:
         data = out.json()
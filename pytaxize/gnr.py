@@ -1,7 +1,9 @@
 import sys
-import requests
+from pytaxize import transport
 import pandas as pd
 import json
+from collections import OrderedDict
+from pytaxize.batch import pmap
 
 class NoResultException(Exception):
     pass
@@ -38,7 +40,7 @@ def gnr_datasources(todf=True):
     '''
     url = "http://resolver.globalnames.org/data_sources.json"
     if(todf):
-        out = requests.get(url)
+        out = transport.get(url)
         out.raise_for_status()
         out = out.json()
         data = []
@@ -46,7 +48,7 @@ def gnr_datasources(todf=True):
             data.append([out[i]['id'],out[i]['title']])
         df = pd.DataFrame(data, columns=['id','title'])
     else:
-        df = requests.get(url)
+        df = transport.get(url)
         df.raise_for_status()
         df = df.json()
     return df
@@ -61,7 +63,7 @@ def gnr_resolve(names='Homo sapiens', source=None, format='json', resolve_once='
     :param format: One of json or xml
     :param resolve_once: Logical, true or false
     :param with_context: Return context with taxonomic names
-    :param best_match_only: Logical, if true (default) return the best match only
+    :param best_match_only: Logical, if true return the best match only (default: false)
     :param header_only: Return header only, logical
     :param preferred_data_sources: Return only preferred data sources.
 
@@ -80,7 +82,7 @@ def gnr_resolve(names='Homo sapiens', source=None, format='json', resolve_once='
                 'resolve_once': resolve_once, 'with_context': with_context,
                 'best_match_only': best_match_only, 'header_only': header_only,
                 'preferred_data_sources': preferred_data_sources}
-    out = requests.get(url, params = payload)
+    out = transport.get(url, params = payload)
     out.raise_for_status()
     result_json = out.json()
     # Return [] for each query with no returned result
@@ -88,7 +90,64 @@ def gnr_resolve(names='Homo sapiens', source=None, format='json', resolve_once='
     for each_result in result_json['data']:
         data.append( each_result['results'] if 'results' in each_result else [])
     return data
-    
+
+def gnr_resolve_bulk(names, source=None, resolve_once='false', with_context='false',
+    best_match_only='false', header_only='false', preferred_data_sources='false',
+    chunk_size=500, max_workers=4):
+    '''
+    Resolve a large list of scientific names with the Global Names Resolver.
+
+    Identical names are sent only once. The unique names are split into chunks
+    that are POSTed (so there is no URL length limit) concurrently. Results
+    come back in the order of names, duplicates included, in the same format
+    as `gnr_resolve`.
+
+    :param names: List of taxonomic names
+    :param source: Source to pull from, one of x, y, z
+    :param resolve_once: Logical, true or false
+    :param with_context: Return context with taxonomic names
+    :param best_match_only: Logical, if true return the best match only (default: false)
+    :param header_only: Return header only, logical
+    :param preferred_data_sources: Return only preferred data sources.
+    :param chunk_size: Number of names sent per request
+    :param max_workers: Maximum number of requests in flight at once
+
+    Usage:
+    >>> import pytaxize
+    >>> splist = pytaxize.names_list(rank='species', size=5000)
+    >>> out = pytaxize.gnr_resolve_bulk(splist, chunk_size=1000, max_workers=8)
+    >>> len(out) == len(splist)
+    True
+    '''
+    url = 'http://resolver.globalnames.org/name_resolvers'
+    uniq = list(OrderedDict.fromkeys(names))
+    payload = {'data_source_ids': source, 'format': 'json',
+                'resolve_once': resolve_once, 'with_context': with_context,
+                'best_match_only': best_match_only, 'header_only': header_only,
+                'preferred_data_sources': preferred_data_sources}
+
+    def func(start):
+        chunk = uniq[start:start + chunk_size]
+        # send the position of each name as its supplied id
+        data = '\n'.join('%d|%s' % (start + i, x) for i, x in enumerate(chunk))
+        body = dict(payload, data=data)
+        out = transport.post(url, data=body)
+        out.raise_for_status()
+        found = {}
+        for i, each_result in enumerate(out.json()['data']):
+            pos = int(each_result.get('supplied_id', start + i))
+            found[pos] = each_result['results'] if 'results' in each_result else []
+        return found
+
+    res = pmap(func, range(0, len(uniq), chunk_size), max_workers)
+    found = {}
+    for chunk, error in res:
+        if error is not None:
+            raise error
+        found.update(chunk)
+    lookup = dict((x, found.get(i, [])) for i, x in enumerate(uniq))
+    return [list(lookup[x]) for x in names]
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
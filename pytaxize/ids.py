@@ -1,5 +1,8 @@
-import sys
+from collections import OrderedDict
+import pandas as pd
 from pytaxize import col
+from pytaxize import ranks
+from pytaxize.batch import pmap
 
 class Ids(object):
     '''
@@ -9,6 +12,7 @@ class Ids(object):
     >>>
     >>> res = pytaxize.Ids('Poa annua', db='col')
     >>> res.get_colid()
+    >>> pytaxize.Ids(checklist['scientificName'].tolist(), db='col').get_colid_bulk(rank='species')
     '''
     def __init__(self, name, db):
         # super(ids, self).__init__()
@@ -22,24 +26,24 @@ class Ids(object):
     def get_colid(self, ask = True, verbose = True):
       '''
       pytaxize.get_colid(sciname=['Poa annua'])
+
+      Returns 'none' for names not found, or when more than one id is found
+      and ask is False. See get_colid_bulk for many names.
       '''
       sciname = self.name
       def fun(sciname, ask, verbose):
         sciname = [sciname]
         df = col.col_search(name=sciname)
 
+        # not found on col
         if(df[0].shape[0] == 0):
-          sys.exit("Retrieving data for taxon '" + sciname + "'")
-          id = 'none'
-        else:
-          df = df[0][['id','name','rank','name_status']]
-          df.columns = ['colid', 'name', 'rank', 'name_status']
-          id = df['colid'].values.tolist()
+          if(verbose):
+            print("Not found: '" + sciname[0] + "'. Consider checking the spelling or alternate classification")
+          return 'none'
 
-        # not found on col
-        if(len(id) == 0):
-          sys.exit("Not found. Consider checking the spelling or alternate classification")
-          id = 'none'
+        df = df[0][['id','name','rank','name_status']]
+        df.columns = ['colid', 'name', 'rank', 'name_status']
+        id = df['colid'].values.tolist()
 
         # more than one found on col -> user input
         if(len(id) > 1):
@@ -70,6 +74,59 @@ class Ids(object):
 
       return out
 
+    def get_colid_bulk(self, rank = None, source = None, rules = None,
+      max_workers = 8, checklist = None):
+      '''
+      Catalogue of Life ids for many names, without asking.
+
+      Each distinct name is searched once, concurrently. When a search finds
+      more than one record, the rules are applied in turn, each keeping the
+      records it prefers (a rule that would keep none is skipped), until one
+      id is left.
+
+      :param rank: Keep records of this rank, e.g. 'species'
+      :param source: Source database name, or list of them in order of
+          preference, to keep records from (only in full COL responses)
+      :param rules: List of rules to use instead of `default_rules`. A rule is
+          a function taking the DataFrame of records found and the name
+          searched, returning the records to keep.
+      :param max_workers: Maximum number of searches in flight at once
+      :param checklist: The year of the checklist to query, see col_search
+
+      Returns a DataFrame with one row per name, in order: name, colid,
+      matched_name, rank, name_status, accepted_name, accepted_name_id (for
+      synonyms), candidates (number of records found) and status, one of
+      'found', 'ambiguous' (colid None), 'none' (not found) or 'error' (the
+      search failed), and error, the message of the exception a failed search
+      raised.
+
+      Usage:
+      >>> import pytaxize
+      >>> res = pytaxize.Ids(['Poa annua', 'Helianthus annuus'], db='col')
+      >>> res.get_colid_bulk(rank='species')
+      >>> # prefer records from ITIS, then from any source with an exact rank
+      >>> from pytaxize import ids
+      >>> res.get_colid_bulk(rules=[ids.exact_name, ids.source_in('ITIS Global'), ids.rank_is('species')])
+      '''
+      sciname = converter(self.name)
+      rules = list(default_rules if rules is None else rules)
+      if(rank is not None):
+        rules.append(rank_is(rank))
+      if(source is not None):
+        rules.append(source_in(source))
+      uniq = [x for x in OrderedDict.fromkeys(sciname) if x.__class__.__name__ in ['str', 'unicode']]
+
+      def search(x):
+        return col.col_search(name=[x], checklist=checklist)[0]
+
+      found = {}
+      for x, (df, error) in zip(uniq, pmap(search, uniq, max_workers)):
+        found[x] = _pick(x, df, error, rules)
+      rows = [[x] + found.get(x, _row(None, 'none', 0)) for x in sciname]
+      out = pd.DataFrame(rows, columns=colid_columns)
+      out['status'] = pd.Categorical(out['status'], categories=colid_statuses)
+      return out
+
     def getcolurl(self):
       return self.name + 'Boo'
 
@@ -78,3 +135,77 @@ def converter(x):
         return [x]
     else:
         return x
+
+colid_columns = ['name', 'colid', 'matched_name', 'rank', 'name_status',
+    'accepted_name', 'accepted_name_id', 'candidates', 'status', 'error']
+colid_statuses = ['found', 'ambiguous', 'none', 'error']
+
+def exact_name(df, name):
+    '''
+    Rule for get_colid_bulk: keep records whose name is the name searched,
+    ignoring case.
+    '''
+    return df[df['name'].str.lower() == name.strip().lower()]
+
+def accepted_first(df, name):
+    '''
+    Rule for get_colid_bulk: keep accepted (or provisionally accepted) names
+    over synonyms.
+    '''
+    return df[df['name_status'].isin(['accepted name', 'provisionally accepted name'])]
+
+def rank_is(rank):
+    '''
+    Make a rule for get_colid_bulk keeping records of a rank, e.g. 'species'
+    (case insensitive, rank synonyms included).
+    '''
+    target = ranks.rank_id(rank)
+    def rule(df, name):
+        if(target is None):
+            return df[df['rank'].str.lower() == rank.lower()]
+        return df[ranks.rank_id_many(df['rank']) == target]
+    return rule
+
+def source_in(sources):
+    '''
+    Make a rule for get_colid_bulk keeping records from the first of some
+    source databases that has any.
+
+    :param sources: A source database name, or list of them in order of
+        preference
+    '''
+    sources = converter(sources)
+    def rule(df, name):
+        if('source_database' not in df.columns):
+            return df
+        for x in sources:
+            keep = df[df['source_database'] == x]
+            if(keep.shape[0] > 0):
+                return keep
+        return df
+    return rule
+
+default_rules = [exact_name, accepted_first]
+
+## helper functions
+def _row(rec, status, candidates, error=None):
+    if(rec is None):
+        return [None, None, None, None, None, None, candidates, status, error]
+    return [rec.get('id'), rec.get('name'), rec.get('rank'), rec.get('name_status'),
+        rec.get('accepted_name'), rec.get('accepted_name_id'), candidates, status, error]
+
+def _pick(name, df, error, rules):
+    if(error is not None):
+        return _row(None, 'error', 0, '%s: %s' % (error.__class__.__name__, error))
+    if(df.shape[0] == 0 or 'id' not in df.columns):
+        return _row(None, 'none', 0)
+    candidates = df.shape[0]
+    for rule in rules:
+        if(df['id'].nunique() <= 1):
+            break
+        keep = rule(df, name)
+        if(keep.shape[0] > 0):
+            df = keep
+    if(df['id'].nunique() > 1):
+        return _row(None, 'ambiguous', candidates)
+    return _row(df.iloc[0].to_dict(), 'found', candidates)
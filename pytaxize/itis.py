@@ -1,8 +1,52 @@
 import sys
-import requests
+import threading
+from datetime import datetime
+from io import BytesIO
+from functools import wraps
+from pytaxize import transport
+from pytaxize.batch import pmap
 import pandas as pd
 from lxml import etree
 
+_memoized = []
+
+def _memoize(fun):
+    '''
+    Memoize an ITIS function that returns a static reference table. The table
+    is fetched once per process and each call gets its own copy. Calls with
+    request options (**kwargs) bypass the memo.
+    '''
+    memo = {}
+    lock = threading.Lock()
+    @wraps(fun)
+    def wrapper(**kwargs):
+        if len(kwargs) > 0:
+            return fun(**kwargs)
+        if 'out' not in memo:
+            with lock:
+                if 'out' not in memo:
+                    memo['out'] = fun()
+        return memo['out'].copy()
+    wrapper.cache_clear = memo.clear
+    _memoized.append(wrapper)
+    return wrapper
+
+_backend = None
+
+def _local(fun):
+    '''
+    Let the backend set with `itis_backend` answer calls of an ITIS function,
+    if it has a method of the same name. Otherwise the web service is used.
+    '''
+    name = fun.__name__
+    @wraps(fun)
+    def wrapper(*args, **kwargs):
+        method = getattr(_backend, name, None)
+        if method is not None:
+            return method(*args, **kwargs)
+        return fun(*args, **kwargs)
+    return wrapper
+
 def itis_ping(**kwargs):
     '''
     Ping the ITIS API
@@ -12,12 +56,9 @@ def itis_ping(**kwargs):
     >>> pytaxize.itis_ping()
     u'<ns:getDescriptionResponse xmlns:ns="http://itis_service.itis.usgs.gov"><ns:return xmlns:ax21="http://data.itis_service.itis.usgs.gov/xsd" xmlns:ax26="http://itis_service.itis.usgs.gov/xsd" xmlns:ax23="http://metadata.itis_service.itis.usgs.gov/xsd" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:type="ax26:SvcDescription"><ax26:description>This is the ITIS Web Service, providing access to the data behind www.itis.gov. The database contains 641,468 scientific names (486,232 of them valid/accepted) and 118,145 common names.</ax26:description></ns:return></ns:getDescriptionResponse>'
     '''
-    tt = _itisGET('getDescription', {}, **kwargs)
-    ns = {'ax26':'http://itis_service.itis.usgs.gov/xsd'}
-    nodes = tt.xpath('//ax26:description', namespaces=ns)
-    text = [x.text for x in nodes][0]
-    return text
+    return _itiscall('getDescription', {}, **kwargs)
 
+@_local
 def getacceptednamesfromtsn(tsn, **kwargs):
     '''
     Get accepted names from tsn
@@ -28,7 +69,9 @@ def getacceptednamesfromtsn(tsn, **kwargs):
     # TSN not accepted - input TSN is old name
     pytaxize.getacceptednamesfromtsn('504239')
     '''
-    out = _itisGET("getAcceptedNamesFromTSN", {'tsn': tsn}, **kwargs)
+    return _itiscall("getAcceptedNamesFromTSN", {'tsn': tsn}, **kwargs)
+
+def _parse_acceptednames(out):
     temp = out.getchildren()
     if(temp[0].getchildren()[1].values()[0] == 'true'):
         dat = temp[0].getchildren()[0].text
@@ -48,8 +91,7 @@ def getanymatchcount(x, **kwargs):
     pytaxize.getanymatchcount(x=202385)
     pytaxize.getanymatchcount(x="dolphin")
     '''
-    out = _itisGET("getAnyMatchCount", {'srchKey': x}, **kwargs)
-    return int(out.getchildren()[0].text)
+    return _itiscall("getAnyMatchCount", {'srchKey': x}, **kwargs)
 
 def getcommentdetailfromtsn(tsn, **kwargs):
     '''
@@ -59,12 +101,9 @@ def getcommentdetailfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getcommentdetailfromtsn(tsn=180543)
     '''
-    out = _itisGET("getCommentDetailFromTSN", {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    matches = ["commentDetail", "commentId", "commentTimeStamp", "commentator","updateDate"]
-    colnames = ['comment','commid','commtime','commentator','updatedate']
-    return _itisdf(out, ns, matches, colnames)
+    return _itiscall("getCommentDetailFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getcommonnamesfromtsn(tsn, **kwargs):
     '''
     Get common names from tsn
@@ -73,13 +112,7 @@ def getcommonnamesfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getcommonnamesfromtsn(tsn=183833)
     '''
-    out = _itisGET("getCommonNamesFromTSN", {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    matches = ["commonName", "language", "tsn"]
-    colnames = ['comname','lang','tsn']
-    res = _itisextract(out, ns, matches, colnames)
-    del res[2][-1]
-    return _array2df(res, colnames)
+    return _itiscall("getCommonNamesFromTSN", {'tsn': tsn}, **kwargs)
 
 def getcoremetadatafromtsn(tsn, **kwargs):
     '''
@@ -90,10 +123,7 @@ def getcoremetadatafromtsn(tsn, **kwargs):
     # no coverage or currrency data
     pytaxize.getcoremetadatafromtsn(tsn=183671)
     '''
-    out = _itisGET("getCoreMetadataFromTSN", {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    toget = ["credRating","rankId","taxonCoverage","taxonCurrency","taxonUsageRating","tsn"]
-    return _itis_parse(toget, out, ns)
+    return _itiscall("getCoreMetadataFromTSN", {'tsn': tsn}, **kwargs)
 
 def getcoveragefromtsn(tsn, **kwargs):
     '''
@@ -107,11 +137,9 @@ def getcoveragefromtsn(tsn, **kwargs):
     import pandas as pd
     pd.concat([ getcoveragefromtsn(x) for x in [28727,526852] ])
     '''
-    out = _itisGET("getCoverageFromTSN", {'tsn': tsn}, **kwargs)
-    matches = ["rankId", "taxonCoverage", "tsn"]
-    df = _itisdf(out, ns21, matches, _tolower(matches))
-    return df
+    return _itiscall("getCoverageFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getcredibilityratingfromtsn(tsn, **kwargs):
     '''
     Get credibility rating from tsn
@@ -119,11 +147,9 @@ def getcredibilityratingfromtsn(tsn, **kwargs):
     pytaxize.getcredibilityratingfromtsn(526852)
     pytaxize.getcredibilityratingfromtsn(28727)
     '''
-    out = _itisGET("getCredibilityRatingFromTSN", {'tsn': tsn}, **kwargs)
-    matches = ["credRating", "tsn"]
-    df = _itisdf(out, ns21, matches, _tolower(matches))
-    return df
+    return _itiscall("getCredibilityRatingFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
 def getcredibilityratings(**kwargs):
     '''
     Get possible credibility ratings
@@ -131,12 +157,9 @@ def getcredibilityratings(**kwargs):
     Usage:
     pytaxize.getcredibilityratings()
     '''
-    out = _itisGET("getCredibilityRatings", {}, **kwargs)
-    nodes = out.xpath("//ax23:credibilityValues", namespaces=ns23)
-    credibilityValues = [x.text for x in nodes]
-    df = pd.DataFrame(credibilityValues, columns=['credibilityValues'])
-    return df
+    return _itiscall("getCredibilityRatings", {}, **kwargs)
 
+@_local
 def getcurrencyfromtsn(tsn, **kwargs):
     '''
     Get currency from tsn
@@ -146,21 +169,16 @@ def getcurrencyfromtsn(tsn, **kwargs):
     # no currency dat
     pytaxize.getcurrencyfromtsn(526852)
     '''
-    out = _itisGET("getCurrencyFromTSN", {'tsn': tsn}, **kwargs)
-    matches = ["rankId","taxonCurrency","tsn"]
-    df = _itisdf(out, ns21, matches, _tolower(matches))
-    return df
+    return _itiscall("getCurrencyFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getdatedatafromtsn(tsn, **kwargs):
     '''
     Get date data from tsn
     Usage
     pytaxize.getdatedatafromtsn(180543)
     '''
-    out = _itisGET("getDateDataFromTSN", {'tsn': tsn}, **kwargs)
-    matches = ["initialTimeStamp","updateDate","tsn"]
-    df = _itisdf(out, ns21, matches, _tolower(matches))
-    return df
+    return _itiscall("getDateDataFromTSN", {'tsn': tsn}, **kwargs)
 
 def getexpertsfromtsn(tsn, **kwargs):
     '''
@@ -168,9 +186,7 @@ def getexpertsfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getexpertsfromtsn(180544)
     '''
-    out = _itisGET("getExpertsFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["comment","expert","name","referredTsn","referenceFor","updateDate"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getExpertsFromTSN", {'tsn': tsn}, **kwargs)
 
 def gettaxonomicranknamefromtsn(tsn, **kwargs):
     '''
@@ -186,6 +202,7 @@ def gettaxonomicranknamefromtsn(tsn, **kwargs):
     df = _parse2df(tt, ns)
     return df
 
+@_local
 def getfullhierarchyfromtsn(tsn, **kwargs):
     '''
     Get full hierarchy from tsn
@@ -196,12 +213,12 @@ def getfullhierarchyfromtsn(tsn, **kwargs):
     pytaxize.getfullhierarchyfromtsn(tsn = 37906)
     pytaxize.getfullhierarchyfromtsn(tsn = 100800)
     '''
-    tt = _itisGET('getFullHierarchyFromTSN', {'tsn': tsn}, **kwargs)
-    df = _parse_hier(tt, ns21)
-    return df
+    return _itiscall('getFullHierarchyFromTSN', {'tsn': tsn}, **kwargs)
 
 def _fullrecord(verb, args, **kwargs):
-    out = _itisGET(verb, args, **kwargs)
+    return _itiscall(verb, args, **kwargs)
+
+def _parse_fullrecord(out):
     toget = ["acceptedNameList","commentList","commonNameList","completenessRating",
                "coreMetadata","credibilityRating","currencyRating","dateData","expertList",
                "geographicDivisionList","hierarchyUp","jurisdictionalOriginList",
@@ -239,16 +256,16 @@ def getfullrecordfromtsn(tsn, **kwargs):
     '''
     return _fullrecord("getFullRecordFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getgeographicdivisionsfromtsn(tsn, **kwargs):
     '''
     Get geographic divisions from tsn
     Usage
     pytaxize.getgeographicdivisionsfromtsn(180543)
     '''
-    out = _itisGET("getGeographicDivisionsFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["geographicValue","updateDate"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getGeographicDivisionsFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
 def getgeographicvalues(**kwargs):
     '''
     Get all possible geographic values
@@ -256,23 +273,19 @@ def getgeographicvalues(**kwargs):
     Usage
     pytaxize.getgeographicvalues()
     '''
-    out = _itisGET("getGeographicValues", {}, **kwargs)
-    ns = {'ax21':'http://metadata.itis_service.itis.usgs.gov/xsd'}
-    nodes = out.xpath("//ax21:geographicValues", namespaces=ns)
-    gv = [x.text for x in nodes]
-    return pd.DataFrame(gv, columns=['geographicvalues'])
+    return _itiscall("getGeographicValues", {}, **kwargs)
 
+@_local
 def getglobalspeciescompletenessfromtsn(tsn, **kwargs):
     '''
     Get global species completeness from tsn
     Usage:
     pytaxize.getglobalspeciescompletenessfromtsn(180541)
     '''
-    out = _itisGET("getGlobalSpeciesCompletenessFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["completeness","rankId","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getGlobalSpeciesCompletenessFromTSN", {'tsn': tsn}, **kwargs)
 
 
+@_local
 def gethierarchydownfromtsn(tsn, **kwargs):
     '''
     Get hierarchy down from tsn
@@ -282,11 +295,9 @@ def gethierarchydownfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.gethierarchydownfromtsn(tsn = 161030)
     '''
-    tt = _itisGET('getHierarchyDownFromTSN', {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    df = _parse_hier(tt, ns)
-    return df
+    return _itiscall('getHierarchyDownFromTSN', {'tsn': tsn}, **kwargs)
 
+@_local
 def gethierarchyupfromtsn(tsn, **kwargs):
     '''
     Get hierarchy up from tsn
@@ -297,10 +308,7 @@ def gethierarchyupfromtsn(tsn, **kwargs):
     pytaxize.gethierarchyupfromtsn(tsn = 36485)
     pytaxize.gethierarchyupfromtsn(tsn = 37906)
     '''
-    tt = _itisGET('getHierarchyUpFromTSN', {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    df = _parse2df(tt, ns)
-    return df
+    return _itiscall('getHierarchyUpFromTSN', {'tsn': tsn}, **kwargs)
 
 def _itisterms(endpt, args={}, **kwargs):
     '''
@@ -308,28 +316,22 @@ def _itisterms(endpt, args={}, **kwargs):
     Usage:
     pytaxize._itisterms(x="buya")
     '''
-    out = _itisGET(endpt, args, **kwargs)
+    return _itiscall(endpt, args, **kwargs)
 
+def _parse_itisterms(out):
     nodes = out.xpath("//ax21:itisTerms", namespaces=ns21)
-    nodes2 = [x.getchildren() for x in nodes]
-    allnodes = [[_get_text_single(y) for y in x] for x in nodes2]
-
     output = []
-    for x in allnodes:
-        kyz = [y.keys()[0] for y in x]
-        notuniq = set([v for v in kyz if kyz.count(v) > 1])
-        if len(notuniq) > 0:
-            for z in notuniq:
-                tt = ','.join([ m.values()[0] for m in x if m.keys()[0] == z ])
-                toadd = { z: tt }
-                uu = [ v for v in x if v.keys()[0] not in z ]
-                uu.append(toadd)
-            output.append(uu)
-        else:
-            output.append(x)
-
-    df = pd.concat([pd.DataFrame([y.values()[0] for y in x]).transpose() for x in output])
-    df.columns = [x.keys()[0] for x in allnodes[0]]
+    for x in nodes:
+        # repeated fields (e.g. several commonNames) are joined with a comma
+        each = {}
+        for y in x:
+            key = gettag(y)
+            if key in each:
+                each[key] = ','.join([v for v in [each[key], y.text] if v is not None])
+            else:
+                each[key] = y.text
+        output.append(each)
+    df = pd.DataFrame(output)
     return df
 
 def _get_text_single(x):
@@ -393,51 +395,121 @@ def itis_hierarchy(tsn=None, what="full"):
     pytaxize.itis_hierarchy(tsn=[180543,41074,36616])
     '''
     tsn2 = convertsingle(tsn)
+    fun = _hierarchy_funs[what] if what in _hierarchy_funs else gethierarchydownfromtsn
     temp = []
-    if(what == 'full'):
-        for i in range(len(tsn2)):
-            temp.append(getfullhierarchyfromtsn(tsn2[i]))
-    elif(what == 'up'):
-        for i in range(len(tsn2)):
-            temp.append(gethierarchyupfromtsn(tsn2[i]))
-    else:
-        for i in range(len(tsn2)):
-            temp.append(gethierarchydownfromtsn(tsn2[i]))
+    for i in range(len(tsn2)):
+        temp.append(fun(tsn2[i]))
     return temp
 
+def itis_hierarchy_batch(tsn, what="full", max_workers=8, concat=False):
+    '''
+    Get hierarchies for many TSN values concurrently. Like `itis_hierarchy`, but
+    requests run on a thread pool and a failed TSN does not abort the batch.
+
+    :param tsn: List of TSN's (taxonomic serial number)
+    :param what: One of full (full hierarchy), up (immediate upstream), or down
+       (immediate downstream)
+    :param max_workers: Maximum number of requests in flight at once
+    :param concat: If True, return one DataFrame with a `sourceTsn` column
+       instead of a list of DataFrame's
+
+    Returns a tuple (output, errors). output is a list of DataFrame's in the
+    order of tsn (None where the request failed), or one DataFrame if concat
+    is True. errors is a dict mapping each failed TSN to its exception.
+
+    Usage:
+    out, errors = pytaxize.itis_hierarchy_batch(tsn=[180543,41074,36616])
+    df, errors = pytaxize.itis_hierarchy_batch(tsn=[180543,41074,36616], what="up",
+        max_workers=16, concat=True)
+    '''
+    tsn2 = convertsingle(tsn)
+    fun = _hierarchy_funs[what] if what in _hierarchy_funs else gethierarchydownfromtsn
+    res = pmap(fun, tsn2, max_workers)
+    out = [x[0] for x in res]
+    errors = dict((t, x[1]) for t, x in zip(tsn2, res) if x[1] is not None)
+    if(concat):
+        dfs = [df.assign(sourceTsn=t) for t, df in zip(tsn2, out) if df is not None]
+        if len(dfs) == 0:
+            return pd.DataFrame(columns=['sourceTsn']), errors
+        return pd.concat(dfs, ignore_index=True), errors
+    return out, errors
+
+def itis_preload():
+    '''
+    Fetch all static ITIS reference tables (rank names, kingdom names,
+    credibility ratings, geographic values, jurisdiction values, jurisdiction
+    origin values and vernacular languages) so later calls are served from
+    memory. Useful once at application startup.
+
+    Usage:
+    pytaxize.itis_preload()
+    '''
+    for fun in _memoized:
+        fun()
+
+def itis_clear_cache():
+    '''
+    Forget the in-memory ITIS reference tables; the next call of each fetches
+    it again. Single tables can be cleared with e.g.
+    `pytaxize.getranknames.cache_clear()`.
+    '''
+    for fun in _memoized:
+        fun.cache_clear()
+
+def itis_backend(backend=None):
+    '''
+    Answer ITIS lookups from a local copy of the ITIS database instead of the
+    web service. See pytaxize.itis_local for building one from the ITIS dump.
+
+    :param backend: Path to a store made by `pytaxize.itis_local.build`, an
+       object with methods named like the ITIS functions (e.g. an
+       `pytaxize.itis_local.ItisLocal`), or None to use the web service again
+
+    Functions the backend does not implement still use the web service.
+    Returns the previous backend (None for the web service).
+
+    Usage:
+    pytaxize.itis_backend('~/itis.sqlite')
+    pytaxize.getfullhierarchyfromtsn(tsn = 180543)
+    pytaxize.itis_backend(None)
+    '''
+    global _backend
+    if(backend.__class__.__name__ in ['str', 'unicode']):
+        from pytaxize.itis_local import ItisLocal
+        backend = ItisLocal(backend)
+    old = _backend
+    _backend = backend
+    itis_clear_cache()
+    return old
+
+@_local
 def getjurisdictionaloriginfromtsn(tsn, **kwargs):
     '''
     Get jurisdictional origin from tsn
     Usage:
     pytaxize.getjurisdictionaloriginfromtsn(180543)
     '''
-    out = _itisGET("getJurisdictionalOriginFromTSN", {'tsn': tsn}, **kwargs)
-    ns = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
-    toget = ["jurisdictionValue","origin","updateDate"]
-    return _itis_parse(toget, out, ns)
+    return _itiscall("getJurisdictionalOriginFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
 def getjurisdictionoriginvalues(**kwargs):
     '''
     Get jurisdiction origin values
     Usage:
     pytaxize.getjurisdictionoriginvalues()
     '''
-    out = _itisGET("getJurisdictionalOriginValues", {}, **kwargs)
-    ns = {'ax23':'http://metadata.itis_service.itis.usgs.gov/xsd'}
-    matches = ["jurisdiction","origin"]
-    return _itisdf(out, ns, matches, matches, "ax23")
+    return _itiscall("getJurisdictionalOriginValues", {}, **kwargs)
 
+@_memoize
 def getjurisdictionvalues(**kwargs):
     '''
     Get possible jurisdiction values
     Usage:
     pytaxize.getjurisdictionvalues()
     '''
-    out = _itisGET("getJurisdictionValues", {}, **kwargs)
-    ns = {'x23':'http://metadata.itis_service.itis.usgs.gov/xsd'}
-    vals = [ x.text for x in out.getchildren()[0].getchildren() ]
-    return pd.DataFrame(vals, columns = ['jurisdictionValues'])
+    return _itiscall("getJurisdictionValues", {}, **kwargs)
 
+@_local
 def getkingdomnamefromtsn(tsn, **kwargs):
     '''
     Get kingdom names from tsn
@@ -445,11 +517,10 @@ def getkingdomnamefromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getkingdomnamefromtsn(202385)
     '''
-    out = _itisGET("getKingdomNameFromTSN", {'tsn': tsn}, **kwargs)
-    ns = {'ax21':"http://data.itis_service.itis.usgs.gov/xsd"}
-    toget = ["kingdomId","kingdomName","tsn"]
-    return _itis_parse(toget, out, ns)
+    return _itiscall("getKingdomNameFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
+@_local
 def getkingdomnames(**kwargs):
     '''
     Get all possible kingdom names
@@ -457,10 +528,7 @@ def getkingdomnames(**kwargs):
     Usage:
     pytaxize.getkingdomnames()
     '''
-    out = _itisGET("getKingdomNames", {}, **kwargs)
-    ns = {'ax23':"http://metadata.itis_service.itis.usgs.gov/xsd"}
-    matches = ["kingdomId","kingdomName","tsn"]
-    return _itisdf(out, ns, matches, _tolower(matches), "ax23")
+    return _itiscall("getKingdomNames", {}, **kwargs)
 
 def getlastchangedate(**kwargs):
     '''
@@ -469,13 +537,9 @@ def getlastchangedate(**kwargs):
     Usage:
     pytaxize.getlastchangedate()
     '''
-    out = _itisGET("getLastChangeDate", {}, **kwargs)
-    ns = {'ax23':"http://metadata.itis_service.itis.usgs.gov/xsd"}
-    nodes = out.xpath("//ax23:updateDate", namespaces=ns)
-    bb = nodes[0].text
-    dt = datetime.strptime(bb.split()[0], "%Y-%m-%d")
-    return dt
+    return _itiscall("getLastChangeDate", {}, **kwargs)
 
+@_local
 def getlsidfromtsn(tsn, **kwargs):
     '''
     Gets the unique LSID for the TSN, or an empty result if there is no match.
@@ -486,13 +550,7 @@ def getlsidfromtsn(tsn, **kwargs):
     # invalid TSN, returns nothing
     pytaxize.getlsidfromtsn(0)
     '''
-    out = _itisGET("getLSIDFromTSN", {'tsn': tsn}, **kwargs)
-    tt = out.getchildren()[0].text
-    if tt is None:
-        tt = "no match"
-    else:
-        pass
-    return tt
+    return _itiscall("getLSIDFromTSN", {'tsn': tsn}, **kwargs)
 
 def getothersourcesfromtsn(tsn, **kwargs):
     '''
@@ -501,11 +559,9 @@ def getothersourcesfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getothersourcesfromtsn(182662)
     '''
-    out = _itisGET("getOtherSourcesFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["acquisitionDate","name","referredTsn","source",
-        "sourceType","updateDate","version"]
-    return _itis_parse_2dict(toget, out, ns21)
+    return _itiscall("getOtherSourcesFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getparenttsnfromtsn(tsn, **kwargs):
     '''
     Returns the parent TSN for the entered TSN.
@@ -513,9 +569,7 @@ def getparenttsnfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getparenttsnfromtsn(202385)
     '''
-    out = _itisGET("getParentTSNFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["parentTsn","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getParentTSNFromTSN", {'tsn': tsn}, **kwargs)
 
 def getpublicationsfromtsn(tsn, **kwargs):
     '''
@@ -524,12 +578,10 @@ def getpublicationsfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getpublicationsfromtsn(70340)
     '''
-    out = _itisGET("getPublicationsFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["actualPubDate","isbn","issn","listedPubDate","pages",
-                "pubComment","pubName","pubPlace","publisher","referenceAuthor",
-                "name","refLanguage","referredTsn","title","updateDate"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getPublicationsFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
+@_local
 def getranknames(**kwargs):
     '''
     Provides a list of all the unique rank names contained in the database and
@@ -538,9 +590,7 @@ def getranknames(**kwargs):
     Usage:
     pytaxize.getranknames()
     '''
-    out = _itisGET("getRankNames", {}, **kwargs)
-    matches = ["kingdomName","rankId","rankName"]
-    return _itisdf(out, ns23, matches, _tolower(matches), "ax23")
+    return _itiscall("getRankNames", {}, **kwargs)
 
 def getrecordfromlsid(lsid, **kwargs):
     '''
@@ -551,11 +601,7 @@ def getrecordfromlsid(lsid, **kwargs):
     Usage:
     pytaxize.getrecordfromlsid("urn:lsid:itis.gov:itis_tsn:180543")
     '''
-    out = _itisGET("getRecordFromLSID", {'lsid': lsid}, **kwargs)
-    toget = ["authorship","genusPart","infragenericEpithet",
-            "infraspecificEpithet","lsid","nameComplete","nomenclaturalCode",
-            "rank","rankString","specificEpithet","uninomial","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getRecordFromLSID", {'lsid': lsid}, **kwargs)
 
 def getreviewyearfromtsn(tsn, **kwargs):
     '''
@@ -564,10 +610,9 @@ def getreviewyearfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getreviewyearfromtsn(180541)
     '''
-    out = _itisGET("getReviewYearFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["rankId","reviewYear","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getReviewYearFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def getscientificnamefromtsn(tsn, **kwargs):
     '''
     Returns the scientific name for the TSN. Also returns the component parts
@@ -576,10 +621,7 @@ def getscientificnamefromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getscientificnamefromtsn(531894)
     '''
-    out = _itisGET("getScientificNameFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["combinedName","unitInd1","unitInd3","unitName1","unitName2",
-            "unitName3","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getScientificNameFromTSN", {'tsn': tsn}, **kwargs)
 
 # def getsynonymnamesfromtsn(tsn, **kwargs):
 #     '''
@@ -603,6 +645,7 @@ def getscientificnamefromtsn(tsn, **kwargs):
 #       tsn = tsn[-1]
 #     data.frame(name=name, tsn=tsn, stringsAsFactors = FALSE)
 
+@_local
 def gettaxonauthorshipfromtsn(tsn, **kwargs):
     '''
     Returns the author information for the TSN.
@@ -610,10 +653,9 @@ def gettaxonauthorshipfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.gettaxonauthorshipfromtsn(183671)
     '''
-    out = _itisGET("getTaxonAuthorshipFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["authorship","updateDate","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getTaxonAuthorshipFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def gettaxonomicranknamefromtsn(tsn, **kwargs):
     '''
     Returns the kingdom and rank information for the TSN.
@@ -621,10 +663,9 @@ def gettaxonomicranknamefromtsn(tsn, **kwargs):
     Usage:
     pytaxize.gettaxonomicranknamefromtsn(202385)
     '''
-    out = _itisGET("getTaxonomicRankNameFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["kingdomId","kingdomName","rankId","rankName","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getTaxonomicRankNameFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def gettaxonomicusagefromtsn(tsn, **kwargs):
     '''
     Returns the usage information for the TSN.
@@ -632,10 +673,9 @@ def gettaxonomicusagefromtsn(tsn, **kwargs):
     Usage:
     pytaxize.gettaxonomicusagefromtsn(526852)
     '''
-    out = _itisGET("getTaxonomicUsageFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["taxonUsageRating","tsn"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getTaxonomicUsageFromTSN", {'tsn': tsn}, **kwargs)
 
+@_local
 def gettsnbyvernacularlanguage(language, **kwargs):
     '''
     Get tsn by vernacular language not the international language code (character)
@@ -643,9 +683,7 @@ def gettsnbyvernacularlanguage(language, **kwargs):
     Usage:
     pytaxize.gettsnbyvernacularlanguage("french")
     '''
-    out = _itisGET("getTsnByVernacularLanguage", {'language': language}, **kwargs)
-    matches = ["commonName","language","tsn"]
-    return _itisdf(out, ns21, matches, _tolower(matches))
+    return _itiscall("getTsnByVernacularLanguage", {'language': language}, **kwargs)
 
 def gettsnfromlsid(lsid, **kwargs):
     '''
@@ -655,14 +693,9 @@ def gettsnfromlsid(lsid, **kwargs):
     pytaxize.gettsnfromlsid(lsid="urn:lsid:itis.gov:itis_tsn:28726")
     pytaxize.gettsnfromlsid("urn:lsid:itis.gov:itis_tsn:0")
     '''
-    out = _itisGET("getTSNFromLSID", {'lsid': lsid}, **kwargs)
-    tt = out.getchildren()[0].text
-    if tt is None:
-        tt = "no match"
-    else:
-        pass
-    return tt
+    return _itiscall("getTSNFromLSID", {'lsid': lsid}, **kwargs)
 
+@_local
 def getunacceptabilityreasonfromtsn(tsn, **kwargs):
     '''
     Returns the unacceptability reason, if any, for the TSN.
@@ -670,10 +703,10 @@ def getunacceptabilityreasonfromtsn(tsn, **kwargs):
     Usage:
     pytaxize.getunacceptabilityreasonfromtsn(183671)
     '''
-    out = _itisGET("getUnacceptabilityReasonFromTSN", {'tsn': tsn}, **kwargs)
-    toget = ["tsn","unacceptReason"]
-    return _itis_parse(toget, out, ns21)
+    return _itiscall("getUnacceptabilityReasonFromTSN", {'tsn': tsn}, **kwargs)
 
+@_memoize
+@_local
 def getvernacularlanguages(**kwargs):
     '''
     Provides a list of the unique languages used in the vernacular table.
@@ -681,10 +714,9 @@ def getvernacularlanguages(**kwargs):
     Usage:
     pytaxize.getvernacularlanguages()
     '''
-    out = _itisGET("getVernacularLanguages", {}, **kwargs)
-    matches = ["languageNames"]
-    return _itisdf(out, ns23, matches, _tolower(matches), "ax23")
+    return _itiscall("getVernacularLanguages", {}, **kwargs)
 
+@_local
 def searchbycommonname(x, **kwargs):
     '''
     Search for tsn by common name
@@ -693,11 +725,9 @@ def searchbycommonname(x, **kwargs):
     pytaxize.searchbycommonname("ferret-badger")
     pytaxize.searchbycommonname("polar bear")
     '''
-    out = _itisGET("searchByCommonName", {'srchKey': x}, **kwargs)
-    matches = ["commonName","language","tsn"]
-    tmp = out.xpath('//ax21:commonNames', namespaces=ns21)
-    return _itisdf(tmp[0], ns21, matches, _tolower(matches))
+    return _itiscall("searchByCommonName", {'srchKey': x}, **kwargs)
 
+@_local
 def searchbycommonnamebeginswith(x, **kwargs):
     '''
     Search for tsn by common name beginning with
@@ -705,11 +735,9 @@ def searchbycommonnamebeginswith(x, **kwargs):
     Usage:
     pytaxize.searchbycommonnamebeginswith("inch")
     '''
-    out = _itisGET("searchByCommonNameBeginsWith", {'srchKey': x}, **kwargs)
-    matches = ["commonName","language","tsn"]
-    tmp = out.xpath('//ax21:commonNames', namespaces=ns21)
-    return _itisdf(tmp[0], ns21, matches, _tolower(matches))
+    return _itiscall("searchByCommonNameBeginsWith", {'srchKey': x}, **kwargs)
 
+@_local
 def searchbycommonnameendswith(x, **kwargs):
     '''
     Search for tsn by common name ending with
@@ -717,10 +745,7 @@ def searchbycommonnameendswith(x, **kwargs):
     Usage:
     pytaxize.searchbycommonnameendswith("snake")
     '''
-    out = _itisGET("searchByCommonNameEndsWith", {'srchKey': x}, **kwargs)
-    matches = ["commonName","language","tsn"]
-    tmp = out.xpath('//ax21:commonNames', namespaces=ns21)
-    return _itisdf(tmp[0], ns21, matches, _tolower(matches))
+    return _itiscall("searchByCommonNameEndsWith", {'srchKey': x}, **kwargs)
 
 def itis_searchcommon(x, which = "begin", **kwargs):
     '''
@@ -735,6 +760,7 @@ def itis_searchcommon(x, which = "begin", **kwargs):
     else:
         return searchbycommonnameendswith(x, **kwargs)
 
+@_local
 def searchbyscientificname(x, **kwargs):
     '''
     Search by scientific name
@@ -743,9 +769,7 @@ def searchbyscientificname(x, **kwargs):
     pytaxize.searchbyscientificname(x="Tardigrada")
     pytaxize.searchbyscientificname("Quercus douglasii")
     '''
-    out = _itisGET("searchByScientificName", {'srchKey': x}, **kwargs)
-    matches = ["combinedName","tsn"]
-    return _itisdf(out, ns21, matches, _tolower(matches))
+    return _itiscall("searchByScientificName", {'srchKey': x}, **kwargs)
 
 def searchforanymatch(x, **kwargs):
     '''
@@ -754,15 +778,7 @@ def searchforanymatch(x, **kwargs):
     pytaxize.searchforanymatch(x=202385)
     pytaxize.searchforanymatch(x="dolphin")
     '''
-    out = _itisGET("searchForAnyMatch", {'srchKey': x}, **kwargs)
-    # if isinstance(x, basestring):
-    tmp = out.getchildren()[0].getchildren()
-    output = []
-    for v in tmp:
-        tmp = v.getchildren()
-        for w in tmp:
-            output.append(dict(zip([gettag(e) for e in w.iter()], [e.text for e in w.iter()])))
-    return output
+    return _itiscall("searchForAnyMatch", {'srchKey': x}, **kwargs)
 
 def searchforanymatchpaged(x, pagesize, pagenum, ascend, **kwargs):
     '''
@@ -773,7 +789,9 @@ def searchforanymatchpaged(x, pagesize, pagenum, ascend, **kwargs):
     pytaxize.searchforanymatchpaged("Zy", pagesize=100, pagenum=1, ascend=False)
     '''
     args = {'srchKey':x, 'pageSize':pagesize, 'pageNum':pagenum, 'ascend':ascend}
-    out = _itisGET("searchForAnyMatchPaged", args, **kwargs)
+    return _itiscall("searchForAnyMatchPaged", args, **kwargs)
+
+def _parse_anymatch(out):
     tmp = out.getchildren()[0].getchildren()
     output = []
     for v in tmp:
@@ -783,6 +801,9 @@ def searchforanymatchpaged(x, pagesize, pagenum, ascend, **kwargs):
     return output
 
 ## helper functions and variables
+_hierarchy_funs = {'full': getfullhierarchyfromtsn, 'up': gethierarchyupfromtsn,
+                   'down': gethierarchydownfromtsn}
+
 def convertsingle(x):
     if(x.__class__.__name__ == 'int'):
         return [x]
@@ -793,13 +814,22 @@ itis_base = 'http://www.itis.gov/ITISWebService/services/ITISService/'
 ns21 = {'ax21':'http://data.itis_service.itis.usgs.gov/xsd'}
 ns23 = {'ax23':'http://metadata.itis_service.itis.usgs.gov/xsd'}
 
+def _itiscall(endpt, payload, **kwargs):
+    # request an ITIS endpoint and parse the response with its parser
+    if endpt in _raw_parsers:
+        return _raw_parsers[endpt](_itisGETraw(endpt, payload, **kwargs))
+    return _parsers[endpt](_itisGET(endpt, payload, **kwargs))
+
 def _itisGET(endpt, payload, **kwargs):
-    out = requests.get(itis_base+endpt, params = payload, **kwargs)
-    out.raise_for_status()
     xmlparser = etree.XMLParser()
-    tt = etree.fromstring(out.content, xmlparser)
+    tt = etree.fromstring(_itisGETraw(endpt, payload, **kwargs), xmlparser)
     return tt
 
+def _itisGETraw(endpt, payload, **kwargs):
+    out = transport.get(itis_base+endpt, params = payload, **kwargs)
+    out.raise_for_status()
+    return out.content
+
 def _parse2df(obj, ns):
     nodes = obj.xpath('//ax21:*', namespaces=ns)
     vals = [x.text for x in nodes]
@@ -814,32 +844,51 @@ def _parse_nodes(obj):
 
 def _parse_hier(obj, ns):
     nodes = obj.xpath('//ax21:hierarchyList', namespaces=ns)
-    uu = []
-    for i in range(len(nodes)):
-        uu.append([x.text for x in nodes[i]])
-    df = pd.DataFrame(uu, columns=['tsn','author','parentName','parentTsn','rankName','taxonName'])
-    df = df.drop('author', axis=1)
-    df = df.reindex_axis(['tsn','rankName','taxonName','parentName','parentTsn'], axis=1)
+    uu = [_parse_nodes(x) for x in nodes]
+    df = pd.DataFrame(uu, columns=['tsn','rankName','taxonName','parentName','parentTsn'])
     return df
 
+def _collect(obj, uri, matches):
+    '''
+    Texts of all elements in the document of obj in namespace uri, one list
+    per local name in matches, in document order. Same result as one
+    '//prefix:name' xpath per name, but walks the tree once.
+    '''
+    tags = ['{%s}%s' % (uri, m) for m in matches]
+    found = dict((t, []) for t in tags)
+    for x in obj.getroottree().iter(*tags):
+        found[x.tag].append(x.text)
+    return [found[t] for t in tags]
+
+def _itercollect(content, uri, record, matches):
+    '''
+    Like _collect, but parses raw XML incrementally, one record element at a
+    time, and clears each record and those before it once read, so the tree
+    never holds more than one record. Much less memory than _collect for very
+    large responses, at some cost in speed.
+    '''
+    tags = dict(('{%s}%s' % (uri, m), i) for i, m in enumerate(matches))
+    found = [[] for m in matches]
+    for event, x in etree.iterparse(BytesIO(content), events=('end',), tag='{%s}%s' % (uri, record)):
+        row = [None] * len(matches)
+        for y in x:
+            i = tags.get(y.tag)
+            if i is not None:
+                row[i] = y.text
+        for i, v in enumerate(row):
+            found[i].append(v)
+        x.clear()
+        while x.getprevious() is not None:
+            del x.getparent()[0]
+    return found
+
 def _itisdf(a, b, matches, colnames, pastens="ax21"):
-    prefix = '//%s:' % pastens
-    matches = [prefix+x for x in matches]
-    output = []
-    for m in matches:
-        nodes = a.xpath(m, namespaces=b)
-        output.append([x.text for x in nodes])
+    output = _collect(a, b[pastens], matches)
     df = pd.DataFrame(dict(zip(colnames, output)))
     return df
 
 def _itisextract(a, b, matches, colnames, pastens="ax21"):
-    prefix = '//%s:' % pastens
-    matches = [prefix+x for x in matches]
-    output = []
-    for m in matches:
-        nodes = a.xpath(m, namespaces=b)
-        output.append([x.text for x in nodes])
-    return output
+    return _collect(a, b[pastens], matches)
 
 def _array2df(obj, colnames):
     if all([len(x)==2 for x in obj]):
@@ -849,18 +898,12 @@ def _array2df(obj, colnames):
     return df
 
 def _itis_parse(a, b, d):
-    def xpathfunc(x, y, nsp):
-        tmp = y.xpath("//ax21:"+x, namespaces=nsp)
-        return [x.text for x in tmp]
-    vals = [xpathfunc(x, b, d) for x in a]
+    vals = _collect(b, d['ax21'], a)
     df = pd.DataFrame(dict(zip(_tolower(a), vals)))
     return df
 
 def _itis_parse_2dict(a, b, d):
-    def xpathfunc(x, y, nsp):
-        tmp = y.xpath("//ax21:"+x, namespaces=nsp)
-        return [x.text for x in tmp]
-    vals = [xpathfunc(x, b, d) for x in a]
+    vals = _collect(b, d['ax21'], a)
     return dict(zip(a, vals))
 
 def _get_text(y):
@@ -879,6 +922,138 @@ def _tolower(y):
 def gettag(y):
     return y.tag.split('}')[1]
 
+def _fields(toget):
+    return lambda out: _itis_parse(toget, out, ns21)
+
+def _frame(matches, ns=ns21, pastens="ax21"):
+    return lambda out: _itisdf(out, ns, matches, _tolower(matches), pastens)
+
+def _parse_description(out):
+    ns = {'ax26':'http://itis_service.itis.usgs.gov/xsd'}
+    nodes = out.xpath('//ax26:description', namespaces=ns)
+    return [x.text for x in nodes][0]
+
+def _parse_count(out):
+    return int(out.getchildren()[0].text)
+
+def _parse_text(out):
+    tt = out.getchildren()[0].text
+    if tt is None:
+        tt = "no match"
+    return tt
+
+def _parse_commentdetail(out):
+    matches = ["commentDetail", "commentId", "commentTimeStamp", "commentator","updateDate"]
+    colnames = ['comment','commid','commtime','commentator','updatedate']
+    return _itisdf(out, ns21, matches, colnames)
+
+def _parse_commonnamesfromtsn(out):
+    matches = ["commonName", "language", "tsn"]
+    colnames = ['comname','lang','tsn']
+    res = _itisextract(out, ns21, matches, colnames)
+    del res[2][-1]
+    return _array2df(res, colnames)
+
+def _parse_credibilityratings(out):
+    nodes = out.xpath("//ax23:credibilityValues", namespaces=ns23)
+    credibilityValues = [x.text for x in nodes]
+    return pd.DataFrame(credibilityValues, columns=['credibilityValues'])
+
+def _parse_geographicvalues(out):
+    ns = {'ax21':'http://metadata.itis_service.itis.usgs.gov/xsd'}
+    nodes = out.xpath("//ax21:geographicValues", namespaces=ns)
+    gv = [x.text for x in nodes]
+    return pd.DataFrame(gv, columns=['geographicvalues'])
+
+def _parse_jurisdictionvalues(out):
+    vals = [ x.text for x in out.getchildren()[0].getchildren() ]
+    return pd.DataFrame(vals, columns = ['jurisdictionValues'])
+
+def _parse_lastchangedate(out):
+    nodes = out.xpath("//ax23:updateDate", namespaces=ns23)
+    return datetime.strptime(nodes[0].text.split()[0], "%Y-%m-%d")
+
+def _parse_othersources(out):
+    toget = ["acquisitionDate","name","referredTsn","source",
+        "sourceType","updateDate","version"]
+    return _itis_parse_2dict(toget, out, ns21)
+
+def _parse_commonnames(out):
+    matches = ["commonName","language","tsn"]
+    tmp = out.xpath('//ax21:commonNames', namespaces=ns21)
+    return _itisdf(tmp[0], ns21, matches, _tolower(matches))
+
+def _parse_vernacular(content):
+    matches = ["commonName","language","tsn"]
+    vals = _itercollect(content, ns21['ax21'], 'vernacularTsns', matches)
+    return pd.DataFrame(dict(zip(_tolower(matches), vals)))
+
+# how the response of each ITIS endpoint is turned into what its function
+# returns; shared by the functions here and their asyncio versions in aitis
+_parsers = {
+    'getDescription': _parse_description,
+    'getAcceptedNamesFromTSN': _parse_acceptednames,
+    'getAnyMatchCount': _parse_count,
+    'getCommentDetailFromTSN': _parse_commentdetail,
+    'getCommonNamesFromTSN': _parse_commonnamesfromtsn,
+    'getCoreMetadataFromTSN': _fields(["credRating","rankId","taxonCoverage","taxonCurrency",
+        "taxonUsageRating","tsn"]),
+    'getCoverageFromTSN': _frame(["rankId", "taxonCoverage", "tsn"]),
+    'getCredibilityRatingFromTSN': _frame(["credRating", "tsn"]),
+    'getCredibilityRatings': _parse_credibilityratings,
+    'getCurrencyFromTSN': _frame(["rankId","taxonCurrency","tsn"]),
+    'getDateDataFromTSN': _frame(["initialTimeStamp","updateDate","tsn"]),
+    'getExpertsFromTSN': _fields(["comment","expert","name","referredTsn","referenceFor","updateDate"]),
+    'getFullHierarchyFromTSN': lambda out: _parse_hier(out, ns21),
+    'getFullRecordFromLSID': _parse_fullrecord,
+    'getFullRecordFromTSN': _parse_fullrecord,
+    'getGeographicDivisionsFromTSN': _fields(["geographicValue","updateDate"]),
+    'getGeographicValues': _parse_geographicvalues,
+    'getGlobalSpeciesCompletenessFromTSN': _fields(["completeness","rankId","tsn"]),
+    'getHierarchyDownFromTSN': lambda out: _parse_hier(out, ns21),
+    'getHierarchyUpFromTSN': lambda out: _parse2df(out, ns21),
+    'getITISTermsFromCommonName': _parse_itisterms,
+    'getITISTerms': _parse_itisterms,
+    'getITISTermsFromScientificName': _parse_itisterms,
+    'getJurisdictionalOriginFromTSN': _fields(["jurisdictionValue","origin","updateDate"]),
+    'getJurisdictionalOriginValues': lambda out: _itisdf(out, ns23, ["jurisdiction","origin"],
+        ["jurisdiction","origin"], "ax23"),
+    'getJurisdictionValues': _parse_jurisdictionvalues,
+    'getKingdomNameFromTSN': _fields(["kingdomId","kingdomName","tsn"]),
+    'getKingdomNames': _frame(["kingdomId","kingdomName","tsn"], ns23, "ax23"),
+    'getLastChangeDate': _parse_lastchangedate,
+    'getLSIDFromTSN': _parse_text,
+    'getOtherSourcesFromTSN': _parse_othersources,
+    'getParentTSNFromTSN': _fields(["parentTsn","tsn"]),
+    'getPublicationsFromTSN': _fields(["actualPubDate","isbn","issn","listedPubDate","pages",
+        "pubComment","pubName","pubPlace","publisher","referenceAuthor",
+        "name","refLanguage","referredTsn","title","updateDate"]),
+    'getRankNames': _frame(["kingdomName","rankId","rankName"], ns23, "ax23"),
+    'getRecordFromLSID': _fields(["authorship","genusPart","infragenericEpithet",
+        "infraspecificEpithet","lsid","nameComplete","nomenclaturalCode",
+        "rank","rankString","specificEpithet","uninomial","tsn"]),
+    'getReviewYearFromTSN': _fields(["rankId","reviewYear","tsn"]),
+    'getScientificNameFromTSN': _fields(["combinedName","unitInd1","unitInd3","unitName1",
+        "unitName2","unitName3","tsn"]),
+    'getTaxonAuthorshipFromTSN': _fields(["authorship","updateDate","tsn"]),
+    'getTaxonomicRankNameFromTSN': _fields(["kingdomId","kingdomName","rankId","rankName","tsn"]),
+    'getTaxonomicUsageFromTSN': _fields(["taxonUsageRating","tsn"]),
+    'getTSNFromLSID': _parse_text,
+    'getUnacceptabilityReasonFromTSN': _fields(["tsn","unacceptReason"]),
+    'getVernacularLanguages': _frame(["languageNames"], ns23, "ax23"),
+    'searchByCommonName': _parse_commonnames,
+    'searchByCommonNameBeginsWith': _parse_commonnames,
+    'searchByCommonNameEndsWith': _parse_commonnames,
+    'searchByScientificName': _frame(["combinedName","tsn"]),
+    'searchForAnyMatch': _parse_anymatch,
+    'searchForAnyMatchPaged': _parse_anymatch,
+}
+
+# endpoints parsed from the raw response body rather than a tree
+_raw_parsers = {
+    'getTsnByVernacularLanguage': _parse_vernacular,
+}
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
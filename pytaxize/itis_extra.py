@@ -1,68 +1,85 @@
-# def itis_downstream(tsn, downto):
-#     '''
-#     Retrieve all taxa names or TSNs downstream in hierarchy from given TSN.
+import pandas as pd
+from pytaxize import ranks
+from pytaxize.itis import gethierarchydownfromtsn
+from pytaxize.batch import pmap
 
-#     :param tsn: A taxonomic serial number.
-#     :param downto: The taxonomic level you want to go down to. See examples below.
-#          The taxonomic level IS case sensitive, and you do have to spell it
-#          correctly. See \code{data(rank_ref)} for spelling.
-#     :param verbose: logical; If TRUE (default), informative messages printed.
+def itis_downstream(tsn, downto, max_workers=8, max_depth=None, max_nodes=None):
+    '''
+    Retrieve all taxa downstream in hierarchy from given TSN to a given rank.
 
-#     Usage:
-#     pytaxize.itis_downstream(tsn=846509, downto="Genus")
+    :param tsn: A taxonomic serial number.
+    :param downto: The taxonomic level you want to go down to. See examples below.
+         The taxonomic level is not case sensitive, but you do have to spell it
+         correctly. See pytaxize/data/rank_ref.csv for spelling.
+    :param max_workers: Maximum number of requests in flight at once
+    :param max_depth: Stop after expanding this many levels below tsn
+    :param max_nodes: Stop expanding once this many taxa have been visited
 
-#     # getting families downstream from Acridoidea
-#     pytaxize.itis_downstream(tsn=650497, "Family")
+    Returns a DataFrame with columns tsn, rankName, taxonName, parentName and
+    parentTsn. See `itis_downstream_iter` to get results level by level.
 
-#     # getting species downstream from Ursus
-#     pytaxize.itis_downstream(tsn=180541, downto="Species")
-#     '''
-#     dat = pd.read_csv("rank_ref.csv", header=False)
-#     downto2 = dat[dat['ranks'].str.contains(downto)]['rankId']
-#     torank_ids = dat[dat[dat['ranks'].str.contains(downto)].index : dat.shape[0]]['rankId']
+    Usage:
+    pytaxize.itis_downstream(tsn=846509, downto="Genus")
 
-#     # stuff = [x for x in dat.ranks]
-#     # things = []
-#     # for i in range(len(stuff)):
-#     #     ss = downto in stuff[i]
-#     #     things.append(ss)
-#     # dat2 = dat.join(pd.DataFrame(things, columns=['match']))
-#     # subset = dat2[dat2.loc[dat2.match == True].index[0]: dat2.shape[0]]
-#     # torank = [x.split(',')[0] for x in subset.ranks]
+    # getting families downstream from Acridoidea
+    pytaxize.itis_downstream(tsn=650497, downto="Family")
 
-#     tsn2 = convertsingle(tsn)
+    # getting species downstream from Ursus
+    pytaxize.itis_downstream(tsn=180541, downto="Species")
+    '''
+    out = list(itis_downstream_iter(tsn, downto, max_workers, max_depth, max_nodes))
+    if len(out) == 0:
+        return pd.DataFrame(columns=['tsn','rankName','taxonName','parentName','parentTsn'])
+    return pd.concat(out, ignore_index=True)
 
-#     stop_ = "not"
-#     notout = pd.DataFrame(columns=['rankName'])
-#     out = []
-#     while(stop_ == "not"):
-#         temp = []
-#         if(len([x for x in notout.rankName]) == 0):
-#             temp = pytaxize.gettaxonomicranknamefromtsn(tsn2)
-#         else:
-#             temp = notout
-#         tt = pytaxize.gethierarchydownfromtsn(temp['tsn'])
+def itis_downstream_iter(tsn, downto, max_workers=8, max_depth=None, max_nodes=None):
+    '''
+    Walk the ITIS hierarchy down from a TSN, one level at a time.
 
-#         names = []
-#         for i in range(len(tt['tsn'])):
-#             d = pytaxize.gettaxonomicranknamefromtsn(tt['tsn'][i])
-#             names.append(d)
-#         names2 = pd.DataFrame(names)
-#         tt = tt.merge(names2, on='tsn')
-#         if(tt[tt['rankId'].str.contains(downto2.to_string().split(' ')[-1])].shape[0] > 0):
-#             out.append(tt[tt['rankId'].str.contains(downto2.to_string().split(' ')[-1])])
+    Each level is expanded with up to max_workers concurrent
+    `gethierarchydownfromtsn` requests. The rank of every child comes with the
+    hierarchy response, so no extra request is made per TSN. Taxa of rank
+    downto are collected, taxa ranked above it or of a rank not in
+    rank_ref.csv are expanded further, and TSNs already visited are skipped,
+    which guards against cycles and duplicates.
 
-#         if(tt.drop(matched.index).shape[0] > 0):
-#             shit = list(set([str(x) for x in torank_ids.tolist()]) - set(tt['rankId'].tolist()))
-#             notout = pd.DataFrame([tt[tt['rankId'].str.contains(x)] for x in shit])
-#         else:
-#             notout = pd.DataFrame([downto], columns=['rankName'])
+    :param tsn: A taxonomic serial number.
+    :param downto: The taxonomic level you want to go down to, e.g. "Species"
+    :param max_workers: Maximum number of requests in flight at once
+    :param max_depth: Stop after expanding this many levels below tsn
+    :param max_nodes: Stop expanding once this many taxa have been visited
 
-#         if(all(notout['rankName'] == downto)):
-#             stop_ = "fam"
-#         else:
-#             tsns = notout$tsn
-#             stop_ = "not"
-#     tmp = ldply(out)
-#     names(tmp) = tolower(names(tmp))
-#     tmp
+    Yields a DataFrame of the downto taxa found at each level, as soon as that
+    level is complete.
+
+    Usage:
+    for df in pytaxize.itis_downstream_iter(tsn=180541, downto="Species"):
+        print(df)
+    '''
+    target = ranks.rank_id(downto)
+    if target is None:
+        raise ValueError("Unknown rank '%s'; see pytaxize/data/rank_ref.csv" % downto)
+
+    seen = set([str(tsn)])
+    frontier = [tsn]
+    depth = 0
+    while len(frontier) > 0:
+        if max_depth is not None and depth >= max_depth:
+            break
+        depth += 1
+        level = []
+        for df, error in pmap(gethierarchydownfromtsn, frontier, max_workers):
+            if error is not None:
+                raise error
+            level.append(df)
+        level = pd.concat(level, ignore_index=True).drop_duplicates('tsn')
+        level = level[~level['tsn'].isin(seen)]
+        if max_nodes is not None:
+            level = level.iloc[:max(max_nodes - len(seen) + 1, 0)]
+        seen.update(level['tsn'])
+        rid = ranks.rank_id_many(level['rankName'])
+        found = level[rid == target]
+        if found.shape[0] > 0:
+            yield found.reset_index(drop=True)
+        # unknown ranks (rid 0) may sit above downto, so expand them too
+        frontier = level['tsn'][rid < target].tolist()
@@ -0,0 +1,300 @@
+'''
+Answer ITIS lookups from a local copy of the ITIS database.
+
+ITIS publishes complete dumps of its database, one of them as a SQLite file
+(itisSqlite.zip, see https://www.itis.gov/downloads/). `build` copies such a
+dump and adds the indexes the lookups below need. Once a store is set with
+`pytaxize.itis_backend`, the functions in pytaxize.itis that ItisLocal
+implements are answered from disk, returning the same DataFrame's as the web
+service; everything else still goes to the web service.
+
+Build a store from the command line:
+python -m pytaxize.itis_local build itisSqlite.zip ~/itis.sqlite
+
+Usage:
+>>> import pytaxize
+>>> pytaxize.itis_backend('~/itis.sqlite')
+>>> pytaxize.getfullhierarchyfromtsn(tsn = 180543)  # from disk
+>>> pytaxize.itis_backend(None)  # back to the web service
+'''
+import os
+import sys
+import shutil
+import sqlite3
+import zipfile
+import threading
+import pandas as pd
+from pytaxize.itis import _array2df
+
+default_path = os.path.join(os.path.expanduser('~'), '.cache', 'pytaxize',
+    'itis.sqlite')
+
+# indexes added to the ITIS dump by build()
+indexes = {
+    'pytaxize_units_parent': 'taxonomic_units (parent_tsn)',
+    'pytaxize_units_rank': 'taxonomic_units (kingdom_id, rank_id)',
+    'pytaxize_longnames_name': 'longnames (completename COLLATE NOCASE)',
+    'pytaxize_vernaculars_tsn': 'vernaculars (tsn)',
+    'pytaxize_vernaculars_name': 'vernaculars (vernacular_name COLLATE NOCASE)',
+    'pytaxize_vernaculars_language': 'vernaculars (language COLLATE NOCASE)',
+    'pytaxize_types_rank': 'taxon_unit_types (kingdom_id, rank_id)',
+    'pytaxize_authors_id': 'taxon_authors_lkp (taxon_author_id)',
+    'pytaxize_synonyms_tsn': 'synonym_links (tsn)',
+    'pytaxize_geographic_tsn': 'geographic_div (tsn)',
+    'pytaxize_jurisdiction_tsn': 'jurisdiction (tsn)',
+}
+
+# one row per taxon: the fields of an ITIS hierarchy record
+_taxa = '''SELECT t.tsn, TRIM(r.rank_name), l.completename, pl.completename,
+    NULLIF(t.parent_tsn, 0), a.taxon_author
+    FROM taxonomic_units t
+    JOIN longnames l ON l.tsn = t.tsn
+    LEFT JOIN longnames pl ON pl.tsn = t.parent_tsn
+    LEFT JOIN taxon_unit_types r ON r.kingdom_id = t.kingdom_id AND r.rank_id = t.rank_id
+    LEFT JOIN taxon_authors_lkp a ON a.taxon_author_id = t.taxon_author_id'''
+
+_children = _taxa + ''' WHERE t.parent_tsn = ? AND t.name_usage IN ('valid', 'accepted')
+    ORDER BY l.completename'''
+
+_ancestors = '''WITH RECURSIVE up(tsn, depth) AS (
+    SELECT ?, 0
+    UNION ALL SELECT t.parent_tsn, up.depth + 1 FROM taxonomic_units t JOIN up ON t.tsn = up.tsn
+    WHERE t.parent_tsn > 0)''' + _taxa + ''' JOIN up ON up.tsn = t.tsn ORDER BY up.depth DESC'''
+
+_commonnames = '''SELECT vernacular_name, language, tsn FROM vernaculars'''
+
+class ItisLocal(object):
+    '''
+    ITIS lookups answered from a store made by `build`. Methods take the same
+    arguments as the functions of the same name in pytaxize.itis; request
+    options passed as keyword arguments are ignored.
+
+    :param path: Path to the SQLite store
+
+    Searches differ from the web service in one way: searchbyscientificname
+    matches names starting with x, so it can use the name index.
+    '''
+    def __init__(self, path=None):
+        self.path = os.path.expanduser(path or default_path)
+        if not os.path.isfile(self.path):
+            raise IOError("no ITIS store at %s, see pytaxize.itis_local.build" % self.path)
+        self._local = threading.local()
+
+    def __repr__(self):
+        return """<%s %s>""" % (type(self).__name__, self.path)
+
+    def _db(self):
+        # sqlite connections can't be shared between threads, so keep one per thread
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, check_same_thread=False)
+            self._local.db = db
+        return db
+
+    def _rows(self, sql, args=()):
+        return self._db().execute(sql, args).fetchall()
+
+    def _frame(self, sql, args, colnames):
+        rows = self._rows(sql, args)
+        cols = [[_text(x[i]) for x in rows] for i in range(len(colnames))]
+        return pd.DataFrame(dict(zip(colnames, cols)))
+
+    def _hier(self, rows):
+        df = pd.DataFrame([dict(zip(['tsn','rankName','taxonName','parentName','parentTsn'],
+            [_text(v) for v in x[:5]])) for x in rows],
+            columns=['tsn','rankName','taxonName','parentName','parentTsn'])
+        return df
+
+    def getfullhierarchyfromtsn(self, tsn, **kwargs):
+        return self._hier(self._rows(_ancestors, (int(tsn),)) + self._rows(_children, (int(tsn),)))
+
+    def gethierarchydownfromtsn(self, tsn, **kwargs):
+        return self._hier(self._rows(_children, (int(tsn),)))
+
+    def gethierarchyupfromtsn(self, tsn, **kwargs):
+        rows = self._rows(_taxa + ' WHERE t.tsn = ?', (int(tsn),))
+        keys = ['tsn','rankName','taxonName','parentName','parentTsn','author']
+        vals = [_text(v) for v in rows[0]] if len(rows) > 0 else [None] * 6
+        each = dict(zip(keys, vals))
+        return pd.DataFrame([dict((k, each[k]) for k in
+            ['author','parentName','parentTsn','rankName','taxonName','tsn'])])
+
+    def getparenttsnfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT NULLIF(parent_tsn, 0), tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['parenttsn','tsn'])
+
+    def getacceptednamesfromtsn(self, tsn, **kwargs):
+        rows = self._rows('''SELECT l.completename, s.tsn_accepted FROM synonym_links s
+            JOIN longnames l ON l.tsn = s.tsn_accepted WHERE s.tsn = ?''', (int(tsn),))
+        if len(rows) == 0:
+            return str(tsn)
+        return {'acceptedName': rows[0][0], 'acceptedTsn': _text(rows[0][1]),
+                'submittedTsn': str(tsn)}
+
+    def getcommonnamesfromtsn(self, tsn, **kwargs):
+        rows = self._rows(_commonnames + ' WHERE tsn = ?', (int(tsn),))
+        res = [[_text(x[i]) for x in rows] for i in range(3)]
+        return _array2df(res, ['comname','lang','tsn'])
+
+    def getscientificnamefromtsn(self, tsn, **kwargs):
+        return self._frame('''SELECT l.completename, t.unit_ind1, t.unit_ind3, t.unit_name1,
+            t.unit_name2, t.unit_name3, t.tsn FROM taxonomic_units t
+            JOIN longnames l ON l.tsn = t.tsn WHERE t.tsn = ?''', (int(tsn),),
+            ['combinedname','unitind1','unitind3','unitname1','unitname2','unitname3','tsn'])
+
+    def getkingdomnamefromtsn(self, tsn, **kwargs):
+        return self._frame('''SELECT k.kingdom_id, TRIM(k.kingdom_name), t.tsn FROM taxonomic_units t
+            JOIN kingdoms k ON k.kingdom_id = t.kingdom_id WHERE t.tsn = ?''', (int(tsn),),
+            ['kingdomid','kingdomname','tsn'])
+
+    def gettaxonomicranknamefromtsn(self, tsn, **kwargs):
+        return self._frame('''SELECT k.kingdom_id, TRIM(k.kingdom_name), t.rank_id,
+            TRIM(r.rank_name), t.tsn FROM taxonomic_units t
+            JOIN kingdoms k ON k.kingdom_id = t.kingdom_id
+            LEFT JOIN taxon_unit_types r ON r.kingdom_id = t.kingdom_id AND r.rank_id = t.rank_id
+            WHERE t.tsn = ?''', (int(tsn),),
+            ['kingdomid','kingdomname','rankid','rankname','tsn'])
+
+    def gettaxonauthorshipfromtsn(self, tsn, **kwargs):
+        return self._frame('''SELECT a.taxon_author, a.update_date, t.tsn FROM taxonomic_units t
+            JOIN taxon_authors_lkp a ON a.taxon_author_id = t.taxon_author_id
+            WHERE t.tsn = ?''', (int(tsn),), ['authorship','updatedate','tsn'])
+
+    def gettaxonomicusagefromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT name_usage, tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['taxonusagerating','tsn'])
+
+    def getunacceptabilityreasonfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT tsn, unaccept_reason FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['tsn','unacceptreason'])
+
+    def getcredibilityratingfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT credibility_rtng, tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['credrating','tsn'])
+
+    def getcurrencyfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT rank_id, currency_rating, tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['rankid','taxoncurrency','tsn'])
+
+    def getglobalspeciescompletenessfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT completeness_rtng, rank_id, tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['completeness','rankid','tsn'])
+
+    def getdatedatafromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT initial_time_stamp, update_date, tsn FROM taxonomic_units WHERE tsn = ?',
+            (int(tsn),), ['initialtimestamp','updatedate','tsn'])
+
+    def getgeographicdivisionsfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT geographic_value, update_date FROM geographic_div WHERE tsn = ?',
+            (int(tsn),), ['geographicvalue','updatedate'])
+
+    def getjurisdictionaloriginfromtsn(self, tsn, **kwargs):
+        return self._frame('SELECT jurisdiction_value, origin, update_date FROM jurisdiction WHERE tsn = ?',
+            (int(tsn),), ['jurisdictionvalue','origin','updatedate'])
+
+    def getlsidfromtsn(self, tsn, **kwargs):
+        rows = self._rows('SELECT tsn FROM taxonomic_units WHERE tsn = ?', (int(tsn),))
+        if len(rows) == 0:
+            return "no match"
+        return "urn:lsid:itis.gov:itis_tsn:%s" % rows[0][0]
+
+    def getranknames(self, **kwargs):
+        return self._frame('''SELECT TRIM(k.kingdom_name), r.rank_id, TRIM(r.rank_name)
+            FROM taxon_unit_types r JOIN kingdoms k ON k.kingdom_id = r.kingdom_id
+            ORDER BY r.kingdom_id, r.rank_id''', (), ['kingdomname','rankid','rankname'])
+
+    def getkingdomnames(self, **kwargs):
+        return self._frame('''SELECT k.kingdom_id, TRIM(k.kingdom_name), t.tsn FROM kingdoms k
+            LEFT JOIN taxonomic_units t ON t.kingdom_id = k.kingdom_id AND t.rank_id = 10
+            AND t.parent_tsn = 0 ORDER BY k.kingdom_id''', (), ['kingdomid','kingdomname','tsn'])
+
+    def getvernacularlanguages(self, **kwargs):
+        return self._frame('SELECT DISTINCT language FROM vernaculars ORDER BY language',
+            (), ['languagenames'])
+
+    def gettsnbyvernacularlanguage(self, language, **kwargs):
+        return self._frame(_commonnames + ' WHERE language = ? COLLATE NOCASE',
+            (language,), ['commonname','language','tsn'])
+
+    def searchbyscientificname(self, x, **kwargs):
+        return self._frame('''SELECT completename, tsn FROM longnames
+            WHERE completename LIKE ? ESCAPE '\\' ORDER BY completename''',
+            (_like(x) + '%',), ['combinedname','tsn'])
+
+    def searchbycommonname(self, x, **kwargs):
+        return self._frame(_commonnames + " WHERE vernacular_name LIKE ? ESCAPE '\\'",
+            ('%' + _like(x) + '%',), ['commonname','language','tsn'])
+
+    def searchbycommonnamebeginswith(self, x, **kwargs):
+        return self._frame(_commonnames + " WHERE vernacular_name LIKE ? ESCAPE '\\'",
+            (_like(x) + '%',), ['commonname','language','tsn'])
+
+    def searchbycommonnameendswith(self, x, **kwargs):
+        return self._frame(_commonnames + " WHERE vernacular_name LIKE ? ESCAPE '\\'",
+            ('%' + _like(x),), ['commonname','language','tsn'])
+
+    def close(self):
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+def build(source, path=None):
+    '''
+    Build a local ITIS store from the ITIS SQLite dump.
+
+    :param source: itisSqlite.zip as downloaded from https://www.itis.gov/downloads/,
+        or the ITIS.sqlite file inside it
+    :param path: Where to write the store (default ~/.cache/pytaxize/itis.sqlite).
+        An existing file is replaced.
+
+    Returns the path of the store.
+
+    Usage:
+    >>> from pytaxize import itis_local
+    >>> itis_local.build('itisSqlite.zip')
+    '''
+    path = os.path.expanduser(path or default_path)
+    folder = os.path.dirname(os.path.abspath(path))
+    if not os.path.isdir(folder):
+        os.makedirs(folder)
+    tmp = path + '.tmp'
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as z:
+            member = [x for x in z.namelist() if x.lower().endswith('.sqlite')]
+            if len(member) == 0:
+                raise ValueError("no .sqlite file in %s" % source)
+            with z.open(member[0]) as f, open(tmp, 'wb') as out:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    else:
+        shutil.copyfile(source, tmp)
+    db = sqlite3.connect(tmp)
+    try:
+        tables = set(x[0] for x in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        for name, on in indexes.items():
+            if on.split(' ')[0] in tables:
+                db.execute('CREATE INDEX IF NOT EXISTS %s ON %s' % (name, on))
+        db.execute('ANALYZE')
+        db.commit()
+    finally:
+        db.close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp, path)
+    return path
+
+## helper functions
+def _text(x):
+    # the web service returns every field as text, and nothing for empty ones
+    if x is None or x == '':
+        return None
+    return x.strip() if x.__class__.__name__ in ['str', 'unicode'] else str(x)
+
+def _like(x):
+    return x.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+if __name__ == "__main__":
+    if len(sys.argv) in [3, 4] and sys.argv[1] == 'build':
+        print(build(*sys.argv[2:]))
+    else:
+        sys.exit("usage: python -m pytaxize.itis_local build SOURCE [PATH]")
@@ -0,0 +1,187 @@
+'''
+Parse scientific names locally, without sending them to the GNI or GBIF
+parser services.
+
+Names are split into genus, epithets, rank marker and authorship with one
+compiled regular expression, and parsed names are memoized, so repeated names
+(as in occurrence data) cost a dictionary lookup. Fields are those of
+`gbif_parse`; `parse_name` may add speciesAuthorship, which `gbif_parse` does
+not have and `name_parse` leaves out.
+
+Usage:
+>>> from pytaxize import nameparser
+>>> nameparser.parse_name('Vanessa atalanta (Linnaeus, 1758)')
+{'scientificName': 'Vanessa atalanta (Linnaeus, 1758)', 'type': 'WELLFORMED', 'genusOrAbove': 'Vanessa', 'specificEpithet': 'atalanta', 'bracketAuthorship': 'Linnaeus', 'bracketYear': '1758', 'authorsParsed': True, 'canonicalName': 'Vanessa atalanta', 'canonicalNameWithMarker': 'Vanessa atalanta', 'canonicalNameComplete': 'Vanessa atalanta (Linnaeus, 1758)'}
+'''
+import re
+import pandas as pd
+try:
+    from functools import lru_cache
+except ImportError:
+    lru_cache = None
+
+# the fields of gbif_parse, in the order of the DataFrame columns
+fields = ['scientificName', 'type', 'genusOrAbove', 'infraGeneric', 'specificEpithet',
+          'infraSpecificEpithet', 'rankMarker', 'notho', 'authorship', 'year',
+          'bracketAuthorship', 'bracketYear', 'authorsParsed', 'canonicalName',
+          'canonicalNameWithMarker', 'canonicalNameComplete']
+
+# rank markers as written, and as returned
+markers = {'subsp': 'subsp.', 'ssp': 'subsp.', 'var': 'var.', 'subvar': 'subvar.',
+           'f': 'f.', 'fo': 'f.', 'forma': 'f.', 'subf': 'subf.', 'cv': 'cv.',
+           'nothosubsp': 'nothosubsp.', 'nothovar': 'nothovar.', 'morph': 'morph',
+           'ab': 'ab.'}
+
+_marker = r'(?:%s)\b\.?' % '|'.join(sorted(markers, key=len, reverse=True))
+# lower case words that start an authorship rather than an epithet
+_particle = r'(?:de|del|della|der|van|von|da|di|du|la|le|ex|et|in|zu|d\')\b'
+_word = r'[a-zà-ÿ][a-zà-ÿ\-]+'
+
+_name = re.compile(r'''^
+    (?:(?P<gh>[x×])\s?)?
+    (?P<genus>[A-Z][a-zà-ÿ\-]+)
+    (?:\s+\((?P<sub>[A-Z][a-zà-ÿ\-]+)\))?
+    (?:\s+(?:(?P<sh>[x×])\s?)?(?!%(marker)s|%(particle)s)(?P<sp>%(word)s)
+      (?:
+        (?:\s+(?P<sauth>\S.*?))??\s+(?P<marker>%(marker)s)\s*(?P<infra>%(word)s)
+      | \s+(?!%(marker)s|%(particle)s)(?P<infra2>%(word)s)(?=\s|$)
+      )?
+    )?
+    (?:\s+(?P<auth>\S.*?))?
+    $''' % {'marker': _marker, 'particle': _particle, 'word': _word}, re.X | re.U)
+
+_authorship = re.compile(r'''^
+    (?:\((?P<bauth>[^()]*?),?\s*(?P<byear>\d{4})?\)\s*)?
+    (?P<auth>.*?),?\s*(?P<year>\d{4})?
+    $''', re.X | re.U)
+
+_informal = re.compile(r'^(?P<genus>[A-Z][a-zà-ÿ\-]+)\s+(?P<marker>spp?)\.?(?:\s.*)?$', re.U)
+_hybrid = re.compile(r'\s[x×]\s+[A-Z]', re.U)
+_space = re.compile(r'\s+', re.U)
+
+def parse_name(name):
+    '''
+    Parse one scientific name.
+
+    :param name: A scientific name, e.g. 'Poa annua L.'
+
+    Returns a dict with the fields found (see `fields`). Names that can't be
+    parsed get type DOUBTFUL and authorsParsed False. The authorship of the
+    species in an infraspecific name, as 'L.' in 'Poa annua L. var. annua',
+    is kept in speciesAuthorship, a field of its own that gbif_parse does not
+    return (it only keeps it in canonicalNameComplete).
+
+    Usage:
+    >>> from pytaxize import nameparser
+    >>> nameparser.parse_name('Secale cereale ssp. cereale')['canonicalNameWithMarker']
+    'Secale cereale subsp. cereale'
+    '''
+    return dict(_parse(name))
+
+def name_parse(scientificname):
+    '''
+    Parse scientific names locally; a drop-in for `gbif_parse` that needs no
+    network.
+
+    :param scientificname: A list or pandas Series of scientific names
+
+    Returns a DataFrame with the fields of `gbif_parse`, one row per name, in
+    the order given. Columns that are empty for all names are left out, as in
+    `gbif_parse`. For a Series, each distinct name is parsed once and the
+    result keeps the Series index.
+
+    Usage:
+    >>> import pytaxize
+    >>> pytaxize.name_parse(['Arrhenatherum elatius var. elatius',
+                 'Secale cereale subsp. cereale', 'Secale cereale ssp. cereale',
+                 'Vanessa atalanta (Linnaeus, 1758)'])
+    >>> occ = pd.read_csv('occurrences.csv')
+    >>> parsed = pytaxize.name_parse(occ['scientificName'])
+    '''
+    index = None
+    if(scientificname.__class__.__name__ == 'Series'):
+        index = scientificname.index
+    codes, uniq = pd.factorize(pd.Series(list(scientificname), dtype=object))
+    # missing names get an empty row, appended after the distinct names
+    codes[codes < 0] = len(uniq)
+    rows = [_row(x) for x in uniq] + [[None] * len(fields)]
+    df = pd.DataFrame(rows, columns=fields).take(codes)
+    df.index = index if index is not None else pd.RangeIndex(len(codes))
+    return df.dropna(axis=1, how='all')
+
+## helper functions
+def _parse(name):
+    text = _space.sub(' ', name.strip()) if name.__class__.__name__ in ['str', 'unicode'] else ''
+    out = {'scientificName': name}
+    informal = _informal.match(text)
+    if informal is not None:
+        out.update({'type': 'INFORMAL', 'genusOrAbove': informal.group('genus'),
+            'rankMarker': informal.group('marker') + '.', 'authorsParsed': True,
+            'canonicalName': informal.group('genus')})
+        return out
+    if 'virus' in text.lower():
+        out.update({'type': 'VIRUS', 'authorsParsed': False})
+        return out
+    if _hybrid.search(text) is not None:
+        out.update({'type': 'HYBRID', 'authorsParsed': False})
+        return out
+    m = _name.match(text)
+    if m is None:
+        out.update({'type': 'DOUBTFUL', 'authorsParsed': False})
+        return out
+    genus = m.group('genus')
+    sub = m.group('sub')
+    sp = m.group('sp')
+    infra = m.group('infra') or m.group('infra2')
+    marker = m.group('marker')
+    if marker is not None:
+        marker = markers[marker.rstrip('.')]
+    out['genusOrAbove'] = genus
+    if sub is not None:
+        out['infraGeneric'] = sub
+    if sp is not None:
+        out['specificEpithet'] = sp
+    if infra is not None:
+        out['infraSpecificEpithet'] = infra
+    if marker is not None:
+        out['rankMarker'] = marker
+    if m.group('gh') is not None:
+        out['notho'] = 'GENERIC'
+    elif m.group('sh') is not None:
+        out['notho'] = 'SPECIFIC'
+    elif marker is not None and marker.startswith('notho'):
+        out['notho'] = 'INFRASPECIFIC'
+    authorship = ''
+    auth = m.group('auth')
+    if auth is not None:
+        a = _authorship.match(auth)
+        for key, field in [('auth', 'authorship'), ('year', 'year'),
+                           ('bauth', 'bracketAuthorship'), ('byear', 'bracketYear')]:
+            if a.group(key):
+                out[field] = a.group(key)
+        authorship = _authorship_string(out)
+    sauth = m.group('sauth')
+    if sauth is not None:
+        out['speciesAuthorship'] = sauth
+    out['authorsParsed'] = True
+    canonical = ' '.join([x for x in [genus, sp, infra] if x is not None])
+    withmarker = ' '.join([x for x in [genus, sp, marker, infra] if x is not None])
+    complete = ' '.join([x for x in [genus, sub and '(%s)' % sub, sp, sauth, marker, infra,
+        authorship or None] if x])
+    out['canonicalName'] = canonical
+    out['canonicalNameWithMarker'] = withmarker
+    out['canonicalNameComplete'] = complete
+    out['type'] = 'WELLFORMED' if complete == text else 'SCINAME'
+    return out
+
+def _authorship_string(x):
+    bracket = ', '.join([v for v in [x.get('bracketAuthorship'), x.get('bracketYear')] if v])
+    plain = ', '.join([v for v in [x.get('authorship'), x.get('year')] if v])
+    return ' '.join([v for v in ['(%s)' % bracket if bracket else None, plain] if v])
+
+def _row(name):
+    each = _parse(name)
+    return [each.get(f) for f in fields]
+
+if lru_cache is not None:
+    _parse = lru_cache(maxsize=2 ** 18)(_parse)
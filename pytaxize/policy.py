@@ -0,0 +1,316 @@
+'''
+Per-service request policies: rate limits, retries and a circuit breaker.
+
+Every request the shared transport sends goes through the Policy of its
+service (see `transport.service_for`):
+
+* a token bucket limits the request rate. The rate adapts: it is halved when
+  the service pushes back (429, or 503 with a Retry-After header) and grows
+  back by one request per second, per second, while requests succeed. A
+  service with no rate set is unlimited until it first pushes back, and then
+  limited to half the rate it was getting.
+* failed GET requests (connection errors and timeouts, and 429, 500, 502,
+  503 and 504 answers) are retried with exponential backoff and full jitter,
+  waiting at least as long as a Retry-After header asks. Other requests are
+  only retried on 429, or 503 with Retry-After.
+* after `failures` failed requests in a row (each counted once, however many
+  times it was retried) the circuit opens: calls fail at once with
+  CircuitOpen for `reset` seconds, then one trial request decides whether
+  the service is back.
+
+Usage:
+>>> from pytaxize import transport
+>>> from pytaxize.policy import Policy
+>>> transport.configure(policies={'itis': Policy(rate=20, retries=5), 'col': {'rate': 5}})
+>>> transport.get_transport().policy_for('itis').stats()
+'''
+import time
+import random
+import threading
+import email.utils
+import requests
+
+# answers that mean "try again later"
+retry_statuses = (429, 500, 502, 503, 504)
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    '''
+    Raised instead of sending a request while a service's circuit is open.
+    '''
+    pass
+
+class TokenBucket(object):
+    '''
+    Token bucket rate limiter with an adaptive (AIMD) rate.
+
+    :param rate: Requests per second, or None for no limit until the service
+        first pushes back
+    :param burst: Requests that may be sent at once after an idle spell
+        (default: max(1, rate))
+    :param min_rate: Lowest rate to slow down to. Default: 0.5
+    :param max_rate: Highest rate to speed back up to (default: rate; no
+        limit if rate is None)
+    '''
+    def __init__(self, rate=None, burst=None, min_rate=0.5, max_rate=None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self._tokens = self._capacity()
+        self._stamp = time.time()
+        # requests sent in the current and the previous second, to guess a
+        # starting rate when an unlimited service pushes back
+        self._window = (int(self._stamp), 0, 0)
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return """<%s rate=%s>""" % (type(self).__name__, self.rate)
+
+    def _capacity(self):
+        if self.burst is not None:
+            return float(self.burst)
+        return max(1.0, self.rate or 1.0)
+
+    def acquire(self):
+        '''
+        Wait until a request may be sent. Returns the seconds waited.
+        '''
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if wait == 0:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def _take(self):
+        # take a token and return 0, or return the seconds until there is one
+        with self._lock:
+            now = time.time()
+            second, current, previous = self._window
+            if int(now) != second:
+                self._window = (int(now), 0, current if int(now) == second + 1 else 0)
+            if self.rate is None:
+                self._count()
+                return 0
+            self._tokens = min(self._capacity(), self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._count()
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def _count(self):
+        second, current, previous = self._window
+        self._window = (second, current + 1, previous)
+
+    def throttled(self):
+        '''
+        The service asked to slow down: halve the rate.
+        '''
+        with self._lock:
+            if self.rate is None:
+                second, current, previous = self._window
+                self.rate = max(previous, current, 2) / 2.0
+            else:
+                self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = min(self._tokens, 1.0)
+
+    def succeeded(self):
+        '''
+        A request went through: speed up by one request per second, per second.
+        '''
+        with self._lock:
+            if self.rate is not None and (self.max_rate is None or self.rate < self.max_rate):
+                self.rate += 1.0 / max(self.rate, 1.0)
+                if self.max_rate is not None:
+                    self.rate = min(self.rate, self.max_rate)
+
+class CircuitBreaker(object):
+    '''
+    Stops calling a service that keeps failing.
+
+    :param failures: Failed requests in a row that open the circuit; None to
+        never open it
+    :param reset: Seconds the circuit stays open before a trial request
+    '''
+    def __init__(self, failures=10, reset=30):
+        self.failures = failures
+        self.reset = reset
+        self.state = 'closed'
+        self._failed = 0
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return """<%s %s>""" % (type(self).__name__, self.state)
+
+    def allow(self):
+        '''
+        Raise CircuitOpen if no request should be sent now.
+        '''
+        with self._lock:
+            if self.state == 'closed':
+                return
+            if self.state == 'open' and time.time() - self._opened >= self.reset:
+                # let one trial request through
+                self.state = 'half-open'
+                return
+            raise CircuitOpen("circuit open after %d failures in a row; retrying in %.1f s"
+                % (self._failed, max(0, self.reset - (time.time() - self._opened))))
+
+    def record(self, ok):
+        with self._lock:
+            if ok:
+                self._failed = 0
+                self.state = 'closed'
+                return
+            self._failed += 1
+            if self.state == 'half-open' or (self.failures is not None and self._failed >= self.failures):
+                self.state = 'open'
+                self._opened = time.time()
+
+class Policy(object):
+    '''
+    Rate limit, retry and circuit breaker settings for one service.
+
+    :param rate: Requests per second, or None (default) for no limit until the
+        service pushes back
+    :param burst: Requests that may be sent at once after an idle spell
+    :param min_rate: Lowest rate to slow down to. Default: 0.5
+    :param max_rate: Highest rate to speed back up to. Default: rate
+    :param retries: Times a failed request is retried. Default: 3
+    :param backoff: Base wait in seconds before the first retry; doubled for
+        each further one, with full jitter. Default: 0.5
+    :param max_backoff: Longest wait between retries, also for Retry-After.
+        Default: 60
+    :param failures: Failed requests in a row that open the circuit; None
+        to never open it. Default: 10
+    :param reset: Seconds the circuit stays open. Default: 30
+    '''
+    def __init__(self, rate=None, burst=None, min_rate=0.5, max_rate=None, retries=3,
+        backoff=0.5, max_backoff=60, failures=10, reset=30):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.bucket = TokenBucket(rate, burst, min_rate, max_rate)
+        self.breaker = CircuitBreaker(failures, reset)
+        self._counts = {'sent': 0, 'retried': 0, 'throttled': 0, 'failed': 0, 'waited': 0.0}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return """<%s rate=%s retries=%s circuit=%s>""" % (type(self).__name__,
+            self.bucket.rate, self.retries, self.breaker.state)
+
+    def send(self, method, fun, *args, **kwargs):
+        '''
+        Call fun(*args, **kwargs), which sends one request and returns a
+        requests Response, applying this policy.
+
+        :param method: HTTP method of the request; only GET requests are retried
+            after connection errors or server errors, since others may have gone
+            through. Other requests are retried only when the service plainly
+            refused them (429, or 503 with Retry-After)
+
+        Returns the Response, which may still be an error answer once retries
+        are used up. Raises CircuitOpen, or the last connection error.
+
+        The circuit breaker counts each request once, however many times it
+        was retried, and any exception (not only connection errors) counts as
+        a failure.
+        '''
+        self.breaker.allow()
+        ok = False
+        try:
+            res = self._attempts(method, fun, args, kwargs)
+            ok = res.status_code not in retry_statuses
+            return res
+        finally:
+            self.breaker.record(ok)
+            if not ok:
+                self._add('failed', 1)
+
+    def _attempts(self, method, fun, args, kwargs):
+        # send, retrying as allowed; the circuit is left to send()
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            self._add('sent', 1)
+            self._add('waited', waited)
+            res = error = None
+            try:
+                res = fun(*args, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            wait = self._next(method, attempt, res, error)
+            if wait is None:
+                if error is not None:
+                    raise error
+                return res
+            time.sleep(wait)
+            attempt += 1
+
+    def _next(self, method, attempt, res, error):
+        # after an attempt that gave res or raised a connection error: None to
+        # stop there, or the seconds to wait before retrying
+        if error is not None:
+            if method != 'GET' or attempt >= self.retries:
+                return None
+            return self._backoff(attempt, None)
+        refused = res.status_code == 429 or (res.status_code == 503 and 'Retry-After' in res.headers)
+        if refused:
+            self.bucket.throttled()
+            self._add('throttled', 1)
+        if res.status_code not in retry_statuses:
+            self.bucket.succeeded()
+            return None
+        if attempt >= self.retries or (method != 'GET' and not refused):
+            return None
+        return self._backoff(attempt, res.headers.get('Retry-After'))
+
+    def stats(self):
+        '''
+        Counts of requests sent, retried, throttled (asked to slow down) and
+        failed, seconds waited for the rate limit, and the current rate and
+        circuit state.
+        '''
+        with self._lock:
+            out = dict(self._counts)
+        out.update({'rate': self.bucket.rate, 'circuit': self.breaker.state})
+        return out
+
+    def _backoff(self, attempt, retry_after):
+        self._add('retried', 1)
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        after = _retry_after(retry_after)
+        if after is not None:
+            wait = max(wait, min(after, self.max_backoff))
+        return wait
+
+    def _add(self, key, n):
+        with self._lock:
+            self._counts[key] += n
+
+def make_policy(x):
+    '''
+    A Policy from a Policy (returned as is), a dict of Policy parameters, or
+    None (default settings).
+    '''
+    if isinstance(x, Policy):
+        return x
+    return Policy(**(x or {}))
+
+## helper functions
+def _retry_after(value):
+    # seconds to wait from a Retry-After header: a number of seconds or a date
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    date = email.utils.parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0.0, email.utils.mktime_tz(date) - time.time())
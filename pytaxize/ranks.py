@@ -0,0 +1,194 @@
+'''
+Taxonomic rank reference table, read from the bundled rank_ref dataset.
+
+Ranks are ordered by ITIS rankId: the larger the id, the lower the rank
+(Kingdom is 10, Family 140, Species 220). Names are case insensitive and
+include synonyms (Division for Phylum, Race for Subvariety). The table is
+parsed once into read-only maps both ways, so the lookups below are dict
+lookups, and the *_many functions work on whole columns.
+
+Usage:
+>>> from pytaxize import ranks
+>>> ranks.rank_id('Family')
+140
+>>> ranks.is_below('genus', 'family')
+True
+>>> ranks.is_below_many(df['rank'], 'family')
+'''
+import numpy as np
+import pandas as pd
+from pytaxize import datasets
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
+
+_maps = {}
+
+def rank_ids():
+    '''
+    Read-only dict mapping each rank name in rank_ref.csv (lower case,
+    synonyms included, e.g. 'division' and 'phylum') to its ITIS rankId.
+    '''
+    return _tables()['ids']
+
+def rank_names():
+    '''
+    Read-only dict mapping each ITIS rankId to its rank name, as spelled
+    first in rank_ref.csv (e.g. 30: 'Phylum').
+    '''
+    return _tables()['names']
+
+def rank_id(rank):
+    '''
+    The ITIS rankId of a rank name (case insensitive), or None if unknown.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> ranks.rank_id('Family')
+    140
+    '''
+    return _tables()['ids'].get(str(rank).strip().lower())
+
+def rank_name(rankid):
+    '''
+    The rank name of an ITIS rankId, or None if unknown.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> ranks.rank_name(180)
+    'Genus'
+    '''
+    try:
+        return _tables()['names'].get(int(rankid))
+    except (TypeError, ValueError):
+        return None
+
+def is_below(rank, other, inclusive=False):
+    '''
+    Whether a rank is below another one, e.g. genus below family.
+
+    :param rank: A rank name or rankId
+    :param other: A rank name or rankId
+    :param inclusive: Also True when both are the same rank. Default: False
+
+    Raises ValueError for an unknown rank.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> ranks.is_below('Species', 'genus')
+    True
+    >>> ranks.is_below('division', 'phylum', inclusive=True)
+    True
+    '''
+    a = _known(rank)
+    b = _known(other)
+    return a >= b if inclusive else a > b
+
+def ranks_below(rank, inclusive=True):
+    '''
+    All rank names (lower case, synonyms included) at or below a rank.
+
+    :param rank: A rank name or rankId
+    :param inclusive: Include the rank itself and its synonyms. Default: True
+
+    Returns a frozenset, e.g. for filtering a column with `isin`.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> df[df['rank'].str.lower().isin(ranks.ranks_below('species'))]
+    '''
+    target = _known(rank)
+    below = _tables()['below']
+    key = (target, inclusive)
+    if key not in below:
+        below[key] = frozenset(x for x, i in _tables()['ids'].items()
+            if (i >= target if inclusive else i > target))
+    return below[key]
+
+def rank_id_many(x):
+    '''
+    ITIS rankIds of many ranks at once.
+
+    :param x: A list, numpy array or pandas Series of rank names or rankIds
+
+    Returns a numpy array of int, with 0 for unknown or missing ranks.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> ranks.rank_id_many(['Family', 'genus', None, 220])
+    array([140, 180,   0, 220])
+    '''
+    x = pd.Series(np.asarray(x, dtype=object) if not hasattr(x, 'dtype') else x)
+    if x.dtype.kind in 'iu':
+        return x.values.astype(np.int64)
+    if x.dtype.kind == 'f':
+        return x.fillna(0).values.astype(np.int64)
+    # look up each distinct value once
+    codes, uniq = pd.factorize(x)
+    table = _tables()['ids']
+    ids = []
+    for v in uniq:
+        i = table.get(v.strip().lower()) if v.__class__.__name__ in ['str', 'unicode', 'str_'] else None
+        if i is None:
+            try:
+                i = int(v)
+            except (TypeError, ValueError):
+                i = 0
+        ids.append(i)
+    # missing values have code -1, which picks the trailing 0
+    ids = np.array(ids + [0], dtype=np.int64)
+    return ids[codes]
+
+def is_below_many(x, rank, inclusive=False):
+    '''
+    Whether each of many ranks is below a rank.
+
+    :param x: A list, numpy array or pandas Series of rank names or rankIds
+    :param rank: A rank name or rankId
+    :param inclusive: Also True where the rank is the same. Default: False
+
+    Returns a numpy array of bool; False for unknown or missing ranks.
+
+    Usage:
+    >>> from pytaxize import ranks
+    >>> ranks.is_below_many(['Family', 'genus', None], 'family', inclusive=True)
+    array([ True,  True, False])
+    '''
+    target = _known(rank)
+    ids = rank_id_many(x)
+    return (ids >= target) if inclusive else (ids > target)
+
+def is_above_many(x, rank, inclusive=False):
+    '''
+    Whether each of many ranks is above a rank; see `is_below_many`. False
+    for unknown or missing ranks.
+    '''
+    target = _known(rank)
+    ids = rank_id_many(x)
+    known = ids > 0
+    return known & ((ids <= target) if inclusive else (ids < target))
+
+## helper functions
+def _tables():
+    if len(_maps) == 0:
+        dat = datasets.load('rank_ref')
+        ids = {}
+        names = {}
+        for rankid, spellings in zip(dat['rankId'], dat['ranks']):
+            spellings = [x.strip() for x in spellings.split(',')]
+            names[int(rankid)] = spellings[0]
+            for x in spellings:
+                ids.setdefault(x.lower(), int(rankid))
+        _maps.update({'ids': MappingProxyType(ids), 'names': MappingProxyType(names),
+            'below': {}})
+    return _maps
+
+def _known(rank):
+    if rank.__class__.__name__ in ['str', 'unicode', 'str_']:
+        rankid = rank_id(rank)
+    else:
+        rankid = int(rank) if int(rank) in _tables()['names'] else None
+    if rankid is None:
+        raise ValueError("Unknown rank '%s'; see pytaxize/data/rank_ref.csv" % rank)
+    return rankid
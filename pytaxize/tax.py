@@ -1,10 +1,18 @@
+import os
 import sys
-import requests
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pytaxize import transport
+from pytaxize.batch import pmap_iter
 from lxml import etree
 import pandas as pd
 import re
 import json
-from pkg_resources import resource_filename
+from collections import OrderedDict
+from pytaxize import datasets
+from pytaxize.flatten import vascan_flat
 
 class NoResultException(Exception):
     pass
@@ -86,23 +94,8 @@ def names_list(rank = 'genus', size = 10):
      'Potamogetonales',
      'Ruppiales']
     '''
-    if(rank == 'species'):
-        pnpath = resource_filename(__name__, 'pytaxize/data/plantNames.csv')
-        dat = pd.read_csv(pnpath, header=False)
-        dat2 = dat['names'][:size]
-        return [x for x in dat2]
-    if(rank == 'genus'):
-        dat = pd.read_csv("../data/plantGenusNames.csv", header=False)
-        dat2 = dat['names'][:size]
-        return [x for x in dat2]
-    if(rank == 'family'):
-        dat = pd.read_csv("../data/apg_families.csv", header=False)
-        dat2 = dat['this'][:size]
-        return [x for x in dat2]
-    if(rank == 'order'):
-        dat = pd.read_csv("../data/apg_orders.csv", header=False)
-        dat2 = dat['this'][:size]
-        return [x for x in dat2]
+    if(rank in datasets.checklists):
+        return list(datasets.checklist_names(rank)[:size])
     else:
         return 'Pass in to rank one of species, genus, family, or order'
 
@@ -115,6 +108,9 @@ def vascan_search(q, format='json', raw=False):
     :param raw: Raw data or not (default)
     :param callopts: Further args passed to request
 
+    Parsed JSON results for more names than Vascan takes in one request (200)
+    are fetched in chunks, see vascan_search_bulk.
+
     Usage:
     >>> import pytaxize
     >>> pytaxize.vascan_search(q = ["Helianthus annuus"])
@@ -190,10 +186,12 @@ def vascan_search(q, format='json', raw=False):
     else:
         url = "http://data.canadensys.net/vascan/api/0.1/search.xml"
 
+    if(format == 'json' and not raw and len(q) > vascan_chunk_size):
+        return vascan_search_bulk(q)
     if(len(q) > 1):
         query = "\n".join(q)
         payload = {'q': query}
-        out = requests.post(url, data=payload)
+        out = transport.post(url, data=payload)
         out.raise_for_status()
         if(format == 'json'):
             if(raw):
@@ -204,7 +202,7 @@ def vascan_search(q, format='json', raw=False):
             return out.text
     else:
         payload = {'q': q}
-        out = requests.get(url, params = payload)
+        out = transport.get(url, params = payload)
         out.raise_for_status()
         if(format == 'json'):
             if(raw):
@@ -214,6 +212,65 @@ def vascan_search(q, format='json', raw=False):
         else:
             return out.text
 
+def vascan_search_bulk(q, chunk_size = 200, max_workers = 4, flat = False):
+    '''
+    Search the CANADENSYS Vascan API for a large list of names.
+
+    Identical names are sent only once. The unique names are split into chunks
+    of at most chunk_size that are POSTed concurrently, and the results are
+    merged back in the order of q, duplicates included.
+
+    :param q: List of scientific names
+    :param chunk_size: Number of names sent per request; Vascan takes at most 200
+    :param max_workers: Maximum number of requests in flight at once
+    :param flat: If True, return the results flattened by
+        pytaxize.flatten.vascan_flat instead. Default: False
+
+    Returns a dict in the format of vascan_search, with one entry in 'results'
+    per name in q.
+
+    Usage:
+    >>> import pytaxize
+    >>> out = pytaxize.vascan_search_bulk(flora['scientificName'].tolist(), max_workers=8)
+    >>> len(out['results']) == flora.shape[0]
+    True
+    '''
+    uniq = list(OrderedDict.fromkeys(q))
+    found = {}
+    api = None
+    for start, res in _vascan_chunks(uniq, chunk_size, max_workers):
+        api = api or res.get('apiVersion')
+        for i, each in enumerate(res['results']):
+            found[start + i] = each
+    lookup = dict((x, found.get(i, {'searchedTerm': x, 'numMatches': 0})) for i, x in enumerate(uniq))
+    out = {'apiVersion': api, 'results': [lookup[x] for x in q]}
+    if(flat):
+        return vascan_flat(out, q)
+    return out
+
+def vascan_search_iter(q, chunk_size = 200, max_workers = 4):
+    '''
+    Search the CANADENSYS Vascan API for a large list of names, yielding a
+    flat DataFrame for each chunk of names as soon as it arrives.
+
+    :param q: List of scientific names; identical names are sent only once
+    :param chunk_size: Number of names sent per request; Vascan takes at most 200
+    :param max_workers: Maximum number of requests in flight at once
+
+    Each DataFrame is made by pytaxize.flatten.vascan_flat: one row per searched
+    name and accepted or synonym assertion. Its supplied_name column holds the
+    name as given in q, to match rows back to the input. Chunks come in the
+    order they finish.
+
+    Usage:
+    >>> import pytaxize
+    >>> for df in pytaxize.vascan_search_iter(flora['scientificName'].tolist()):
+    ...     df.to_csv('vascan.csv', mode='a', header=False)
+    '''
+    uniq = list(OrderedDict.fromkeys(q))
+    for start, res in _vascan_chunks(uniq, chunk_size, max_workers):
+        yield vascan_flat(res, uniq[start:start + len(res['results'])])
+
 def gbif_parse(scientificname):
     '''
     Parse taxon names using the GBIF name parser.
@@ -266,16 +323,67 @@ def gbif_parse(scientificname):
     2         Secale cereale ssp. cereale         cereale     SCINAME
     3   Vanessa atalanta (Linnaeus, 1758)        atalanta  WELLFORMED
     '''
-    url = "http://api.gbif.org/v0.9/parser/name"
-    headers = {'content-type': 'application/json'}
-    tt = requests.post(url, data=json.dumps(scientificname), headers=headers)
+    if len(scientificname) > gbif_chunk_size:
+        return gbif_parse_bulk(scientificname)
+    tt = transport.post(gbif_url, data=json.dumps(scientificname), headers=gbif_headers)
     tt.raise_for_status()
     res = pd.DataFrame(tt.json())
     return res
 
+def gbif_parse_bulk(scientificname, chunk_size = 500, max_workers = 4, cache = True):
+    '''
+    Parse a large list of taxon names using the GBIF name parser.
+
+    Identical names are parsed only once, and parsed names are kept in memory
+    (by exact string) for later calls. The names not parsed yet are split into
+    chunks of at most chunk_size that are POSTed concurrently.
+
+    :param scientificname: A list or pandas Series of scientific names
+    :param chunk_size: Number of names sent per request
+    :param max_workers: Maximum number of requests in flight at once
+    :param cache: Use and fill the in-memory cache of parsed names. Default: True
+
+    Returns a DataFrame like gbif_parse, with one row per name in
+    scientificname, duplicates included, in the same order (and with the same
+    index if a Series is given). Missing names (None or NaN) give empty rows.
+
+    Usage:
+    >>> import pytaxize
+    >>> df = pytaxize.gbif_parse_bulk(occurrences['scientificName'])
+    >>> df['canonicalName'].value_counts()
+    '''
+    names = scientificname if isinstance(scientificname, pd.Series) else pd.Series(list(scientificname))
+    codes, uniq = pd.factorize(names)
+    found = {}
+    todo = []
+    with _gbif_lock:
+        for x in uniq:
+            rec = _gbif_parsed.get(x) if cache else None
+            if rec is None:
+                todo.append(x)
+            else:
+                found[x] = rec
+    for start, res in _gbif_chunks(todo, chunk_size, max_workers):
+        for x, rec in zip(todo[start:start + chunk_size], res):
+            found[x] = rec
+    if cache:
+        _gbif_remember(found)
+    # missing names have code -1, which picks the trailing empty row
+    recs = [found.get(x, {'scientificName': x}) for x in uniq] + [{}]
+    res = pd.DataFrame(recs).take(codes)
+    res.index = names.index
+    return res
+
+def gbif_clear_cache():
+    '''
+    Forget the names parsed by gbif_parse_bulk so far.
+    '''
+    with _gbif_lock:
+        _gbif_parsed.clear()
+
 def scrapenames(url = None, file = None, text = None, engine = None,
   unique = None, verbatim = None, detect_language = None, all_data_sources = None,
-  data_source_ids = None):
+  data_source_ids = None, timeout = 600):
   '''
   Resolve names using Global Names Recognition and Discovery.
 
@@ -301,6 +409,12 @@ def scrapenames(url = None, file = None, text = None, engine = None,
      names against all available Data Sources.
   :param data_source_ids: (optional) Type: string. Pipe separated list of data
      source ids to resolve found names against. See list of Data Sources.
+  :param timeout: Seconds to wait for GNRD to finish the document (default 600).
+     GNRD is asked for the result after 0.5 s, then after twice as long each
+     time, up to 10 s apart.
+
+  To scrape many documents concurrently, see scrapenames_many, or
+  scrapenames_submit to start one in the background.
 
   Usage:
   # Get data from a website using its URL
@@ -323,40 +437,167 @@ def scrapenames(url = None, file = None, text = None, engine = None,
   '''
   method = {'url': url, 'file': file, 'text': text}
   method = {key: value for key, value in method.items() if value != None}
-  if(len(method) > 1):
-    sys.exit("Only one of url, file, or text can be used")
-
-  base = "http://gnrd.globalnames.org/name_finder.json"
-  payload = {'url':url, 'text':text, 'engine':engine, 'unique':unique,
-             'verbatim':verbatim, 'detect_language':detect_language,
-             'all_data_sources':all_data_sources, 'data_source_ids':data_source_ids}
-
-  ss = []
-  for i in range(len(method.keys())):
-    ss.append(method.keys()[i] in ['url','text'])
-  if(any(ss)):
-    tt = requests.get(base, params=payload)
-  else:
-    pass
-    # tt = requests.post(base, params=payload, multipart=True, body = [file=upload_file(file)])
+  if(len(method) != 1):
+    raise ValueError("Use one of url, file, or text")
 
-  tt.raise_for_status()
-  out = tt.json()
+  options = {'engine':engine, 'unique':unique, 'verbatim':verbatim,
+             'detect_language':detect_language, 'all_data_sources':all_data_sources,
+             'data_source_ids':data_source_ids}
+  return _gnrd_job(list(method.items())[0], options, timeout)
+
+def scrapenames_submit(url = None, file = None, text = None, timeout = 600,
+  executor = None, **kwargs):
+  '''
+  Start a scrapenames job for one document without waiting for it.
+
+  :param url: An encoded URL for a web page, PDF, Microsoft Office document, or
+     image file
+  :param file: Path of a file to send
+  :param text: Text content
+  :param timeout: Seconds to wait for GNRD to finish the document (default 600)
+  :param executor: A concurrent.futures executor to run the job on (default:
+     a shared pool of 8 threads)
+  :param kwargs: Further options of scrapenames, e.g. engine or unique
+
+  Returns a concurrent.futures.Future; its result is what scrapenames returns.
+
+  Usage:
+  job = pytaxize.scrapenames_submit(url = 'http://en.wikipedia.org/wiki/Araneae')
+  # ... do other things
+  job.result()['data'].head()
+  '''
+  method = {'url': url, 'file': file, 'text': text}
+  method = {key: value for key, value in method.items() if value != None}
+  if(len(method) != 1):
+    raise ValueError("Use one of url, file, or text")
+  return (executor or _gnrd_executor()).submit(_gnrd_job, list(method.items())[0],
+    kwargs, timeout)
+
+def scrapenames_many(url = None, file = None, text = None, max_workers = 8,
+  timeout = 600, **kwargs):
+  '''
+  Scrape names from many documents at once.
+
+  :param url: A list of URLs
+  :param file: A list of file paths
+  :param text: A list of texts
+  :param max_workers: Number of documents sent and polled at the same time
+  :param timeout: Seconds to wait for GNRD to finish each document (default 600)
+  :param kwargs: Further options of scrapenames, e.g. engine or unique
 
-  if(out['status'] != 303):
-    sys.exit("Woops, something went wrong")
+  Yields a (document, result, error) triple as each document is done, in
+  the order they finish. document is the URL, path or text given; result is
+  what scrapenames returns, or None if the document failed, in which case
+  error holds the exception.
+
+  Usage:
+  for doc, res, error in pytaxize.scrapenames_many(url = pdf_urls):
+      if error is None:
+          print(doc, res['data'].shape)
+  '''
+  docs = [('url', x) for x in (url or [])] + [('file', x) for x in (file or [])] + \
+    [('text', x) for x in (text or [])]
+  for i, res, error in pmap_iter(lambda x: _gnrd_job(x, kwargs, timeout), docs, max_workers):
+    yield docs[i][1], res, error
+
+## helper functions
+vascan_url = "http://data.canadensys.net/vascan/api/0.1/search.json"
+vascan_chunk_size = 200
+
+def _vascan_chunks(uniq, chunk_size, max_workers):
+    # POST chunks of names concurrently; yield (start, parsed json) as each
+    # chunk is done
+    chunk_size = min(chunk_size, vascan_chunk_size)
+
+    def func(start):
+        out = transport.post(vascan_url, data={'q': '\n'.join(uniq[start:start + chunk_size])})
+        out.raise_for_status()
+        return out.json()
+
+    starts = list(range(0, len(uniq), chunk_size))
+    for i, res, error in pmap_iter(func, starts, max_workers):
+        if error is not None:
+            raise error
+        yield starts[i], res
+
+gbif_url = "http://api.gbif.org/v0.9/parser/name"
+gbif_headers = {'content-type': 'application/json'}
+gbif_chunk_size = 500
+# parsed names by exact string, oldest first; at most gbif_cache_size of them
+gbif_cache_size = 2 ** 18
+_gbif_parsed = OrderedDict()
+_gbif_lock = threading.Lock()
+
+def _gbif_chunks(todo, chunk_size, max_workers):
+    # POST chunks of names concurrently; yield (start, parsed json) as each
+    # chunk is done
+    def func(start):
+        out = transport.post(gbif_url, data=json.dumps(todo[start:start + chunk_size]),
+            headers=gbif_headers)
+        out.raise_for_status()
+        return out.json()
+
+    starts = list(range(0, len(todo), chunk_size))
+    for i, res, error in pmap_iter(func, starts, max_workers):
+        if error is not None:
+            raise error
+        yield starts[i], res
+
+def _gbif_remember(found):
+    with _gbif_lock:
+        _gbif_parsed.update(found)
+        while len(_gbif_parsed) > gbif_cache_size:
+            _gbif_parsed.popitem(last=False)
+
+gnrd_url = "http://gnrd.globalnames.org/name_finder.json"
+_gnrd_pool = []
+_gnrd_lock = threading.Lock()
+
+def _gnrd_executor():
+  if(len(_gnrd_pool) == 0):
+    with _gnrd_lock:
+      if(len(_gnrd_pool) == 0):
+        _gnrd_pool.append(ThreadPoolExecutor(8))
+  return _gnrd_pool[0]
+
+def _gnrd_job(doc, options, timeout):
+  # send one document to GNRD and wait for its names
+  kind, value = doc
+  payload = {key: value for key, value in options.items() if value != None}
+  if(kind == 'url'):
+    payload['url'] = value
+    tt = transport.get(gnrd_url, params=payload)
+  elif(kind == 'text'):
+    payload['text'] = value
+    tt = transport.post(gnrd_url, data=payload)
   else:
-    token_url = out['token_url']
-    st = 303
-    while(st == 303):
-      dat = requests.get(token_url)
-      dat.raise_for_status
-      datout = dat.json()
-      st = datout['status']
-    dd = pd.DataFrame(datout['names'])
-    datout.pop('names')
-    meta = datout
-    return {'meta': meta, 'data': dd}
+    # send bytes, not the open file, so a retried POST uploads it all again
+    with open(value, 'rb') as f:
+      body = f.read()
+    tt = transport.post(gnrd_url, data=payload, files={'file': (os.path.basename(value), body)})
+  tt.raise_for_status()
+  out = tt.json()
+  if(out.get('status') == 303):
+    out = _gnrd_poll(out['token_url'], timeout)
+  if('names' not in out):
+    raise NoResultException("GNRD returned no names (status %s)" % out.get('status'))
+  dd = pd.DataFrame(out.pop('names'))
+  return {'meta': out, 'data': dd}
+
+def _gnrd_poll(token_url, timeout, delay=0.5, max_delay=10):
+  # GNRD answers 303 until the document is done; ask again after a growing,
+  # jittered delay rather than in a tight loop
+  start = time.time()
+  while True:
+    dat = transport.get(token_url)
+    dat.raise_for_status()
+    out = dat.json()
+    if(out.get('status') != 303):
+      return out
+    if(time.time() - start + delay > timeout):
+      raise NoResultException("GNRD did not finish %s in %s s" % (token_url, timeout))
+    time.sleep(random.uniform(delay / 2, delay))
+    delay = min(delay * 2, max_delay)
 
 if __name__ == "__main__":
     import doctest
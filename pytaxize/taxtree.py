@@ -0,0 +1,411 @@
+'''
+In-memory taxonomy tree for fast ancestor, descendant and lowest common
+ancestor queries, without a web request per lookup.
+
+Taxa are stored in flat arrays: a parent pointer per taxon, the children of
+each taxon as offsets into one array (CSR), and each taxon's position in a
+preorder walk, so that the descendants of a taxon are one contiguous slice.
+Ancestor and LCA queries take O(depth), descendant queries O(subtree size).
+
+A tree can be filled incrementally from ITIS hierarchy DataFrames, or loaded
+in bulk from (tsn, parent) pairs or a local ITIS store (see pytaxize.itis_local).
+
+Usage:
+>>> from pytaxize.taxtree import TaxonTree
+>>> tree = TaxonTree()
+>>> tree.fill(180543)  # full hierarchy of Ursus arctos from ITIS
+>>> tree.fill(180544)
+>>> tree.lca(180543, 180544)
+180541
+>>> tree.ancestors(180543)
+[180541, 180540, 552303, 180539, 179925, 179916, 179913, 914181, 914179, 331030, 158852, 914156, 914154, 202423]
+>>> tree.at_rank(180543, 'family')
+180540
+>>> # bulk load, then LCA for many pairs at once
+>>> tree = TaxonTree.from_store('~/itis.sqlite')
+>>> tree.lca_many([180543, 180542, 41107], [180544, 180543, 180543])
+array([180541, 180541, 202419])
+'''
+import numpy as np
+import pandas as pd
+from pytaxize import ranks
+
+class TaxonTree(object):
+    '''
+    A taxonomy tree keyed by TSN.
+
+    Taxa are added with `add`, `add_pairs`, `add_hierarchy` or `fill`; the
+    arrays are rebuilt on the first query after a change, in O(n). A parent
+    that was never added itself becomes a root until it is.
+    '''
+    def __init__(self):
+        self._pending = []
+        self._tsn = np.zeros(0, dtype=np.int64)
+        self._parent = np.zeros(0, dtype=np.int64)
+        self._rank = np.zeros(0, dtype=np.int16)
+        self._name = np.zeros(0, dtype=object)
+
+    def __repr__(self):
+        return """<%s taxa=%s>""" % (type(self).__name__, len(self))
+
+    def __len__(self):
+        self._compile()
+        return len(self._tsn)
+
+    def __contains__(self, tsn):
+        self._compile()
+        return self._node(tsn) >= 0
+
+    @classmethod
+    def from_pairs(cls, tsn, parent, rank=None, name=None):
+        '''
+        Build a tree from parallel sequences of TSN's and parent TSN's (0 or
+        None for roots), with optional rank ids (or rank names) and names.
+        '''
+        tree = cls()
+        tree.add_pairs(tsn, parent, rank, name)
+        return tree
+
+    @classmethod
+    def from_store(cls, path=None, names=True):
+        '''
+        Load all valid taxa of a local ITIS store made by `pytaxize.itis_local.build`.
+
+        :param path: Path to the store (default ~/.cache/pytaxize/itis.sqlite)
+        :param names: Load scientific names too (uses more memory)
+        '''
+        from pytaxize.itis_local import ItisLocal
+        store = ItisLocal(path)
+        sql = '''SELECT t.tsn, t.parent_tsn, t.rank_id%s FROM taxonomic_units t%s
+            WHERE t.name_usage IN ('valid', 'accepted')''' % \
+            ((', l.completename', ' JOIN longnames l ON l.tsn = t.tsn') if names else ('', ''))
+        rows = store._rows(sql)
+        store.close()
+        cols = list(zip(*rows)) if len(rows) > 0 else [[], [], [], []]
+        return cls.from_pairs(cols[0], cols[1], cols[2], cols[3] if names else None)
+
+    def add(self, tsn, parent=None, rank=None, name=None):
+        '''
+        Add one taxon, or update it if its TSN is already in the tree.
+
+        :param tsn: TSN of the taxon
+        :param parent: TSN of its parent, None or 0 for a root
+        :param rank: ITIS rank id (e.g. 220) or rank name (e.g. 'Species')
+        :param name: Scientific name
+        '''
+        self.add_pairs([tsn], [parent], [rank], [name])
+
+    def add_pairs(self, tsn, parent, rank=None, name=None):
+        '''
+        Add many taxa from parallel sequences, see `add`.
+        '''
+        n = len(tsn)
+        rank = [None] * n if rank is None else list(rank)
+        name = [None] * n if name is None else list(name)
+        self._pending.append((_ids(tsn), _ids(parent), _rank_ids(rank),
+            np.array(name, dtype=object)))
+
+    def add_hierarchy(self, df):
+        '''
+        Add the taxa of a hierarchy DataFrame, as returned by
+        `getfullhierarchyfromtsn`, `gethierarchydownfromtsn` or `itis_downstream`.
+        '''
+        if len(df) > 0:
+            self.add_pairs(df['tsn'], df['parentTsn'], df['rankName'], df['taxonName'])
+
+    def fill(self, tsn):
+        '''
+        Add the full hierarchy of a TSN, fetched with `getfullhierarchyfromtsn`,
+        unless the TSN and all its ancestors are already in the tree.
+        '''
+        self._compile()
+        i = self._node(tsn)
+        if i >= 0 and self._parent_tsn_known(i):
+            return
+        from pytaxize.itis import getfullhierarchyfromtsn
+        self.add_hierarchy(getfullhierarchyfromtsn(tsn))
+
+    def parent(self, tsn):
+        '''
+        Parent TSN, or None for a root.
+        '''
+        i = self._check(tsn)
+        p = self._parent[i]
+        return None if p < 0 else int(self._tsn[p])
+
+    def children(self, tsn):
+        '''
+        TSN's of the direct children.
+        '''
+        i = self._check(tsn)
+        return self._tsn[self._kids[self._offsets[i]:self._offsets[i + 1]]].tolist()
+
+    def ancestors(self, tsn):
+        '''
+        TSN's of all ancestors, from the parent up to the root.
+        '''
+        i = self._check(tsn)
+        out = []
+        p = self._parent[i]
+        while p >= 0:
+            out.append(int(self._tsn[p]))
+            p = self._parent[p]
+        return out
+
+    def descendants(self, tsn):
+        '''
+        TSN's of all descendants, in preorder (each taxon before its children).
+        '''
+        i = self._check(tsn)
+        start = self._pre[i]
+        return self._tsn[self._preorder[start + 1:start + self._size[i]]].tolist()
+
+    def is_ancestor(self, a, b):
+        '''
+        True if a is an ancestor of b (or a is b), in O(1).
+        '''
+        i = self._check(a)
+        j = self._check(b)
+        return bool(self._pre[i] <= self._pre[j] < self._pre[i] + self._size[i])
+
+    def depth(self, tsn):
+        '''
+        Number of ancestors; 0 for a root.
+        '''
+        i = self._check(tsn)
+        return int(self._depth[i])
+
+    def rank(self, tsn):
+        '''
+        ITIS rank id of a taxon, or None if unknown.
+        '''
+        i = self._check(tsn)
+        r = self._rank[i]
+        return None if r == 0 else int(r)
+
+    def name(self, tsn):
+        '''
+        Scientific name of a taxon, or None if unknown.
+        '''
+        i = self._check(tsn)
+        return self._name[i]
+
+    def lca(self, a, b):
+        '''
+        TSN of the lowest common ancestor of a and b, None if they are in
+        different trees. A taxon counts as its own ancestor.
+        '''
+        i = self._check(a)
+        j = self._check(b)
+        depth = self._depth
+        parent = self._parent
+        while depth[i] > depth[j]:
+            i = parent[i]
+        while depth[j] > depth[i]:
+            j = parent[j]
+        while i != j and i >= 0:
+            i = parent[i]
+            j = parent[j]
+        return None if i < 0 else int(self._tsn[i])
+
+    def lca_many(self, a, b):
+        '''
+        Lowest common ancestors of many pairs at once.
+
+        :param a: Sequence of TSN's
+        :param b: Sequence of TSN's, same length as a
+
+        Returns a numpy array of TSN's, -1 where a TSN is not in the tree or
+        the pair has no common ancestor.
+        '''
+        self._compile()
+        i = self._nodes(a)
+        j = self._nodes(b)
+        ok = (i >= 0) & (j >= 0)
+        i = np.where(ok, i, 0)
+        pre = self._pre
+        size = self._size
+        parent = self._parent
+        pj = pre[np.where(ok, j, 0)]
+        # climb from a until reaching an ancestor of b, i.e. a preorder
+        # interval containing b; idx holds the pairs still climbing
+        idx = np.nonzero((pre[i] > pj) | (pj >= pre[i] + size[i]))[0]
+        while len(idx) > 0:
+            x = parent[i[idx]]
+            i[idx] = x
+            idx = idx[x >= 0]
+            x = i[idx]
+            p = pj[idx]
+            idx = idx[(pre[x] > p) | (p >= pre[x] + size[x])]
+        found = ok & (i >= 0)
+        return np.where(found, self._tsn[np.where(found, i, 0)], -1)
+
+    def at_level(self, tsn, level):
+        '''
+        TSN of the ancestor (or the taxon itself) at a given depth, 0 being
+        the root; None if the taxon is not that deep.
+        '''
+        i = self._check(tsn)
+        if level > self._depth[i] or level < 0:
+            return None
+        for x in range(self._depth[i] - level):
+            i = self._parent[i]
+        return int(self._tsn[i])
+
+    def at_rank(self, tsn, rank):
+        '''
+        TSN of the ancestor (or the taxon itself) at a given rank, None if
+        there is none.
+
+        :param tsn: A TSN
+        :param rank: Rank name (e.g. 'Family') or ITIS rank id (e.g. 140)
+        '''
+        out = self.at_rank_many([tsn], rank)[0]
+        return None if out < 0 else int(out)
+
+    def at_rank_many(self, tsn, rank):
+        '''
+        Like `at_rank` for many TSN's at once. Returns a numpy array of TSN's,
+        -1 where there is no ancestor at that rank.
+        '''
+        self._compile()
+        target = _rank_ids([rank])[0]
+        i = self._nodes(tsn)
+        found = np.full(len(i), -1, dtype=np.int64)
+        live = i >= 0
+        while live.any():
+            hit = live.copy()
+            hit[live] = self._rank[i[live]] == target
+            found[hit] = i[hit]
+            live &= ~hit
+            # stop climbing once above the target rank
+            r = self._rank[i[live]]
+            live[live] = (r > target) | (r == 0)
+            i[live] = self._parent[i[live]]
+            live[live] = i[live] >= 0
+        ok = found >= 0
+        return np.where(ok, self._tsn[np.where(ok, found, 0)], -1)
+
+    def to_frame(self):
+        '''
+        DataFrame with columns tsn, parentTsn, rankId, taxonName and depth.
+        '''
+        self._compile()
+        parent = np.where(self._parent >= 0, self._tsn[np.maximum(self._parent, 0)], 0)
+        return pd.DataFrame({'tsn': self._tsn, 'parentTsn': parent, 'rankId': self._rank,
+            'taxonName': self._name, 'depth': self._depth})
+
+    ## building the arrays
+    def _compile(self):
+        if len(self._pending) == 0:
+            return
+        pending = self._pending
+        self._pending = []
+        known = np.where(self._parent >= 0, self._tsn[np.maximum(self._parent, 0)], 0)
+        df = pd.DataFrame({
+            'tsn': np.concatenate([self._tsn] + [x[0] for x in pending]),
+            'parent': np.concatenate([known] + [x[1] for x in pending]),
+            'rank': np.concatenate([self._rank] + [x[2] for x in pending]),
+            'name': np.concatenate([self._name] + [x[3] for x in pending])})
+        # later records win, but a missing rank or name doesn't erase a known one
+        df['rank'] = df['rank'].where(df['rank'] != 0)
+        df = df.groupby('tsn', sort=True).last()
+        # parents never added themselves become roots
+        parent = df['parent'].values
+        missing = np.setdiff1d(parent[parent > 0], df.index.values)
+        if len(missing) > 0:
+            extra = pd.DataFrame({'parent': 0, 'rank': np.nan, 'name': None}, index=missing)
+            df = pd.concat([df, extra]).sort_index()
+        tsn = df.index.values.astype(np.int64)
+        parent = df['parent'].values.astype(np.int64)
+        self._tsn = tsn
+        self._parent = np.where(parent > 0, np.searchsorted(tsn, parent), -1)
+        self._rank = df['rank'].fillna(0).values.astype(np.int16)
+        self._name = df['name'].values.astype(object)
+        self._index()
+
+    def _index(self):
+        n = len(self._tsn)
+        parent = self._parent
+        # depth, by walking all taxa up one level at a time
+        depth = np.zeros(n, dtype=np.int32)
+        cur = parent.copy()
+        live = cur >= 0
+        while live.any():
+            depth[live] += 1
+            if depth.max() > n:
+                raise ValueError("the parent links contain a cycle")
+            cur[live] = parent[cur[live]]
+            live[live] = cur[live] >= 0
+        # children of each taxon as a slice of kids (CSR)
+        haskid = parent >= 0
+        kids = np.nonzero(haskid)[0]
+        kids = kids[np.argsort(parent[kids], kind='mergesort')]
+        counts = np.bincount(parent[haskid], minlength=n)
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        # subtree sizes, adding each level into the one above, deepest first
+        size = np.ones(n, dtype=np.int64)
+        levels = [np.nonzero(depth == d)[0] for d in range(depth.max() + 1 if n > 0 else 0)]
+        for nodes in levels[:0:-1]:
+            np.add.at(size, parent[nodes], size[nodes])
+        # preorder position: parent's position + 1 + sizes of earlier siblings
+        pre = np.zeros(n, dtype=np.int64)
+        ksize = size[kids]
+        before = np.cumsum(ksize) - ksize
+        sibling = np.zeros(n, dtype=np.int64)
+        if len(kids) > 0:
+            sibling[kids] = before - before[offsets[parent[kids]]]
+        if len(levels) > 0:
+            roots = levels[0]
+            pre[roots] = np.cumsum(size[roots]) - size[roots]
+        for nodes in levels[1:]:
+            pre[nodes] = pre[parent[nodes]] + 1 + sibling[nodes]
+        preorder = np.empty(n, dtype=np.int64)
+        preorder[pre] = np.arange(n)
+        self._depth = depth
+        self._kids = kids
+        self._offsets = offsets
+        self._size = size
+        self._pre = pre
+        self._preorder = preorder
+
+    def _node(self, tsn):
+        i = np.searchsorted(self._tsn, tsn)
+        if i < len(self._tsn) and self._tsn[i] == tsn:
+            return int(i)
+        return -1
+
+    def _nodes(self, tsn):
+        tsn = _ids(tsn)
+        if len(self._tsn) == 0:
+            return np.full(len(tsn), -1, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self._tsn, tsn), len(self._tsn) - 1)
+        return np.where(self._tsn[i] == tsn, i, -1)
+
+    def _check(self, tsn):
+        self._compile()
+        i = self._node(int(tsn))
+        if i < 0:
+            raise KeyError(tsn)
+        return i
+
+    def _parent_tsn_known(self, i):
+        # True if i and all its ancestors were added, i.e. the path reaches a kingdom
+        while self._parent[i] >= 0:
+            i = self._parent[i]
+        return self._rank[i] == ranks.rank_id('kingdom')
+
+## helper functions
+def _ids(x):
+    # TSN's as int64; None, NaN or '' (e.g. the parent of a kingdom) as 0
+    x = np.asarray(x)
+    if x.dtype.kind in 'iu':
+        return x.astype(np.int64)
+    out = pd.to_numeric(pd.Series(x, dtype=object), errors='coerce')
+    return out.fillna(0).astype(np.int64).values
+
+def _rank_ids(x):
+    x = np.asarray(x)
+    if x.dtype.kind in 'iu':
+        return x.astype(np.int16)
+    return ranks.rank_id_many(x).astype(np.int16)
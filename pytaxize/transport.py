@@ -0,0 +1,251 @@
+'''
+Shared HTTP transport used by every web service wrapper in pytaxize.
+
+All wrappers go through one pooled ``requests.Session`` so that repeated calls
+to the same service reuse kept-alive connections instead of opening a fresh
+TCP (and TLS) connection per request.
+
+Usage:
+>>> import pytaxize
+>>> from pytaxize import transport
+>>> # allow up to 20 concurrent connections per host, 30 s read timeout
+>>> transport.configure(pool_maxsize=20, timeout=(5, 30))
+>>> # a bigger pool for one particular service only
+>>> transport.configure(host_limits={'http://www.itis.gov': 50})
+
+Identical GET requests made at the same time from several threads share one
+HTTP request: the first caller makes it, the others wait for it and get the
+same response (or exception). `stats()` counts how many calls were served
+this way.
+
+>>> transport.get_transport().stats()
+{'requests': 120, 'coalesced': 37, 'in_flight': 0}
+
+Requests are rate limited, retried and stopped by a circuit breaker per
+service, see pytaxize.policy.
+'''
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from pytaxize.policy import make_policy
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+# short service names for the hosts pytaxize talks to
+services = {'www.itis.gov': 'itis', 'www.catalogueoflife.org': 'col',
+            'resolver.globalnames.org': 'gnr', 'gni.globalnames.org': 'gni',
+            'gnrd.globalnames.org': 'gnrd', 'data.canadensys.net': 'vascan',
+            'api.gbif.org': 'gbif', 'www.ubio.org': 'ubio'}
+
+# request policies per service, see pytaxize.policy; GNRD is polled for
+# results, so it is paced from the start
+default_policies = {'default': {}, 'gnrd': {'rate': 10}}
+
+def service_for(url):
+    '''
+    Short service name for a URL, e.g. 'itis'; the host name for unknown hosts.
+    '''
+    host = urlsplit(url).netloc.lower()
+    return services.get(host, host)
+
+class Transport(object):
+    '''
+    A pooled HTTP transport wrapping a ``requests.Session``.
+
+    :param pool_connections: Number of per-host connection pools to keep
+    :param pool_maxsize: Maximum number of connections kept alive per host
+    :param pool_block: If True, never open more than pool_maxsize connections to
+        a host; callers wait for a free connection instead.
+    :param timeout: Default timeout in seconds, or a (connect, read) tuple. Used
+        when a call does not pass its own timeout.
+    :param host_limits: Optional dict mapping a URL prefix (e.g.
+        'http://www.itis.gov') to its own pool_maxsize.
+    :param headers: Optional dict of headers sent with every request.
+    :param cache: Optional response cache, see pytaxize.cache. GET requests to
+        the services it covers are answered from it when possible.
+    :param coalesce: If True (default), concurrent identical GET requests
+        (same URL and query parameters, no other options) share one request.
+    :param policies: Optional dict mapping a service name (see `service_for`),
+        or 'default' for all others, to a pytaxize.policy.Policy or a dict of
+        its parameters: rate limits, retries and circuit breaker for requests
+        to that service. Merged over `default_policies`.
+    '''
+    def __init__(self, pool_connections=10, pool_maxsize=10, pool_block=False,
+        timeout=(10, 60), host_limits=None, headers=None, cache=None, coalesce=True,
+        policies=None):
+        self.timeout = timeout
+        self.cache = cache
+        self.coalesce = coalesce
+        self.policies = dict(default_policies, **(policies or {}))
+        self._policies = {}
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._counts = {'requests': 0, 'coalesced': 0}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        for prefix, maxsize in (host_limits or {}).items():
+            self.session.mount(prefix, HTTPAdapter(pool_connections=1,
+                pool_maxsize=maxsize, pool_block=pool_block))
+        if headers is not None:
+            self.session.headers.update(headers)
+
+    def __repr__(self):
+        return """<%s timeout=%s>""" % (type(self).__name__, self.timeout)
+
+    def request(self, method, url, **kwargs):
+        key = _flight_key(method, url, kwargs) if self.coalesce else None
+        leader = False
+        with self._flights_lock:
+            self._counts['requests'] += 1
+            if key is not None:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    leader = True
+                else:
+                    self._counts['coalesced'] += 1
+        if key is None:
+            return self._send(method, url, **kwargs)
+        if not leader:
+            # the same request is already in flight: wait for its result
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._send(method, url, **kwargs)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
+
+    def stats(self):
+        '''
+        Counts of calls: requests made through this transport, how many of
+        them were coalesced (served by an identical request already in flight),
+        and how many distinct requests are in flight now.
+        '''
+        with self._flights_lock:
+            return {'requests': self._counts['requests'],
+                'coalesced': self._counts['coalesced'], 'in_flight': len(self._flights)}
+
+    def policy_for(self, service):
+        '''
+        The Policy (with its rate limit and circuit state) applied to requests
+        to a service, e.g. 'itis'.
+        '''
+        policy = self._policies.get(service)
+        if policy is None:
+            with self._flights_lock:
+                policy = self._policies.get(service)
+                if policy is None:
+                    policy = make_policy(self.policies.get(service, self.policies.get('default')))
+                    self._policies[service] = policy
+        return policy
+
+    def _send(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        cache = self.cache
+        service = service_for(url)
+        policy = self.policy_for(service)
+        if method != 'GET' or cache is None or not cache.caches(service):
+            return policy.send(method, self.session.request, method, url, **kwargs)
+        params = kwargs.get('params')
+        res = cache.lookup(service, url, params)
+        if res is None:
+            res = policy.send(method, self.session.request, method, url, **kwargs)
+            if res.status_code == 200:
+                cache.store(service, url, params, res)
+        return res
+
+    def get(self, url, params=None, **kwargs):
+        return self.request('GET', url, params=params, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data=data, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+class _Flight(object):
+    # one request in flight, and the calls waiting for it
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+def _flight_key(method, url, kwargs):
+    # GET requests with nothing but query parameters (and a timeout) can be
+    # shared; anything else, e.g. custom headers or streaming, can't
+    if method != 'GET' or len(set(kwargs) - set(['params', 'timeout'])) > 0:
+        return None
+    params = kwargs.get('params')
+    if params is None:
+        return (url,)
+    items = params.items() if hasattr(params, 'items') else params
+    try:
+        return (url,) + tuple(sorted((k, str(v)) for k, v in items if v is not None))
+    except (TypeError, ValueError):
+        return None
+
+_transport = None
+_lock = threading.Lock()
+
+def get_transport():
+    '''
+    Get the shared Transport, creating it with default settings on first use.
+    '''
+    global _transport
+    if _transport is None:
+        with _lock:
+            if _transport is None:
+                _transport = Transport()
+    return _transport
+
+def set_transport(new):
+    '''
+    Replace the shared Transport, e.g. with a customised subclass.
+
+    :param new: A Transport instance
+
+    Returns the previous Transport (or None), which is not closed.
+    '''
+    global _transport
+    with _lock:
+        old = _transport
+        _transport = new
+    return old
+
+def configure(**kwargs):
+    '''
+    Replace the shared Transport with a new one built from kwargs. Takes the
+    same parameters as Transport. The previous session is closed; its response
+    cache, if any, is kept unless a cache is passed.
+
+    Usage:
+    >>> from pytaxize import transport
+    >>> transport.configure(pool_maxsize=32, timeout=30)
+    '''
+    old = get_transport()
+    kwargs.setdefault('cache', old.cache)
+    set_transport(Transport(**kwargs))
+    old.close()
+    return get_transport()
+
+def get(url, params=None, **kwargs):
+    return get_transport().get(url, params=params, **kwargs)
+
+def post(url, data=None, **kwargs):
+    return get_transport().post(url, data=data, **kwargs)
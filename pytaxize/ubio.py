@@ -1,6 +1,6 @@
 from lxml import etree
 import pandas as pd
-import requests
+from pytaxize import transport
 
 def ubio_search(searchName = None, searchAuth = None, searchYear = None,
     order = None, sci = None, vern = None, keyCode = None):
@@ -32,7 +32,7 @@ def ubio_search(searchName = None, searchAuth = None, searchYear = None,
     payload = {'function': 'namebank_search', 'searchName': searchName,
                'searchAuth': searchAuth, 'searchYear': searchYear, 'order': order,
                'sci': sci, 'vern': vern, 'keyCode': ubioApiKey}
-    out = requests.get(url, params = payload)
+    out = transport.get(url, params = payload)
     out.raise_for_status()
     xmlparser = etree.XMLParser()
     tt = etree.fromstring(out.content, xmlparser)
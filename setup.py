@@ -9,6 +9,9 @@ setup(name='pytaxize',
   packages=['pytaxize'],
   install_requires=['requests>2.0',
                     'pandas>0.1',
-                    'lxml'],
+                    'numpy',
+                    'lxml',
+                    'futures; python_version < "3"'],
+  extras_require={'async': ['aiohttp']},
   package_data={'pytaxize': ['data/*.csv']},
 )
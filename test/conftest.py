@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import threading
+import pytest
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import replay
+from pytaxize import itis, transport
+from pytaxize.policy import Policy
+
+class FakeItis(ThreadingMixIn, HTTPServer):
+    '''
+    A local ITIS web service answering with the recorded payloads in
+    benchmarks/payloads.
+
+    fail maps an endpoint to a list of status codes to answer with first;
+    delay is slept per request; calls counts requests per endpoint and
+    max_active is the most requests handled at the same time.
+    '''
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _Handler)
+        self.fail = {}
+        self.delay = 0
+        self.calls = {}
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base(self):
+        return 'http://127.0.0.1:%d/ITISService/' % self.server_address[1]
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        endpt = self.path.split('?')[0].rsplit('/', 1)[1]
+        with server.lock:
+            server.calls[endpt] = server.calls.get(endpt, 0) + 1
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            fail = server.fail.get(endpt)
+            status = fail.pop(0) if fail else 200
+        try:
+            if server.delay:
+                time.sleep(server.delay)
+            body = b''
+            if status == 200:
+                try:
+                    body = replay.payload('itis_%s.xml' % endpt)
+                except IOError:
+                    status = 404
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/xml; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+@pytest.fixture
+def fake_itis(monkeypatch):
+    '''
+    A running FakeItis that the ITIS functions talk to, through a fresh
+    transport that retries without waiting.
+    '''
+    server = FakeItis()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    monkeypatch.setattr(itis, 'itis_base', server.base)
+    old = transport.set_transport(transport.Transport(policies={'default': Policy(backoff=0)}))
+    yield server
+    transport.set_transport(old).close()
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def replayed():
+    '''
+    The shared transport answering from recorded payloads; yields the
+    ReplayAdapter, whose calls attribute counts requests.
+    '''
+    adapter = replay.install()
+    yield adapter
+    replay.uninstall()
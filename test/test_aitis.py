@@ -0,0 +1,74 @@
+import asyncio
+import pytest
+pytest.importorskip('aiohttp')
+import pytaxize
+from pytaxize import aitis, cache, itis, transport
+
+def run(coro):
+    async def main():
+        try:
+            return await coro
+        finally:
+            await aitis.close()
+    return asyncio.run(main())
+
+def test_same_output_as_sync(fake_itis):
+    for name, args in [('getfullhierarchyfromtsn', (180543,)), ('gethierarchydownfromtsn', (180541,)),
+                       ('gethierarchyupfromtsn', (180543,)), ('getcommonnamesfromtsn', (180543,)),
+                       ('searchbyscientificname', ('Ursus',)), ('getranknames', ()),
+                       ('getitistermsfromscientificname', ('Ursus',)),
+                       ('gettsnbyvernacularlanguage', ('english',))]:
+        sync = getattr(itis, name)(*args)
+        out = run(getattr(aitis, name)(*args))
+        assert out.equals(sync), name
+    assert run(aitis.getfullrecordfromtsn(180543)) == itis.getfullrecordfromtsn(180543)
+
+def test_concurrency_limit(fake_itis):
+    fake_itis.delay = 0.05
+    aitis.configure(concurrency=3)
+    try:
+        out = run(aitis.itis_hierarchy(list(range(12)), what='down'))
+    finally:
+        aitis.configure()
+    assert len(out) == 12
+    assert fake_itis.calls['getHierarchyDownFromTSN'] == 12
+    assert 1 < fake_itis.max_active <= 3
+
+def test_policy_retries(fake_itis):
+    fake_itis.fail['getFullHierarchyFromTSN'] = [503, 500]
+    out = run(aitis.getfullhierarchyfromtsn(180543))
+    assert out.shape[0] > 0
+    assert fake_itis.calls['getFullHierarchyFromTSN'] == 3
+    stats = transport.get_transport().policy_for(transport.service_for(fake_itis.base)).stats()
+    assert stats['retried'] == 2
+
+def test_error_raised_after_retries(fake_itis):
+    fake_itis.fail['getFullHierarchyFromTSN'] = [500] * 10
+    with pytest.raises(Exception) as e:
+        run(aitis.getfullhierarchyfromtsn(180543))
+    assert '500' in str(e.value)
+    assert fake_itis.calls['getFullHierarchyFromTSN'] == 4
+
+def test_response_cache(fake_itis, tmp_path):
+    service = transport.service_for(fake_itis.base)
+    transport.get_transport().cache = cache.ResponseCache(str(tmp_path / 'c.sqlite'), ttl={service: 60})
+    try:
+        first = run(aitis.getfullhierarchyfromtsn(180543))
+        again = run(aitis.getfullhierarchyfromtsn(180543))
+        sync = itis.getfullhierarchyfromtsn(180543)
+    finally:
+        transport.get_transport().cache.close()
+        transport.get_transport().cache = None
+    assert fake_itis.calls['getFullHierarchyFromTSN'] == 1
+    assert again.equals(first) and sync.equals(first)
+
+def test_local_backend(fake_itis):
+    class Backend(object):
+        def getfullhierarchyfromtsn(self, tsn):
+            return 'local %s' % tsn
+    old = pytaxize.itis_backend(Backend())
+    try:
+        assert run(aitis.getfullhierarchyfromtsn(1)) == 'local 1'
+    finally:
+        pytaxize.itis_backend(old)
+    assert 'getFullHierarchyFromTSN' not in fake_itis.calls
@@ -0,0 +1,52 @@
+import time
+import threading
+from pytaxize.batch import pmap, pmap_iter
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError('bad item')
+    time.sleep(0.01 * (5 - x))
+    return x * 10
+
+def test_pmap_keeps_order_and_captures_errors():
+    out = pmap(fail_on_three, range(5), max_workers=3)
+    assert [x[0] for x in out] == [0, 10, 20, None, 40]
+    assert isinstance(out[3][1], ValueError)
+    assert all(x[1] is None for i, x in enumerate(out) if i != 3)
+
+def test_pmap_iter_yields_every_index():
+    out = list(pmap_iter(fail_on_three, range(5), max_workers=2))
+    assert sorted(x[0] for x in out) == [0, 1, 2, 3, 4]
+    for i, result, error in out:
+        if i == 3:
+            assert result is None and isinstance(error, ValueError)
+        else:
+            assert (result, error) == (i * 10, None)
+
+def test_pmap_iter_takes_items_lazily():
+    taken = []
+    def items():
+        for i in range(100):
+            taken.append(i)
+            yield i
+    gen = pmap_iter(lambda x: x, items(), max_workers=2)
+    next(gen)
+    assert len(taken) <= 5
+    gen.close()
+
+def test_pmap_iter_close_does_not_wait():
+    started = []
+    lock = threading.Lock()
+    def slow(x):
+        with lock:
+            started.append(x)
+        time.sleep(0.2)
+        return x
+    t0 = time.time()
+    gen = pmap_iter(slow, range(50), max_workers=2)
+    next(gen)
+    gen.close()
+    assert time.time() - t0 < 1
+    time.sleep(0.5)
+    # calls not started when the generator was closed never run
+    assert len(started) <= 4
@@ -0,0 +1,21 @@
+from lxml import etree
+from pytaxize import col
+
+# Bryophyta -> Bryopsida (Class) -> Unranked clade (a rank not in
+# rank_ref.csv) -> Funariaceae (Family)
+tree = {
+    'Bryophyta': [('10', 'Bryopsida', 'Class')],
+    '10': [('11', 'Some clade', 'Clade'), ('12', 'Sphagnaceae', 'Family')],
+    '11': [('13', 'Funariaceae', 'Family')],
+}
+
+def fake_get(url, payload):
+    key = payload.get('id') or payload.get('name')
+    taxa = ''.join('<taxon><id>%s</id><name>%s</name><rank>%s</rank></taxon>' % x
+        for x in tree.get(key, []))
+    return etree.fromstring('<results><result><child_taxa>%s</child_taxa></result></results>' % taxa)
+
+def test_downstream_expands_unknown_ranks(monkeypatch):
+    monkeypatch.setattr(col, '_colGET', fake_get)
+    out = col.col_downstream(['Bryophyta'], downto='Family')[0]
+    assert sorted(out['name']) == ['Funariaceae', 'Sphagnaceae']
@@ -0,0 +1,32 @@
+import os
+import pytest
+from pytaxize import datasets
+
+@pytest.fixture
+def compact_dir(tmp_path, monkeypatch):
+    folder = str(tmp_path / 'data')
+    monkeypatch.setattr(datasets, 'compact_dir', folder)
+    datasets.clear()
+    yield folder
+    datasets.clear()
+
+def test_compact_writes_to_cache_folder(compact_dir):
+    package_data = os.path.dirname(datasets.dataset_path('apg_orders'))
+    before = sorted(os.listdir(package_data))
+    paths = datasets.compact(['apg_orders'])
+    assert paths == [os.path.join(compact_dir, 'apg_orders.pkl')]
+    assert os.path.isfile(paths[0])
+    assert sorted(os.listdir(package_data)) == before
+
+def test_load_prefers_fresh_compact_copy(compact_dir):
+    csv = datasets.load('apg_orders')
+    datasets.clear()
+    datasets.compact(['apg_orders'])
+    dat = datasets.load('apg_orders')
+    assert dat['that'].dtype.name == 'category'
+    assert dat.equals(csv)
+    # an outdated copy is ignored
+    datasets.clear()
+    pkl = datasets.dataset_path('apg_orders', compact=True)
+    os.utime(pkl, (0, 0))
+    assert datasets.load('apg_orders').equals(csv)
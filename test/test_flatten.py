@@ -0,0 +1,63 @@
+import json
+import pandas as pd
+from benchmarks import replay
+from pytaxize import flatten, tax
+
+def results():
+    out = json.loads(replay.payload('vascan_search.json').decode('utf-8'))['results']
+    return out + [{'searchedTerm': 'Nothing', 'numMatches': 0},
+                  {'searchedTerm': 'Bare', 'numMatches': 1, 'matches': [{'taxonID': 1}]}]
+
+def test_vascan_tables_links_ids():
+    res = results()
+    tabs = flatten.vascan_tables({'results': res})
+    assert tabs['names']['searchedTerm'].tolist() == [x['searchedTerm'] for x in res]
+    nmatch = sum(len(x.get('matches') or []) for x in res)
+    assert tabs['matches']['match_id'].tolist() == list(range(nmatch))
+    for table in ['assertions', 'vernaculars', 'distributions']:
+        assert set(tabs[table]['match_id']) <= set(tabs['matches']['match_id'])
+    first = res[0]['matches'][0]
+    assert tabs['distributions'].query('match_id == 0').shape[0] == len(first['distribution'])
+    assert tabs['distributions']['locality'].dtype.name == 'category'
+
+def test_vascan_tables_empty():
+    tabs = flatten.vascan_tables([])
+    assert list(tabs['matches'].columns) == flatten.vascan_schema['matches'][0]
+    assert all(df.shape[0] == 0 for df in tabs.values())
+
+def test_vascan_flat_rows():
+    res = results()
+    df = flatten.vascan_flat(res)
+    assert list(df.columns) == flatten.vascan_flat_columns
+    # a row per assertion, and one for each name or match without any
+    assert df['searchedTerm'].tolist()[-2:] == ['Nothing', 'Bare']
+    assert pd.isnull(df['taxonID'].iloc[-2]) and df['taxonID'].iloc[-1] == 1
+    first = res[0]['matches'][0]
+    dist = df['distribution'].iloc[0].split(';')
+    assert dist[0] == '%s:%s' % (first['distribution'][0]['locality'],
+                                 first['distribution'][0]['occurrenceStatus'])
+    assert len(dist) == len(first['distribution'])
+
+def test_vascan_search_iter_and_bulk_share_flattener(replayed):
+    q = ['Helianthus annuus', 'Poa annua', 'Helianthus annuus', 'Abies alba']
+    chunks = list(tax.vascan_search_iter(q, chunk_size=2))
+    assert all(list(x.columns) == flatten.vascan_flat_columns for x in chunks)
+    assert sorted(pd.concat(chunks)['searchedTerm']) == sorted(set(q))
+    flat = tax.vascan_search_bulk(q, chunk_size=2, flat=True)
+    assert flat['searchedTerm'].tolist() == q
+
+def test_vascan_search_iter_names_chunks(replayed):
+    q = ['Helianthus annuus', 'Poa annua', 'Helianthus annuus', 'Abies alba', 'Acer rubrum']
+    chunks = list(tax.vascan_search_iter(q, chunk_size=2, max_workers=2))
+    got = sorted(tuple(sorted(set(x['supplied_name']))) for x in chunks)
+    assert got == [('Abies alba', 'Acer rubrum'), ('Helianthus annuus', 'Poa annua')]
+    for x in chunks:
+        assert (x['supplied_name'] == x['searchedTerm']).all()
+
+def test_vascan_flat_supplied_name():
+    res = results()
+    names = ['name %d' % i for i in range(len(res))]
+    df = flatten.vascan_flat(res, names)
+    assert df['supplied_name'].iloc[-1] == names[-1]
+    assert set(df['supplied_name']) == set(names)
+    assert flatten.vascan_flat(res)['supplied_name'].isnull().all()
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+from pytaxize import tax
+
+names = ['Poa annua', 'Abies alba', 'Poa annua', None, 'Pinus sylvestris',
+         'Abies alba', 'Quercus robur']
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    tax.gbif_clear_cache()
+    yield
+    tax.gbif_clear_cache()
+
+def test_gbif_parse_bulk_chunks_and_dedupes(replayed):
+    out = tax.gbif_parse_bulk(names, chunk_size=2, max_workers=3, cache=False)
+    # 4 unique names in chunks of 2
+    assert replayed.calls == 2
+    assert out.shape[0] == len(names)
+    assert out['scientificName'].tolist()[:3] == names[:3]
+    assert pd.isnull(out['scientificName'].iloc[3])
+    assert out['scientificName'].tolist()[4:] == names[4:]
+
+def test_gbif_parse_bulk_keeps_series_index(replayed):
+    s = pd.Series(names, index=range(100, 100 + len(names)))
+    out = tax.gbif_parse_bulk(s, chunk_size=3)
+    assert out.index.tolist() == s.index.tolist()
+    assert (out['canonicalName'].iloc[0] == out['canonicalName'].iloc[2])
+
+def test_gbif_parse_bulk_cache(replayed):
+    tax.gbif_parse_bulk(names[:3], chunk_size=2)
+    assert replayed.calls == 1
+    out = tax.gbif_parse_bulk(names, chunk_size=2)
+    # only Pinus sylvestris and Quercus robur are new
+    assert replayed.calls == 2
+    assert out['scientificName'].tolist()[-1] == 'Quercus robur'
+    tax.gbif_parse_bulk(names, chunk_size=2, cache=False)
+    assert replayed.calls == 4
@@ -0,0 +1,62 @@
+import time
+import pytest
+import requests
+from pytaxize import gnr, transport
+
+names = ['Poa annua', 'Helianthus annuus', 'Poa annua', 'Abies alba',
+         'Pinus sylvestris', 'Helianthus annuus', 'Quercus robur']
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'data': self.data}
+
+def echo(url, data=None, **kwargs):
+    # answer every supplied name with itself, later chunks first and the
+    # entries of a chunk in reverse order
+    lines = [x.split('|', 1) for x in data['data'].split('\n')]
+    time.sleep(0.05 / (1 + int(lines[0][0])))
+    out = []
+    for i, name in reversed(lines):
+        if name == 'Abies alba':
+            out.append({'supplied_id': i, 'supplied_name_string': name})
+        else:
+            out.append({'supplied_id': i, 'results': [{'name_string': name}]})
+    return FakeResponse(out)
+
+def test_gnr_resolve_bulk_chunks_and_dedupes(replayed):
+    out = gnr.gnr_resolve_bulk(names, chunk_size=2, max_workers=3)
+    # 5 unique names in chunks of 2
+    assert replayed.calls == 3
+    assert len(out) == len(names)
+    assert out[0] == out[2] and out[0] is not out[2]
+    assert all(len(x) > 0 for x in out)
+
+def test_gnr_resolve_bulk_keeps_order(monkeypatch):
+    sent = []
+    def post(url, data=None, **kwargs):
+        sent.append(data['data'])
+        return echo(url, data, **kwargs)
+    monkeypatch.setattr(transport, 'post', post)
+    out = gnr.gnr_resolve_bulk(names, chunk_size=2, max_workers=3)
+    assert sorted(sent) == ['0|Poa annua\n1|Helianthus annuus',
+                            '2|Abies alba\n3|Pinus sylvestris', '4|Quercus robur']
+    for name, res in zip(names, out):
+        if name == 'Abies alba':
+            assert res == []
+        else:
+            assert res == [{'name_string': name}]
+
+def test_gnr_resolve_bulk_raises_chunk_error(monkeypatch):
+    def post(url, data=None, **kwargs):
+        if 'Abies alba' in data['data']:
+            raise requests.ConnectionError('service down')
+        return echo(url, data, **kwargs)
+    monkeypatch.setattr(transport, 'post', post)
+    with pytest.raises(requests.ConnectionError):
+        gnr.gnr_resolve_bulk(names, chunk_size=2)
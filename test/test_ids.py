@@ -0,0 +1,25 @@
+import pandas as pd
+import requests
+from pytaxize import col, ids
+
+records = {
+    'Poa annua': [{'id': '1', 'name': 'Poa annua', 'rank': 'Species',
+                   'name_status': 'accepted name'}],
+    'Abies': [{'id': '2', 'name': 'Abies', 'rank': 'Genus', 'name_status': 'accepted name'},
+              {'id': '3', 'name': 'Abies', 'rank': 'Genus', 'name_status': 'accepted name'}],
+}
+
+def fake_search(name, checklist=None):
+    x = name[0]
+    if x == 'Broken':
+        raise requests.ConnectionError('service down')
+    return [pd.DataFrame(records.get(x, []))]
+
+def test_get_colid_bulk_statuses_and_errors(monkeypatch):
+    monkeypatch.setattr(col, 'col_search', fake_search)
+    out = ids.Ids(['Poa annua', 'Abies', 'Nothing', 'Broken', 'Poa annua'], db='col').get_colid_bulk()
+    assert list(out.columns) == ids.colid_columns
+    assert out['status'].tolist() == ['found', 'ambiguous', 'none', 'error', 'found']
+    assert out['colid'].tolist()[0] == '1'
+    assert out['error'].tolist()[3] == 'ConnectionError: service down'
+    assert out['error'].drop(3).isnull().all()
@@ -0,0 +1,25 @@
+import pandas as pd
+from pytaxize import itis_extra, ranks
+
+# Chordata -> Vertebrata -> Gnathostomata (Infraphylum) -> Tetrapoda
+# (Superclass) -> Mammalia; Hominoidea has a rank not in rank_ref.csv
+tree = {
+    158852: [(331030, 'Subphylum', 'Vertebrata')],
+    331030: [(914179, 'Infraphylum', 'Gnathostomata')],
+    914179: [(914181, 'Superclass', 'Tetrapoda')],
+    914181: [(179913, 'Class', 'Mammalia'), (1, 'Cohort', 'Unranked')],
+    1: [(2, 'Class', 'Hidden')],
+}
+
+def fake_down(tsn):
+    rows = [[str(t), rank, name, '', str(tsn)] for t, rank, name in tree.get(int(tsn), [])]
+    return pd.DataFrame(rows, columns=['tsn', 'rankName', 'taxonName', 'parentName', 'parentTsn'])
+
+def test_infraphylum_and_form_ranks():
+    assert ranks.rank_id('Infraphylum') == 45
+    assert ranks.rank_id('form') == 260
+
+def test_downstream_expands_unknown_ranks(monkeypatch):
+    monkeypatch.setattr(itis_extra, 'gethierarchydownfromtsn', fake_down)
+    out = itis_extra.itis_downstream(158852, 'Class')
+    assert sorted(out['taxonName']) == ['Hidden', 'Mammalia']
@@ -0,0 +1,11 @@
+from lxml import etree
+from benchmarks import replay
+from pytaxize import itis
+
+def test_itercollect_matches_collect():
+    vern = replay.tile(replay.payload('itis_getTsnByVernacularLanguage.xml'), 'vernacularTsns', 50)
+    matches = ['commonName', 'language', 'tsn']
+    full = itis._collect(etree.fromstring(vern), itis.ns21['ax21'], matches)
+    streamed = itis._itercollect(vern, itis.ns21['ax21'], 'vernacularTsns', matches)
+    assert streamed == full
+    assert len(streamed[0]) > 50
@@ -0,0 +1,13 @@
+from pytaxize import nameparser
+
+def test_name_parse_keeps_to_gbif_fields():
+    df = nameparser.name_parse(['Poa annua L. var. annua', 'Vanessa atalanta (Linnaeus, 1758)'])
+    assert set(df.columns) <= set(nameparser.fields)
+    assert 'speciesAuthorship' not in df.columns
+    assert df['canonicalNameComplete'].tolist()[0] == 'Poa annua L. var. annua'
+
+def test_parse_name_species_authorship():
+    out = nameparser.parse_name('Poa annua L. var. annua')
+    assert out['speciesAuthorship'] == 'L.'
+    assert out['type'] == 'WELLFORMED'
+    assert 'speciesAuthorship' not in nameparser.parse_name('Poa annua L.')
@@ -0,0 +1,123 @@
+import pytest
+import requests
+from pytaxize import policy
+from pytaxize.policy import Policy, CircuitBreaker, CircuitOpen
+
+def response(status, headers=None):
+    res = requests.models.Response()
+    res.status_code = status
+    res.headers.update(headers or {})
+    return res
+
+class Server(object):
+    # answers calls with the given statuses (or raises given exceptions) in turn
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        x = self.answers.pop(0) if len(self.answers) > 1 else self.answers[0]
+        if isinstance(x, Exception):
+            raise x
+        return x if isinstance(x, requests.models.Response) else response(x)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    out = []
+    monkeypatch.setattr(policy.time, 'sleep', out.append)
+    # backoff waits the longest it may, so waits can be checked
+    monkeypatch.setattr(policy.random, 'uniform', lambda a, b: b)
+    return out
+
+def test_get_retried_until_success(sleeps):
+    server = Server(500, 502, 200)
+    p = Policy(retries=3, backoff=0.5)
+    assert p.send('GET', server).status_code == 200
+    assert server.calls == 3
+    assert sleeps == [0.5, 1.0]
+    stats = p.stats()
+    assert (stats['sent'], stats['retried'], stats['failed']) == (3, 2, 0)
+
+def test_backoff_doubles_up_to_max(sleeps):
+    p = Policy(retries=4, backoff=1, max_backoff=3)
+    assert p.send('GET', Server(504)).status_code == 504
+    assert sleeps == [1, 2, 3, 3]
+    assert p.stats()['failed'] == 1
+
+def test_retry_after_is_honoured(sleeps):
+    server = Server(response(429, {'Retry-After': '7'}), 200)
+    p = Policy(rate=10, backoff=0.1)
+    assert p.send('GET', server).status_code == 200
+    assert sleeps == [7.0]
+    assert p.stats()['throttled'] == 1
+    assert p.bucket.rate < 10
+
+def test_retry_after_capped_by_max_backoff(sleeps):
+    server = Server(response(503, {'Retry-After': '600'}), 200)
+    Policy(backoff=0.1, max_backoff=20).send('GET', server)
+    assert sleeps == [20]
+
+def test_connection_errors_retried_on_get_only(sleeps):
+    server = Server(requests.exceptions.ConnectionError(), 200)
+    assert Policy().send('GET', server).status_code == 200
+    server = Server(requests.exceptions.ConnectionError(), 200)
+    with pytest.raises(requests.exceptions.ConnectionError):
+        Policy().send('POST', server)
+    assert server.calls == 1
+
+def test_post_not_retried_on_server_error(sleeps):
+    server = Server(500, 200)
+    assert Policy().send('POST', server).status_code == 500
+    assert server.calls == 1
+    server = Server(429, 200)
+    assert Policy().send('POST', server).status_code == 200
+    assert server.calls == 2
+
+def test_breaker_counts_requests_not_attempts(sleeps):
+    p = Policy(retries=3, failures=2, reset=30)
+    p.send('GET', Server(500))
+    assert p.breaker.state == 'closed'
+    p.send('GET', Server(500))
+    assert p.breaker.state == 'open'
+    server = Server(200)
+    with pytest.raises(CircuitOpen):
+        p.send('GET', server)
+    assert server.calls == 0
+
+def test_breaker_half_open_trial(sleeps):
+    p = Policy(retries=0, failures=1, reset=0)
+    p.send('GET', Server(500))
+    assert p.breaker.state == 'open'
+    # reset is over: one trial, which fails and opens the circuit again
+    p.send('GET', Server(500))
+    assert p.breaker.state == 'open'
+    assert p.send('GET', Server(200)).status_code == 200
+    assert p.breaker.state == 'closed'
+
+def test_breaker_not_stuck_half_open_on_other_errors(sleeps):
+    p = Policy(retries=0, failures=1, reset=0)
+    p.send('GET', Server(500))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        p.send('GET', Server(requests.exceptions.ChunkedEncodingError()))
+    assert p.breaker.state == 'open'
+    assert p.send('GET', Server(200)).status_code == 200
+    assert p.breaker.state == 'closed'
+
+def test_breaker_reset_wait(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(policy.time, 'time', lambda: now[0])
+    b = CircuitBreaker(failures=1, reset=30)
+    b.record(False)
+    with pytest.raises(CircuitOpen):
+        b.allow()
+    now[0] += 30
+    b.allow()
+    assert b.state == 'half-open'
+    with pytest.raises(CircuitOpen):
+        b.allow()
+
+def test_retry_after_date():
+    assert policy._retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert policy._retry_after('12') == 12.0
+    assert policy._retry_after('soon') is None
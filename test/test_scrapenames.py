@@ -0,0 +1,83 @@
+import pytest
+from pytaxize import tax, transport
+
+class FakeResponse(object):
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return dict(self.data)
+
+done = {'status': 200, 'names': [{'scientificName': 'Pardosa moesta'}]}
+
+class Clock(object):
+    # stands in for time.time and time.sleep, recording the waits
+    def __init__(self):
+        self.now = 0.0
+        self.waits = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, s):
+        self.waits.append(s)
+        self.now += s
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(tax.time, 'time', c.time)
+    monkeypatch.setattr(tax.time, 'sleep', c.sleep)
+    monkeypatch.setattr(tax.random, 'uniform', lambda a, b: b)
+    return c
+
+def polling(pending):
+    # a GNRD answering 303 for the first pending polls of a token
+    polls = []
+    def get(url, params=None, **kwargs):
+        if params is not None:
+            return FakeResponse({'status': 303, 'token_url': 'token/%s' % params['url']})
+        polls.append(url)
+        if polls.count(url) <= pending:
+            return FakeResponse({'status': 303})
+        return FakeResponse(done)
+    return get, polls
+
+def test_gnrd_poll_backs_off(monkeypatch, clock):
+    get, polls = polling(7)
+    monkeypatch.setattr(transport, 'get', get)
+    out = tax.scrapenames(url='http://example.org/a.pdf')
+    assert out['data']['scientificName'].tolist() == ['Pardosa moesta']
+    assert len(polls) == 8
+    assert clock.waits == [0.5, 1, 2, 4, 8, 10, 10]
+
+def test_gnrd_poll_times_out(monkeypatch, clock):
+    get, polls = polling(100)
+    monkeypatch.setattr(transport, 'get', get)
+    with pytest.raises(tax.NoResultException):
+        tax.scrapenames(url='http://example.org/a.pdf', timeout=20)
+    # 0.5 + 1 + 2 + 4 + 8 s waited; the next 10 s would pass the timeout
+    assert clock.waits == [0.5, 1, 2, 4, 8]
+    assert clock.now <= 20
+
+def test_scrapenames_many_reports_each_document(monkeypatch, clock):
+    get, polls = polling(1)
+    def post(url, data=None, **kwargs):
+        if data['text'] == 'bad':
+            return FakeResponse({'status': 200})
+        return FakeResponse(done)
+    monkeypatch.setattr(transport, 'get', get)
+    monkeypatch.setattr(transport, 'post', post)
+    urls = ['http://example.org/%d.pdf' % i for i in range(5)]
+    out = list(tax.scrapenames_many(url=urls, text=['good', 'bad'], max_workers=3))
+    assert sorted(x[0] for x in out) == sorted(urls + ['good', 'bad'])
+    for doc, res, error in out:
+        if doc == 'bad':
+            assert res is None and isinstance(error, tax.NoResultException)
+        else:
+            assert error is None
+            assert res['data'].shape[0] == 1
+    assert sorted(set(polls)) == sorted('token/' + x for x in urls)
@@ -0,0 +1,85 @@
+import time
+import threading
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+from benchmarks import replay
+from pytaxize import transport
+from pytaxize.policy import Policy
+
+url = 'http://www.itis.gov/ITISWebService/services/ITISService/getFullHierarchyFromTSN'
+
+class FailingAdapter(BaseAdapter):
+    def __init__(self, latency):
+        super(FailingAdapter, self).__init__()
+        self.latency = latency
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        raise requests.ConnectionError('service down', request=request)
+
+    def close(self):
+        pass
+
+def make_transport(adapter, **kwargs):
+    tp = transport.Transport(policies={'default': Policy(retries=0, backoff=0)}, **kwargs)
+    tp.session.mount('http://', adapter)
+    return tp
+
+def together(fun, n):
+    # call fun from n threads started at the same time
+    barrier = threading.Barrier(n)
+    out = [None] * n
+    def run(i):
+        barrier.wait()
+        try:
+            out[i] = fun(i)
+        except Exception as e:
+            out[i] = e
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return out
+
+def test_identical_gets_share_one_request():
+    adapter = replay.ReplayAdapter(latency=0.2)
+    tp = make_transport(adapter)
+    out = together(lambda i: tp.get(url, params={'tsn': 180543}), 6)
+    assert adapter.calls == 1
+    assert tp.stats() == {'requests': 6, 'coalesced': 5, 'in_flight': 0}
+    assert all(x is out[0] for x in out)
+    assert out[0].status_code == 200
+
+def test_different_params_are_not_coalesced():
+    adapter = replay.ReplayAdapter(latency=0.1)
+    tp = make_transport(adapter)
+    together(lambda i: tp.get(url, params={'tsn': i % 2}), 4)
+    assert adapter.calls == 2
+    assert tp.stats()['coalesced'] == 2
+
+def test_posts_and_coalesce_off_are_sent_each_time():
+    adapter = replay.ReplayAdapter(latency=0.1)
+    tp = make_transport(adapter)
+    together(lambda i: tp.post(url, data={'tsn': 1}), 3)
+    assert adapter.calls == 3
+    adapter = replay.ReplayAdapter(latency=0.1)
+    tp = make_transport(adapter, coalesce=False)
+    together(lambda i: tp.get(url, params={'tsn': 1}), 3)
+    assert adapter.calls == 3
+    assert tp.stats()['coalesced'] == 0
+
+def test_error_reaches_every_waiting_call():
+    adapter = FailingAdapter(latency=0.2)
+    tp = make_transport(adapter)
+    out = together(lambda i: tp.get(url, params={'tsn': 1}), 4)
+    assert adapter.calls == 1
+    assert all(isinstance(x, requests.ConnectionError) for x in out)
+    assert tp.stats()['in_flight'] == 0
+    # the next call after the failure makes a new request
+    with pytest.raises(requests.ConnectionError):
+        tp.get(url, params={'tsn': 1})
+    assert adapter.calls == 2